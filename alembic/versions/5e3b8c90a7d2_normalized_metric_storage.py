@@ -0,0 +1,85 @@
+"""Normalized metric storage: metrics dimension + metric_values facts
+
+Revision ID: 5e3b8c90a7d2
+Revises: d19a7be2c4f0
+Create Date: 2026-10-19 12:41:09.270334
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5e3b8c90a7d2'
+down_revision: Union[str, None] = 'd19a7be2c4f0'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Справочник рядов
+    op.create_table(
+        'metrics',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('name', sa.String(length=128), nullable=False),
+        sa.Column('region', sa.String(length=64), nullable=False, server_default=''),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('name', 'region', name='uq_metrics_name_region')
+    )
+
+    # Точки рядов: ключ (metric_id, date) вместо строки metric_name в каждой строке
+    op.create_table(
+        'metric_values',
+        sa.Column('metric_id', sa.Integer(), nullable=False),
+        sa.Column('date', sa.Date(), nullable=False),
+        sa.Column('value', sa.Float(), nullable=False),
+        sa.ForeignKeyConstraint(['metric_id'], ['metrics.id'], ),
+        sa.PrimaryKeyConstraint('metric_id', 'date')
+    )
+
+    # Перенос данных из traffic_metrics
+    op.execute("""
+        INSERT INTO metrics (name, region)
+        SELECT DISTINCT metric_name, COALESCE(region, '')
+        FROM traffic_metrics
+        WHERE metric_name IS NOT NULL
+    """)
+    op.execute("""
+        INSERT INTO metric_values (metric_id, date, value)
+        SELECT m.id, t.date, MAX(t.value)
+        FROM traffic_metrics t
+        JOIN metrics m ON m.name = t.metric_name AND m.region = COALESCE(t.region, '')
+        GROUP BY m.id, t.date
+    """)
+
+    op.drop_index('ix_traffic_metrics_name_date', table_name='traffic_metrics')
+    op.drop_index(op.f('ix_traffic_metrics_date'), table_name='traffic_metrics')
+    op.drop_table('traffic_metrics')
+
+
+def downgrade() -> None:
+    op.create_table(
+        'traffic_metrics',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('date', sa.Date(), nullable=False),
+        sa.Column('region', sa.String(length=64), nullable=True),
+        # Как metrics.name: имена длиннее 64 символов, записанные после апгрейда, не обрезаются
+        sa.Column('metric_name', sa.String(length=128), nullable=True),
+        sa.Column('value', sa.Float(), nullable=False),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_traffic_metrics_date'), 'traffic_metrics', ['date'], unique=False)
+    op.create_index('ix_traffic_metrics_name_date', 'traffic_metrics', ['metric_name', 'date'],
+                    unique=False, postgresql_include=['value'])
+
+    op.execute("""
+        INSERT INTO traffic_metrics (date, region, metric_name, value)
+        SELECT v.date, NULLIF(m.region, ''), m.name, v.value
+        FROM metric_values v
+        JOIN metrics m ON m.id = v.metric_id
+    """)
+
+    op.drop_table('metric_values')
+    op.drop_table('metrics')
@@ -0,0 +1,136 @@
+"""Forecast history: runs, issue_date and partitioning by issue month
+
+Revision ID: 7c2d9e41b5a3
+Revises: 01913252a903
+Create Date: 2026-10-19 09:12:04.318250
+
+"""
+from datetime import date, timedelta
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7c2d9e41b5a3'
+down_revision: Union[str, None] = '01913252a903'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Таблица запусков прогнозирования
+    op.create_table(
+        'forecast_runs',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('issue_date', sa.Date(), nullable=False),
+        sa.Column('model_version', sa.String(length=32), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.Column('forecasts_count', sa.Integer(), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_forecast_runs_issue_date'), 'forecast_runs', ['issue_date'], unique=False)
+
+    # Существующие прогнозы переносим в один "исторический" запуск
+    op.execute(
+        "INSERT INTO forecast_runs (id, issue_date, model_version, created_at, forecasts_count) "
+        "SELECT 1, CURRENT_DATE, 'legacy', CURRENT_TIMESTAMP, COUNT(*) FROM forecasts "
+        "HAVING COUNT(*) > 0"
+    )
+
+    if op.get_bind().dialect.name != 'postgresql':
+        with op.batch_alter_table('forecasts') as batch_op:
+            batch_op.add_column(sa.Column('run_id', sa.Integer(), nullable=True))
+            batch_op.add_column(sa.Column('issue_date', sa.Date(), nullable=True))
+        op.execute("UPDATE forecasts SET run_id = 1, issue_date = CURRENT_DATE")
+        with op.batch_alter_table('forecasts') as batch_op:
+            batch_op.alter_column('run_id', nullable=False)
+            batch_op.alter_column('issue_date', nullable=False)
+            batch_op.create_foreign_key('fk_forecasts_run_id', 'forecast_runs', ['run_id'], ['id'])
+        op.create_index('ix_forecasts_product_date_run', 'forecasts', ['product_id', 'date', 'run_id'], unique=False)
+        return
+
+    # Postgres: пересоздаем forecasts как таблицу, партиционированную по месяцу выпуска.
+    # Ключ партиционирования обязан входить в первичный ключ, поэтому PK = (id, issue_date)
+    op.execute("ALTER TABLE forecasts RENAME TO forecasts_legacy")
+    op.execute("ALTER INDEX forecasts_pkey RENAME TO forecasts_legacy_pkey")
+    op.execute("ALTER INDEX ix_forecasts_date RENAME TO ix_forecasts_legacy_date")
+    op.execute("ALTER SEQUENCE forecasts_id_seq RENAME TO forecasts_legacy_id_seq")
+
+    op.execute("""
+        CREATE TABLE forecasts (
+            id SERIAL NOT NULL,
+            date DATE NOT NULL,
+            product_id INTEGER NOT NULL REFERENCES products (id),
+            run_id INTEGER NOT NULL REFERENCES forecast_runs (id),
+            issue_date DATE NOT NULL,
+            yhat DOUBLE PRECISION NOT NULL,
+            yhat_lower DOUBLE PRECISION,
+            yhat_upper DOUBLE PRECISION,
+            model_version VARCHAR(32),
+            PRIMARY KEY (id, issue_date)
+        ) PARTITION BY RANGE (issue_date)
+    """)
+    # Партиция текущего месяца - сюда попадают перенесенные прогнозы;
+    # партиции следующих месяцев создает ensure_forecast_partition при запуске прогноза
+    month_start = date.today().replace(day=1)
+    next_month = (month_start + timedelta(days=32)).replace(day=1)
+    op.execute(
+        f"CREATE TABLE forecasts_p{month_start:%Y_%m} PARTITION OF forecasts "
+        f"FOR VALUES FROM ('{month_start.isoformat()}') TO ('{next_month.isoformat()}')"
+    )
+    op.create_index(op.f('ix_forecasts_date'), 'forecasts', ['date'], unique=False)
+    op.create_index('ix_forecasts_product_date_run', 'forecasts', ['product_id', 'date', 'run_id'], unique=False)
+
+    op.execute(
+        "INSERT INTO forecasts (id, date, product_id, run_id, issue_date, yhat, yhat_lower, yhat_upper, model_version) "
+        "SELECT id, date, product_id, 1, CURRENT_DATE, yhat, yhat_lower, yhat_upper, model_version "
+        "FROM forecasts_legacy"
+    )
+    op.execute("SELECT setval('forecasts_id_seq', COALESCE((SELECT MAX(id) FROM forecasts), 0) + 1, false)")
+    op.execute("SELECT setval('forecast_runs_id_seq', COALESCE((SELECT MAX(id) FROM forecast_runs), 0) + 1, false)")
+    op.drop_table('forecasts_legacy')
+
+
+def downgrade() -> None:
+    # История сворачивается: остается последний прогноз для каждой пары товар/дата
+    if op.get_bind().dialect.name != 'postgresql':
+        op.execute(
+            "DELETE FROM forecasts WHERE EXISTS ("
+            "SELECT 1 FROM forecasts newer WHERE newer.product_id = forecasts.product_id "
+            "AND newer.date = forecasts.date AND newer.run_id > forecasts.run_id)"
+        )
+        op.drop_index('ix_forecasts_product_date_run', table_name='forecasts')
+        with op.batch_alter_table('forecasts') as batch_op:
+            batch_op.drop_constraint('fk_forecasts_run_id', type_='foreignkey')
+            batch_op.drop_column('issue_date')
+            batch_op.drop_column('run_id')
+    else:
+        op.execute("ALTER TABLE forecasts RENAME TO forecasts_partitioned")
+        op.execute("ALTER INDEX ix_forecasts_date RENAME TO ix_forecasts_partitioned_date")
+        op.execute("ALTER INDEX ix_forecasts_product_date_run RENAME TO ix_forecasts_partitioned_product_date_run")
+        op.execute("ALTER SEQUENCE forecasts_id_seq RENAME TO forecasts_partitioned_id_seq")
+        op.create_table(
+            'forecasts',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('date', sa.Date(), nullable=False),
+            sa.Column('product_id', sa.Integer(), nullable=False),
+            sa.Column('yhat', sa.Float(), nullable=False),
+            sa.Column('yhat_lower', sa.Float(), nullable=True),
+            sa.Column('yhat_upper', sa.Float(), nullable=True),
+            sa.Column('model_version', sa.String(length=32), nullable=True),
+            sa.ForeignKeyConstraint(['product_id'], ['products.id'], ),
+            sa.PrimaryKeyConstraint('id')
+        )
+        op.create_index(op.f('ix_forecasts_date'), 'forecasts', ['date'], unique=False)
+        op.execute(
+            "INSERT INTO forecasts (id, date, product_id, yhat, yhat_lower, yhat_upper, model_version) "
+            "SELECT DISTINCT ON (product_id, date) id, date, product_id, yhat, yhat_lower, yhat_upper, model_version "
+            "FROM forecasts_partitioned ORDER BY product_id, date, run_id DESC"
+        )
+        op.execute("SELECT setval('forecasts_id_seq', COALESCE((SELECT MAX(id) FROM forecasts), 0) + 1, false)")
+        op.execute("DROP TABLE forecasts_partitioned")
+
+    op.drop_index(op.f('ix_forecast_runs_issue_date'), table_name='forecast_runs')
+    op.drop_table('forecast_runs')
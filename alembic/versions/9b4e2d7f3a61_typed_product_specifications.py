@@ -0,0 +1,110 @@
+"""Typed product specifications: JSONB specs and numeric tire size columns
+
+Revision ID: 9b4e2d7f3a61
+Revises: f08d4b6a2c17
+Create Date: 2026-10-19 15:02:47.318204
+
+"""
+import json
+import re
+from typing import Dict, Optional, Sequence, Tuple, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9b4e2d7f3a61'
+down_revision: Union[str, None] = 'f08d4b6a2c17'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Копия разбора размера из src/etl/normalize.py на момент миграции: миграция не должна
+# меняться вместе с кодом приложения
+_SIZE_RE = re.compile(
+    r"(?<![\d.,])(?P<width>\d{1,4}(?:[.,]\d+)?)"
+    r"(?:\s*/\s*(?P<ratio>\d{2,3}(?:[.,]\d+)?)|\s*[xXхХ×]\s*(?P<height>\d{2,4}))?"
+    r"\s*(?P<construction>Z?R|-)\s*"
+    r"(?P<diameter>\d{1,3}(?:[.,]\d+)?)(?![\d.,])"
+)
+_SIZE_SPEC_KEYS = ("размер", "size", "типоразмер")
+
+
+def _number(text: str) -> float:
+    return float(text.replace(",", "."))
+
+
+def _parse_size(text: Optional[str]) -> Optional[Tuple[float, Optional[float], float]]:
+    """(ширина, профиль, диаметр) из названия или характеристики"""
+    match = _SIZE_RE.search(text) if text else None
+    if not match:
+        return None
+    width = _number(match.group("width"))
+    ratio = None
+    if match.group("ratio"):
+        ratio = _number(match.group("ratio"))
+    elif match.group("height"):
+        ratio = round(_number(match.group("height")) / width * 100, 1)
+    return width, ratio, _number(match.group("diameter"))
+
+
+def _product_size(name: str, specs: Optional[Dict[str, str]]) -> Optional[Tuple[float, Optional[float], float]]:
+    size = _parse_size(name)
+    if size is None and specs:
+        for key in _SIZE_SPEC_KEYS:
+            size = _parse_size(specs.get(key))
+            if size:
+                break
+    return size
+
+
+def upgrade() -> None:
+    with op.batch_alter_table('products') as batch_op:
+        batch_op.add_column(sa.Column('size_width', sa.Float(), nullable=True))
+        batch_op.add_column(sa.Column('size_ratio', sa.Float(), nullable=True))
+        batch_op.add_column(sa.Column('size_diameter', sa.Float(), nullable=True))
+    op.create_index('ix_products_size', 'products', ['size_diameter', 'size_width', 'size_ratio'], unique=False)
+
+    bind = op.get_bind()
+    if bind.dialect.name == 'postgresql':
+        # Строки json.dumps -> JSONB (пустые строки -> NULL)
+        op.execute(
+            "ALTER TABLE products ALTER COLUMN specifications TYPE JSONB "
+            "USING NULLIF(specifications, '')::jsonb"
+        )
+    # В SQLite тип JSON хранится как TEXT - существующие строки читаются без изменений
+
+    # Размеры разбираем один раз здесь, дальше их заполняет загрузчик
+    rows = bind.execute(sa.text("SELECT id, name, specifications FROM products")).fetchall()
+    updates = []
+    for product_id, name, specs in rows:
+        if isinstance(specs, str):
+            try:
+                specs = json.loads(specs)
+            except ValueError:
+                specs = None
+        specs = {str(k).lower(): str(v) for k, v in specs.items()} if isinstance(specs, dict) else None
+        size = _product_size(name or "", specs)
+        if size:
+            width, ratio, diameter = size
+            updates.append({"id": product_id, "width": width, "ratio": ratio, "diameter": diameter})
+    if updates:
+        bind.execute(
+            sa.text("UPDATE products SET size_width = :width, size_ratio = :ratio, size_diameter = :diameter "
+                    "WHERE id = :id"),
+            updates
+        )
+
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name == 'postgresql':
+        op.execute(
+            "ALTER TABLE products ALTER COLUMN specifications TYPE VARCHAR(2048) "
+            "USING specifications::text"
+        )
+
+    op.drop_index('ix_products_size', table_name='products')
+    with op.batch_alter_table('products') as batch_op:
+        batch_op.drop_column('size_diameter')
+        batch_op.drop_column('size_ratio')
+        batch_op.drop_column('size_width')
@@ -0,0 +1,34 @@
+"""Indexes for filtered keyset pagination of products
+
+Revision ID: a6f1c3e8d925
+Revises: 5e3b8c90a7d2
+Create Date: 2026-10-19 13:05:12.417390
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a6f1c3e8d925'
+down_revision: Union[str, None] = '5e3b8c90a7d2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Страница товаров: WHERE category/tread_pattern = ? AND (name, id) > (?, ?) ORDER BY name, id.
+    # ix_products_tread_pattern - префикс нового индекса
+    op.create_index('ix_products_name_id', 'products', ['name', 'id'], unique=False)
+    op.create_index('ix_products_category_name_id', 'products', ['category', 'name', 'id'], unique=False)
+    op.create_index('ix_products_tread_pattern_name_id', 'products', ['tread_pattern', 'name', 'id'], unique=False)
+    op.drop_index('ix_products_tread_pattern', table_name='products')
+
+
+def downgrade() -> None:
+    op.create_index('ix_products_tread_pattern', 'products', ['tread_pattern'], unique=False)
+    op.drop_index('ix_products_tread_pattern_name_id', table_name='products')
+    op.drop_index('ix_products_category_name_id', table_name='products')
+    op.drop_index('ix_products_name_id', table_name='products')
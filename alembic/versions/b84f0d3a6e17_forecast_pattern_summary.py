@@ -0,0 +1,54 @@
+"""Materialized forecast summary by tread pattern
+
+Revision ID: b84f0d3a6e17
+Revises: 7c2d9e41b5a3
+Create Date: 2026-10-19 10:02:47.551903
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b84f0d3a6e17'
+down_revision: Union[str, None] = '7c2d9e41b5a3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'forecast_pattern_summary',
+        sa.Column('tread_pattern', sa.String(length=64), nullable=False),
+        sa.Column('date', sa.Date(), nullable=False),
+        sa.Column('model_version', sa.String(length=32), nullable=False),
+        sa.Column('demand_sum', sa.Float(), nullable=False),
+        sa.Column('forecast_count', sa.Integer(), nullable=False),
+        sa.Column('demand_mean', sa.Float(), nullable=False),
+        sa.Column('refreshed_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('tread_pattern', 'date', 'model_version')
+    )
+    op.create_index('ix_forecast_pattern_summary_date', 'forecast_pattern_summary', ['date'], unique=False)
+
+    # Начальное заполнение из последних прогнозов
+    op.execute("""
+        INSERT INTO forecast_pattern_summary
+            (tread_pattern, date, model_version, demand_sum, forecast_count, demand_mean, refreshed_at)
+        SELECT p.tread_pattern, f.date, COALESCE(f.model_version, 'unknown'),
+               SUM(f.yhat), COUNT(f.id), AVG(f.yhat), CURRENT_TIMESTAMP
+        FROM forecasts f
+        JOIN products p ON p.id = f.product_id
+        JOIN (
+            SELECT product_id, date, MAX(run_id) AS run_id
+            FROM forecasts GROUP BY product_id, date
+        ) latest ON latest.product_id = f.product_id AND latest.date = f.date AND latest.run_id = f.run_id
+        WHERE p.tread_pattern IS NOT NULL
+        GROUP BY p.tread_pattern, f.date, COALESCE(f.model_version, 'unknown')
+    """)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_forecast_pattern_summary_date', table_name='forecast_pattern_summary')
+    op.drop_table('forecast_pattern_summary')
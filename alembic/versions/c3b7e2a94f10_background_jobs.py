@@ -0,0 +1,44 @@
+"""Background jobs table
+
+Revision ID: c3b7e2a94f10
+Revises: a6f1c3e8d925
+Create Date: 2026-10-19 13:32:47.581204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c3b7e2a94f10'
+down_revision: Union[str, None] = 'a6f1c3e8d925'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'jobs',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('kind', sa.String(length=32), nullable=False),
+        sa.Column('status', sa.String(length=16), nullable=False, server_default='queued'),
+        sa.Column('params', sa.Text(), nullable=True),
+        sa.Column('progress', sa.Float(), nullable=False, server_default='0'),
+        sa.Column('message', sa.String(length=512), nullable=True),
+        sa.Column('result', sa.Text(), nullable=True),
+        sa.Column('error', sa.Text(), nullable=True),
+        sa.Column('cancel_requested', sa.Boolean(), nullable=False, server_default=sa.false()),
+        sa.Column('worker', sa.String(length=128), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=False, server_default=sa.func.now()),
+        sa.Column('started_at', sa.DateTime(), nullable=True),
+        sa.Column('finished_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_jobs_status_created', 'jobs', ['status', 'created_at'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_jobs_status_created', table_name='jobs')
+    op.drop_table('jobs')
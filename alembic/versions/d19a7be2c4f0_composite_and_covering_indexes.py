@@ -0,0 +1,44 @@
+"""Composite and covering indexes for hot queries
+
+Revision ID: d19a7be2c4f0
+Revises: b84f0d3a6e17
+Create Date: 2026-10-19 11:20:31.904117
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd19a7be2c4f0'
+down_revision: Union[str, None] = 'b84f0d3a6e17'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Тренды: metric_name = ? AND date BETWEEN ... (INCLUDE value -> index-only scan в Postgres).
+    # Одиночный индекс по metric_name становится лишним - он префикс нового
+    op.create_index('ix_traffic_metrics_name_date', 'traffic_metrics', ['metric_name', 'date'],
+                    unique=False, postgresql_include=['value'])
+    op.drop_index('ix_traffic_metrics_metric_name', table_name='traffic_metrics')
+
+    # Цены: (product_id, date) уже покрыт uq_ps_prod_date, добавляем покрывающий вариант
+    op.create_index('ix_price_snapshots_product_date_cov', 'price_snapshots', ['product_id', 'date'],
+                    unique=False, postgresql_include=['price', 'in_stock', 'promo'])
+
+    # Прогнозы: окна по дате без фильтра по товару; ix_forecasts_date - префикс нового индекса
+    op.create_index('ix_forecasts_date_product_run', 'forecasts', ['date', 'product_id', 'run_id'], unique=False)
+    op.drop_index('ix_forecasts_date', table_name='forecasts')
+
+
+def downgrade() -> None:
+    op.create_index('ix_forecasts_date', 'forecasts', ['date'], unique=False)
+    op.drop_index('ix_forecasts_date_product_run', table_name='forecasts')
+
+    op.drop_index('ix_price_snapshots_product_date_cov', table_name='price_snapshots')
+
+    op.create_index('ix_traffic_metrics_metric_name', 'traffic_metrics', ['metric_name'], unique=False)
+    op.drop_index('ix_traffic_metrics_name_date', table_name='traffic_metrics')
@@ -0,0 +1,45 @@
+"""Pipeline stage runs with fingerprints and watermarks
+
+Revision ID: f08d4b6a2c17
+Revises: c3b7e2a94f10
+Create Date: 2026-10-19 14:10:03.662981
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f08d4b6a2c17'
+down_revision: Union[str, None] = 'c3b7e2a94f10'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'pipeline_stage_runs',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('pipeline_run', sa.String(length=32), nullable=False),
+        sa.Column('stage', sa.String(length=32), nullable=False),
+        sa.Column('status', sa.String(length=16), nullable=False),
+        sa.Column('fingerprint', sa.String(length=64), nullable=True),
+        sa.Column('watermark', sa.Text(), nullable=True),
+        sa.Column('output', sa.Text(), nullable=True),
+        sa.Column('error', sa.Text(), nullable=True),
+        sa.Column('started_at', sa.DateTime(), nullable=False, server_default=sa.func.now()),
+        sa.Column('finished_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_pipeline_stage_runs_pipeline_run'), 'pipeline_stage_runs', ['pipeline_run'], unique=False)
+    # Последний успешный запуск этапа: WHERE stage = ? AND status = 'ok' ORDER BY id DESC LIMIT 1
+    op.create_index('ix_pipeline_stage_runs_stage_status', 'pipeline_stage_runs', ['stage', 'status', 'id'],
+                    unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_pipeline_stage_runs_stage_status', table_name='pipeline_stage_runs')
+    op.drop_index(op.f('ix_pipeline_stage_runs_pipeline_run'), table_name='pipeline_stage_runs')
+    op.drop_table('pipeline_stage_runs')
@@ -6,30 +6,24 @@ import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
 from datetime import date, timedelta
-from sqlalchemy import func
 
-from src.db import SessionLocal
-from src.models import Product, TrafficMetric, Forecast, PriceSnapshot
-# Импорты для парсинга - только при необходимости
-try:
-    # Используем безопасную версию парсера (только BeautifulSoup)
-    from src.etl.scrape_site_safe import scrape_products_safe as scrape_products
-    from src.etl.external.trends import collect_tire_trends
-    from src.etl.load_to_db import save_products, save_traffic_metrics
-    SCRAPING_AVAILABLE = True
-except Exception as e:
-    # Если безопасная версия не работает, пробуем обычную
-    try:
-        from src.etl.scrape_site import scrape_products
-        from src.etl.external.trends import collect_tire_trends
-        from src.etl.load_to_db import save_products, save_traffic_metrics
-        SCRAPING_AVAILABLE = True
-    except Exception as e2:
-        SCRAPING_AVAILABLE = False
-        st.warning(f"Модули парсинга недоступны: {e2}")
-from src.modeling.train import train_demand_model, load_model, save_model
-from src.modeling.forecast import generate_forecasts, get_tread_pattern_recommendations
+from src.models import Product, MetricValue, Forecast, ForecastRun, ForecastPatternSummary
+from src.ui import data
+from src.jobs.runner import submit_job, list_jobs, cancel_job, ACTIVE_STATUSES
 import os
+import importlib.util
+
+
+def scraping_available() -> bool:
+    """
+    Установлены ли зависимости парсинга
+    
+    Проверка без импорта: парсер, pytrends и загрузка в БД выполняются в фоновых
+    задачах (src/jobs/tasks.py), интерфейсу их модули не нужны.
+    """
+    has_parser = any(importlib.util.find_spec(name) for name in ("bs4", "selectolax"))
+    return has_parser and importlib.util.find_spec("pytrends") is not None
+
 
 # Настройка страницы
 st.set_page_config(
@@ -41,42 +35,82 @@ st.set_page_config(
 st.title("📊 Анализ спроса на продукцию НИИР")
 st.markdown("Система прогнозирования спроса с анализом характеристик товаров (на примере шин)")
 
-# Инициализация состояния
-def get_session():
-    """Получить или создать сессию БД"""
-    if 'session' not in st.session_state:
-        if SessionLocal is not None:
-            st.session_state.session = SessionLocal()
-        else:
-            st.session_state.session = None
-    return st.session_state.session
-
-def get_db_stats():
-    """Получить статистику БД"""
-    session = get_session()
-    if session is None:
-        return {"products": 0, "trends": 0, "forecasts": 0}
-    try:
-        return {
-            "products": session.query(Product).count(),
-            "trends": session.query(TrafficMetric).count(),
-            "forecasts": session.query(Forecast).count()
-        }
-    except Exception:
-        return {"products": 0, "trends": 0, "forecasts": 0}
-
 # Боковая панель
 st.sidebar.title("🔧 Навигация")
 page = st.sidebar.selectbox(
     "Выберите страницу",
     ["📈 Дашборд", "🛒 Товары", "📊 Тренды", "🤖 Модель", "🔮 Прогнозы", "⚙️ Настройки"]
 )
+if st.sidebar.button("🔄 Обновить данные"):
+    data.invalidate()
+
+# Какие кэши сбрасывать после завершения фоновой задачи
+JOB_CACHE_GROUPS = {
+    "scrape": ("products",),
+    "trends": ("trends",),
+    "train": ("model",),
+    "forecast": ("forecasts",),
+    "pipeline": ("products", "trends", "model", "forecasts"),
+}
+JOB_STATUS_LABELS = {
+    "queued": "⏳ в очереди",
+    "running": "⚙️ выполняется",
+    "succeeded": "✓ выполнена",
+    "failed": "✗ ошибка",
+    "cancelled": "⏹ отменена",
+}
+
+
+@st.fragment(run_every=2)
+def show_jobs(kinds, limit=3):
+    """Последние фоновые задачи с прогрессом; опрашивает БД, не блокируя страницу"""
+    jobs = list_jobs(limit=limit, kinds=kinds)
+    # Задачи, завершенные до первого показа этого списка, считаем уже учтенными. Учет - по
+    # набору видов: на другой странице свои задачи, и их завершение не новость
+    finished_jobs = st.session_state.setdefault("finished_jobs_by_kinds", {})
+    key = tuple(sorted(kinds)) if kinds else ()
+    if key not in finished_jobs:
+        finished_jobs[key] = {j["id"] for j in jobs if j["status"] not in ACTIVE_STATUSES}
+    seen = finished_jobs[key]
+    refresh = False
+    
+    for job in jobs:
+        if job["status"] in ACTIVE_STATUSES:
+            st.progress(job["progress"], text=f"#{job['id']} {job['kind']}: {JOB_STATUS_LABELS[job['status']]}"
+                                               f" {job['message'] or ''}")
+            if not job["cancel_requested"]:
+                if st.button("⏹ Отменить", key=f"cancel-job-{job['id']}"):
+                    cancel_job(job["id"])
+            continue
+        
+        # Задача завершилась, пока страница открыта - сбрасываем кэши и перерисовываем страницу
+        if job["id"] not in seen:
+            seen.add(job["id"])
+            if job["status"] == "succeeded":
+                data.invalidate(*JOB_CACHE_GROUPS.get(job["kind"], ()))
+                refresh = True
+        
+        text = f"#{job['id']} {job['kind']}: {JOB_STATUS_LABELS[job['status']]}"
+        if job["status"] == "failed":
+            st.error(f"{text} - {job['error']}")
+        else:
+            st.caption(text)
+    
+    if refresh:
+        st.rerun()
+
+
+def submit_job_button(label, kind, params=None, **button_kwargs):
+    """Кнопка, ставящая задачу в очередь"""
+    if st.button(label, **button_kwargs):
+        job = submit_job(kind, params)
+        st.toast(f"Задача #{job['id']} ({kind}) поставлена в очередь")
 
 # Дашборд
 if page == "📈 Дашборд":
     st.header("Дашборд")
     
-    stats = get_db_stats()
+    stats = data.get_db_stats()
     
     col1, col2, col3 = st.columns(3)
     with col1:
@@ -86,91 +120,91 @@ if page == "📈 Дашборд":
     with col3:
         st.metric("Прогнозов", stats["forecasts"])
     
-    if stats["products"] > 0:
+    if stats["products"] > 0 and data.db_available():
         # Распределение по категориям
-        session = get_session()
-        if session is not None:
-            categories = session.query(
-                Product.category,
-                func.count(Product.id).label('count')
-            ).group_by(Product.category).all()
-            
-            if categories:
-                df_cats = pd.DataFrame([(c[0] or "Без категории", c[1]) for c in categories], 
-                                     columns=["Категория", "Количество"])
-                fig = px.pie(df_cats, values="Количество", names="Категория", 
-                            title="Распределение товаров по категориям")
-                st.plotly_chart(fig, use_container_width=True)
-            
-            # Распределение по типам протектора (для шин)
-            tread_patterns = session.query(
-                Product.tread_pattern,
-                func.count(Product.id).label('count')
-            ).filter(Product.tread_pattern.isnot(None)).group_by(Product.tread_pattern).all()
-            
-            if tread_patterns:
-                df_tread = pd.DataFrame([(t[0], t[1]) for t in tread_patterns],
-                                       columns=["Тип протектора", "Количество"])
-                fig = px.bar(df_tread, x="Тип протектора", y="Количество",
-                            title="Распределение по типам протектора")
-                st.plotly_chart(fig, use_container_width=True)
+        df_cats = data.get_category_counts()
+        if not df_cats.empty:
+            fig = px.pie(df_cats, values="Количество", names="Категория",
+                        title="Распределение товаров по категориям")
+            st.plotly_chart(fig, use_container_width=True)
+        
+        # Распределение по типам протектора (для шин)
+        df_tread = data.get_tread_pattern_counts()
+        if not df_tread.empty:
+            fig = px.bar(df_tread, x="Тип протектора", y="Количество",
+                        title="Распределение по типам протектора")
+            st.plotly_chart(fig, use_container_width=True)
 
 # Страница товаров
 elif page == "🛒 Товары":
     st.header("Товары")
     
-    session = get_session()
-    if session is None:
+    if not data.db_available():
         st.warning("⚠ База данных не настроена. Настройте DATABASE_URL в .env файле")
         st.stop()
     
-    products = session.query(Product).all()
+    options = data.get_product_filter_options()
     
-    if not products:
+    if data.count_products() == 0:
         st.warning("Товаров пока нет в БД")
         st.info("Используйте вкладку 'Настройки' для парсинга товаров с сайта")
     else:
-        # Фильтры
+        # Фильтры (списки значений берутся из БД через DISTINCT)
         col1, col2 = st.columns(2)
         with col1:
-            categories = [None] + list(set([p.category for p in products if p.category]))
+            categories = [None] + options["categories"]
             selected_category = st.selectbox("Категория", categories, format_func=lambda x: x or "Все")
         
         with col2:
-            tread_patterns = [None] + list(set([p.tread_pattern for p in products if p.tread_pattern]))
+            tread_patterns = [None] + options["tread_patterns"]
             selected_tread = st.selectbox("Тип протектора", tread_patterns, format_func=lambda x: x or "Все")
         
-        # Фильтрация
-        filtered = products
-        if selected_category:
-            filtered = [p for p in filtered if p.category == selected_category]
-        if selected_tread:
-            filtered = [p for p in filtered if p.tread_pattern == selected_tread]
+        # Фильтрация и пагинация на стороне БД; курсоры страниц храним в состоянии сессии
+        filter_key = (selected_category, selected_tread)
+        if st.session_state.get("products_filter") != filter_key:
+            st.session_state.products_filter = filter_key
+            st.session_state.products_cursors = [None]
+        cursors = st.session_state.products_cursors
+        
+        total = data.count_products(selected_category, selected_tread)
+        page_df = data.get_products_page(selected_category, selected_tread, cursors[-1])
         
         # Таблица товаров
-        df = pd.DataFrame([{
-            "ID": p.id,
-            "Название": p.name,
-            "SKU": p.sku,
-            "Категория": p.category or "-",
-            "Тип протектора": p.tread_pattern or "-",
-            "URL": p.url or "-"
-        } for p in filtered])
+        df = pd.DataFrame({
+            "ID": page_df["id"],
+            "Название": page_df["name"],
+            "SKU": page_df["sku"],
+            "Категория": page_df["category"].fillna("-"),
+            "Тип протектора": page_df["tread_pattern"].fillna("-"),
+            "URL": page_df["url"].fillna("-")
+        })
         
         st.dataframe(df, use_container_width=True)
-        st.info(f"Показано {len(filtered)} из {len(products)} товаров")
+        
+        page_num = len(cursors)
+        shown_from = (page_num - 1) * data.PAGE_SIZE + 1 if len(page_df) else 0
+        shown_to = (page_num - 1) * data.PAGE_SIZE + len(page_df)
+        st.info(f"Показаны {shown_from}-{shown_to} из {total} товаров")
+        
+        nav1, nav2 = st.columns(2)
+        with nav1:
+            if page_num > 1 and st.button("← Назад"):
+                cursors.pop()
+                st.rerun()
+        with nav2:
+            if len(page_df) == data.PAGE_SIZE and shown_to < total and st.button("Вперед →"):
+                last = page_df.iloc[-1]
+                cursors.append((last["name"], int(last["id"])))
+                st.rerun()
 
 # Страница трендов
 elif page == "📊 Тренды":
     st.header("Анализ трендов")
     
-    session = get_session()
-    
     # Фильтры
     col1, col2 = st.columns(2)
     with col1:
-        keywords = session.query(TrafficMetric.metric_name).distinct().all()
-        keyword_options = [k[0] for k in keywords if k[0] and k[0].startswith("trend_keyword:")]
+        keyword_options = data.get_trend_keywords()
         selected_keyword = st.selectbox("Ключевое слово", keyword_options) if keyword_options else None
     
     with col2:
@@ -178,22 +212,10 @@ elif page == "📊 Тренды":
     
     if selected_keyword:
         # Данные трендов
-        end_date = date.today()
-        start_date = end_date - timedelta(days=days_back)
-        
-        trends = session.query(TrafficMetric).filter(
-            TrafficMetric.metric_name == selected_keyword,
-            TrafficMetric.date >= start_date,
-            TrafficMetric.date <= end_date
-        ).order_by(TrafficMetric.date).all()
+        df_trends = data.get_trend_series(selected_keyword, days_back)
         
-        if trends:
-            df_trends = pd.DataFrame([{
-                "Дата": t.date,
-                "Значение": t.value
-            } for t in trends])
-            
-            fig = px.line(df_trends, x="Дата", y="Значение", 
+        if not df_trends.empty:
+            fig = px.line(df_trends, x="Дата", y="Значение",
                          title=f"Тренд: {selected_keyword.replace('trend_keyword:', '')}")
             st.plotly_chart(fig, use_container_width=True)
             
@@ -214,8 +236,7 @@ elif page == "📊 Тренды":
 elif page == "🤖 Модель":
     st.header("Модель прогнозирования")
     
-    session = get_session()
-    stats = get_db_stats()
+    stats = data.get_db_stats()
     
     if stats["products"] == 0 or stats["trends"] == 0:
         st.warning("⚠ Недостаточно данных для обучения модели")
@@ -226,79 +247,77 @@ elif page == "🤖 Модель":
         col1, col2 = st.columns(2)
         
         with col1:
-            if st.button("🔄 Обучить модель", type="primary"):
-                with st.spinner("Обучение модели..."):
-                    model, metrics = train_demand_model()
-                    
-                    if model and metrics:
-                        st.success("✓ Модель обучена успешно!")
-                        
-                        # Сохраняем модель
-                        os.makedirs("models", exist_ok=True)
-                        save_model(model, "models/demand_model.pkl")
-                        
-                        # Показываем метрики
-                        st.subheader("Метрики модели")
-                        col1, col2, col3 = st.columns(3)
-                        with col1:
-                            st.metric("Test R²", f"{metrics.get('test_r2', 0):.3f}")
-                        with col2:
-                            st.metric("Test MAE", f"{metrics.get('test_mae', 0):.2f}")
-                        with col3:
-                            st.metric("Test RMSE", f"{metrics.get('test_rmse', 0):.2f}")
-                        
-                        # Важные признаки
-                        if 'feature_importance' in metrics:
-                            st.subheader("Топ-10 важных признаков")
-                            importances = metrics['feature_importance']
-                            top_features = sorted(importances.items(), key=lambda x: x[1], reverse=True)[:10]
-                            df_importance = pd.DataFrame(top_features, columns=["Признак", "Важность"])
-                            st.dataframe(df_importance, use_container_width=True)
+            # Обучение идет в фоне: страницу можно обновлять, прогресс виден ниже
+            submit_job_button("🔄 Обучить модель", "train", type="primary")
+            show_jobs(["train"])
+            
+            last_train = list_jobs(limit=1, kinds=["train"], status="succeeded")
+            result = last_train[0]["result"] if last_train else None
+            if result and result.get("trained"):
+                # Показываем метрики
+                st.subheader("Метрики модели")
+                col1, col2, col3 = st.columns(3)
+                with col1:
+                    st.metric("Test R²", f"{result.get('test_r2', 0):.3f}")
+                with col2:
+                    st.metric("Test MAE", f"{result.get('test_mae', 0):.2f}")
+                with col3:
+                    st.metric("Test RMSE", f"{result.get('test_rmse', 0):.2f}")
+                
+                # Важные признаки
+                if result.get("top_features"):
+                    st.subheader("Топ-10 важных признаков")
+                    df_importance = pd.DataFrame(result["top_features"], columns=["Признак", "Важность"])
+                    st.dataframe(df_importance, use_container_width=True)
+            elif result:
+                st.warning("Последнее обучение: нет данных для обучения")
         
         with col2:
-            if os.path.exists("models/demand_model.pkl"):
+            if os.path.exists(data.MODEL_PATH):
                 st.success("✓ Модель сохранена")
                 if st.button("📥 Загрузить модель"):
-                    model = load_model("models/demand_model.pkl")
-                    st.session_state.model = model
+                    st.session_state.model = data.get_model()
                     st.success("Модель загружена в память")
 
 # Страница прогнозов
 elif page == "🔮 Прогнозы":
     st.header("Прогнозы спроса")
     
-    session = get_session()
-    
-    # Проверка наличия модели
-    model = None
-    if os.path.exists("models/demand_model.pkl"):
-        try:
-            from src.modeling.train import load_model
-            model = load_model("models/demand_model.pkl")
-        except:
-            pass
+    # Проверка наличия модели (загружается один раз, пока файл не изменился)
+    model = data.get_model()
     
     if not model:
         st.warning("⚠ Модель не найдена. Обучите модель на странице 'Модель'")
     else:
-        # Генерация прогнозов
-        if st.button("🔮 Сгенерировать прогнозы", type="primary"):
-            with st.spinner("Генерация прогнозов..."):
-                products = session.query(Product).all()
-                forecast_dates = [date.today() + timedelta(days=i) for i in range(1, 31)]
-                forecasts = generate_forecasts(model, products, forecast_dates)
-                st.success(f"✓ Создано прогнозов: {len(forecasts)}")
+        # Генерация прогнозов (в фоне)
+        submit_job_button("🔮 Сгенерировать прогнозы", "forecast", {"days": 30}, type="primary")
+        show_jobs(["forecast"])
         
         # Анализ по типам протектора
         st.subheader("Рекомендации по типам протектора")
+        rec_col1, rec_col2 = st.columns(2)
+        with rec_col1:
+            rec_start = st.date_input("С даты", value=date.today() + timedelta(days=1))
+        with rec_col2:
+            rec_end = st.date_input("По дату", value=date.today() + timedelta(days=30))
+        
         if st.button("📊 Получить рекомендации"):
-            recommendations = get_tread_pattern_recommendations()
+            # Все даты диапазона считаются одним запросом
+            recommendations = data.get_recommendations(rec_start, rec_end)
             
             if recommendations is not None and not recommendations.empty:
-                st.dataframe(recommendations, use_container_width=True)
+                df_rec = recommendations.reset_index()
+                st.dataframe(df_rec, use_container_width=True)
                 
-                # График
-                fig = px.bar(recommendations.reset_index(), 
+                # Графики
+                fig = px.line(df_rec, x="date", y="avg_demand", color="tread_pattern",
+                              title="Прогнозируемый спрос по типам протектора")
+                st.plotly_chart(fig, use_container_width=True)
+                
+                df_total = df_rec.groupby("tread_pattern").apply(
+                    lambda g: g["total_demand"].sum() / g["products_count"].sum()
+                ).rename("avg_demand").reset_index().sort_values("avg_demand", ascending=False)
+                fig = px.bar(df_total,
                            x="tread_pattern", y="avg_demand",
                            title="Средний прогнозируемый спрос по типам протектора")
                 st.plotly_chart(fig, use_container_width=True)
@@ -307,28 +326,20 @@ elif page == "🔮 Прогнозы":
         
         # Прогнозы по товарам
         st.subheader("Прогнозы по товарам")
-        products_with_forecasts = session.query(Product).join(Forecast).distinct().all()
+        products_with_forecasts = data.get_products_with_forecasts()
         
         if products_with_forecasts:
             selected_product = st.selectbox(
                 "Выберите товар",
                 products_with_forecasts,
-                format_func=lambda p: f"{p.name} ({p.tread_pattern or 'без типа'})"
+                format_func=lambda p: f"{p[1]} ({p[2] or 'без типа'})"
             )
             
             if selected_product:
-                forecasts = session.query(Forecast).filter(
-                    Forecast.product_id == selected_product.id
-                ).order_by(Forecast.date).limit(30).all()
+                product_id, product_name, _ = selected_product
+                df_forecasts = data.get_product_forecasts(product_id)
                 
-                if forecasts:
-                    df_forecasts = pd.DataFrame([{
-                        "Дата": f.date,
-                        "Прогноз": f.yhat,
-                        "Нижняя граница": f.yhat_lower,
-                        "Верхняя граница": f.yhat_upper
-                    } for f in forecasts])
-                    
+                if not df_forecasts.empty:
                     fig = go.Figure()
                     fig.add_trace(go.Scatter(x=df_forecasts["Дата"], y=df_forecasts["Прогноз"],
                                            mode='lines+markers', name='Прогноз'))
@@ -337,7 +348,7 @@ elif page == "🔮 Прогнозы":
                     fig.add_trace(go.Scatter(x=df_forecasts["Дата"], y=df_forecasts["Нижняя граница"],
                                            fill='tonexty', mode='lines', line_color='gray',
                                            fillcolor='rgba(200,200,200,0.3)', name='Доверительный интервал'))
-                    fig.update_layout(title=f"Прогноз спроса для: {selected_product.name}")
+                    fig.update_layout(title=f"Прогноз спроса для: {product_name}")
                     st.plotly_chart(fig, use_container_width=True)
 
 # Настройки
@@ -347,7 +358,7 @@ elif page == "⚙️ Настройки":
     # Парсинг товаров
     st.subheader("Парсинг товаров с сайта")
     
-    if not SCRAPING_AVAILABLE:
+    if not scraping_available():
         st.error("Модули парсинга недоступны. Проверьте установку зависимостей.")
         st.stop()
     
@@ -356,49 +367,33 @@ elif page == "⚙️ Настройки":
     scrape_url = st.text_input("URL для парсинга", value=default_url)
     max_pages = st.number_input("Максимум страниц", min_value=1, max_value=10, value=1)
     
-    if st.button("🕷️ Спарсить товары", type="primary"):
-        if not scrape_url:
-            st.error("Укажите URL для парсинга")
+    if not scrape_url:
+        st.error("Укажите URL для парсинга")
+    else:
+        # Явно указываем URL, чтобы избежать проблем с конфигурацией
+        submit_job_button("🕷️ Спарсить товары", "scrape", {"url": scrape_url, "max_pages": int(max_pages)},
+                          type="primary")
+    show_jobs(["scrape"])
+    
+    last_scrape = list_jobs(limit=1, kinds=["scrape"], status="succeeded")
+    if last_scrape and last_scrape[0]["result"]:
+        result = last_scrape[0]["result"]
+        if result["scraped"]:
+            # Показываем примеры
+            with st.expander(f"Последний парсинг: спарсено {result['scraped']}, сохранено {result['saved']}"):
+                for p in result["examples"]:
+                    st.write(f"**{p.get('name')}** - {p.get('category') or '-'}")
         else:
-            with st.spinner("Парсинг товаров..."):
-                try:
-                    # Явно указываем URL, чтобы избежать проблем с конфигурацией
-                    products = scrape_products(category_url=scrape_url, max_pages=max_pages)
-                    if products:
-                        saved = save_products(products)
-                        st.success(f"✓ Спарсено и сохранено товаров: {len(saved)}")
-                        
-                        # Показываем примеры
-                        with st.expander("Посмотреть найденные товары"):
-                            for p in products[:10]:
-                                st.write(f"**{p.get('name')}** - {p.get('category', '-')}")
-                    else:
-                        st.warning("Товары не найдены. Проверьте URL и структуру страницы.")
-                except Exception as e:
-                    st.error(f"Ошибка при парсинге: {e}")
-                    import traceback
-                    with st.expander("Детали ошибки"):
-                        st.code(traceback.format_exc())
+            st.warning("Последний парсинг: товары не найдены. Проверьте URL и структуру страницы.")
     
     # Сбор трендов
     st.subheader("Сбор данных Google Trends")
-    if not SCRAPING_AVAILABLE:
-        st.warning("Модули парсинга недоступны")
-    elif st.button("📈 Собрать тренды", type="primary"):
-        with st.spinner("Сбор данных трендов..."):
-            try:
-                trends = collect_tire_trends()
-                if trends:
-                    saved = save_traffic_metrics(trends)
-                    st.success(f"✓ Собрано и сохранено метрик: {saved}")
-                else:
-                    st.warning("Данные трендов не найдены")
-            except Exception as e:
-                st.error(f"Ошибка: {e}")
+    submit_job_button("📈 Собрать тренды", "trends", type="primary")
+    show_jobs(["trends"])
     
     # Статистика БД
     st.subheader("Статистика базы данных")
-    stats = get_db_stats()
+    stats = data.get_db_stats()
     st.json(stats)
     
     # Очистка данных
@@ -408,20 +403,24 @@ elif page == "⚙️ Настройки":
     col1, col2, col3 = st.columns(3)
     with col1:
         if st.button("🗑️ Очистить прогнозы"):
-            session = get_session()
-            session.query(Forecast).delete()
-            session.commit()
+            with data.session_scope() as session:
+                session.query(ForecastPatternSummary).delete()
+                session.query(Forecast).delete()
+                session.query(ForecastRun).delete()
+                session.commit()
+            data.invalidate("forecasts")
             st.success("Прогнозы удалены")
     with col2:
         if st.button("🗑️ Очистить тренды"):
-            session = get_session()
-            session.query(TrafficMetric).delete()
-            session.commit()
+            with data.session_scope() as session:
+                session.query(MetricValue).delete()
+                session.commit()
+            data.invalidate("trends")
             st.success("Тренды удалены")
     with col3:
         if st.button("🗑️ Очистить товары"):
-            session = get_session()
-            session.query(Product).delete()
-            session.commit()
+            with data.session_scope() as session:
+                session.query(Product).delete()
+                session.commit()
+            data.invalidate("products")
             st.success("Товары удалены")
-
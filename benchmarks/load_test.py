@@ -0,0 +1,206 @@
+"""
+Нагрузочный тест API: запросы в секунду и задержки на локальном сервере
+
+Потоки с keep-alive соединениями по кругу запрашивают маршруты в течение --duration
+секунд и считают ответы, ошибки и перцентили задержки. С --spawn скрипт сам поднимает
+gunicorn (gunicorn.conf.py, src.wsgi:app) с --workers воркерами и гасит его в конце;
+в отчете - запросов в секунду на воркер (на ядро, если воркеров не больше ядер).
+
+    python -m benchmarks.load_test --spawn --workers 2 --duration 15 --concurrency 16
+    python -m benchmarks.load_test --url http://127.0.0.1:8000 --paths /api/products
+
+Клиент работает в одном процессе Python: если его загрузка CPU близка к 100%,
+ограничивает он, а не сервер - запустите несколько копий или уменьшите --concurrency.
+"""
+import argparse
+import http.client
+import os
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Dict, List, Optional
+from urllib.parse import urlsplit
+
+from benchmarks.run import BENCH_DIR, write_report
+
+PROJECT_ROOT = os.path.dirname(BENCH_DIR)
+DEFAULT_PATHS = [
+    "/api/products",
+    "/api/forecasts?days=7",
+    "/api/analytics/demand-by-pattern",
+    "/api/recommendations/tread-pattern",
+]
+READY_TIMEOUT_S = 30.0
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Нагрузочный тест API")
+    parser.add_argument("--url", default="http://127.0.0.1:8000", help="адрес сервера")
+    parser.add_argument("--paths", help="маршруты через запятую (по умолчанию - основные GET API)")
+    parser.add_argument("--concurrency", type=int, default=16, help="параллельных соединений")
+    parser.add_argument("--duration", type=float, default=10.0, help="секунд замера")
+    parser.add_argument("--warmup", type=float, default=2.0, help="секунд прогрева (не учитываются)")
+    parser.add_argument("--spawn", action="store_true", help="поднять gunicorn на адресе --url")
+    parser.add_argument("--workers", type=int, default=2, help="воркеров gunicorn при --spawn")
+    parser.add_argument("--threads", type=int, default=1, help="потоков на воркер при --spawn")
+    parser.add_argument("--output", help="файл результатов (по умолчанию benchmarks/results/load_<время>.json)")
+    return parser.parse_args()
+
+
+def spawn_server(url: str, workers: int, threads: int) -> subprocess.Popen:
+    """Запустить gunicorn с конфигурацией проекта и дождаться ответа /metrics"""
+    parts = urlsplit(url)
+    env = dict(os.environ, WEB_CONCURRENCY=str(workers), GUNICORN_THREADS=str(threads))
+    process = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "-c", os.path.join(PROJECT_ROOT, "gunicorn.conf.py"),
+         "--bind", parts.netloc, "src.wsgi:app"],
+        cwd=PROJECT_ROOT, env=env
+    )
+    deadline = time.monotonic() + READY_TIMEOUT_S
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise SystemExit(f"gunicorn завершился с кодом {process.returncode}")
+        try:
+            conn = http.client.HTTPConnection(parts.hostname, parts.port, timeout=1)
+            conn.request("GET", "/metrics")
+            if conn.getresponse().status == 200:
+                conn.close()
+                return process
+        except OSError:
+            time.sleep(0.2)
+    process.terminate()
+    raise SystemExit(f"gunicorn не ответил за {READY_TIMEOUT_S:.0f} с")
+
+
+class LoadWorker(threading.Thread):
+    """Одно keep-alive соединение: запросы по кругу до остановки"""
+
+    def __init__(self, url: str, paths: List[str], offset: int, state: Dict):
+        super().__init__(daemon=True)
+        parts = urlsplit(url)
+        self.host, self.port = parts.hostname, parts.port or 80
+        self.paths = paths
+        self.offset = offset
+        self.state = state
+        self.latencies: List[float] = []
+        self.statuses: Counter = Counter()
+
+    def _connect(self) -> http.client.HTTPConnection:
+        return http.client.HTTPConnection(self.host, self.port, timeout=30)
+
+    def run(self):
+        conn = self._connect()
+        i = self.offset
+        while not self.state["stop"]:
+            path = self.paths[i % len(self.paths)]
+            i += 1
+            started = time.perf_counter()
+            try:
+                conn.request("GET", path)
+                response = conn.getresponse()
+                response.read()
+                status = str(response.status)
+            except (OSError, http.client.HTTPException) as e:
+                status = type(e).__name__
+                conn.close()
+                conn = self._connect()
+            elapsed = time.perf_counter() - started
+            if self.state["measuring"]:
+                self.latencies.append(elapsed)
+                self.statuses[status] += 1
+        conn.close()
+
+
+def percentile(values: List[float], q: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def run_load(url: str, paths: List[str], concurrency: int, duration: float, warmup: float) -> Dict:
+    state = {"stop": False, "measuring": False}
+    workers = [LoadWorker(url, paths, i, state) for i in range(concurrency)]
+    for worker in workers:
+        worker.start()
+    time.sleep(warmup)
+
+    state["measuring"] = True
+    started = time.perf_counter()
+    cpu_started = time.process_time()
+    time.sleep(duration)
+    state["measuring"] = False
+    elapsed = time.perf_counter() - started
+    client_cpu = (time.process_time() - cpu_started) / elapsed
+
+    state["stop"] = True
+    for worker in workers:
+        worker.join()
+
+    latencies = [l for w in workers for l in w.latencies]
+    statuses: Counter = Counter()
+    for worker in workers:
+        statuses.update(worker.statuses)
+    ok = statuses.get("200", 0)
+    return {
+        "requests": len(latencies),
+        "ok": ok,
+        "errors": len(latencies) - ok,
+        "statuses": dict(statuses),
+        "duration_s": round(elapsed, 3),
+        "rps": round(len(latencies) / elapsed, 1),
+        "ok_rps": round(ok / elapsed, 1),
+        "latency_ms": {
+            "mean": round(statistics.mean(latencies) * 1000, 2) if latencies else None,
+            "p50": round(percentile(latencies, 0.50) * 1000, 2) if latencies else None,
+            "p95": round(percentile(latencies, 0.95) * 1000, 2) if latencies else None,
+            "p99": round(percentile(latencies, 0.99) * 1000, 2) if latencies else None,
+        },
+        # Доля одного ядра, занятая клиентом; около 1.0 - упираемся в клиент
+        "client_cpu": round(client_cpu, 2),
+    }
+
+
+def main() -> int:
+    args = parse_args()
+    paths = [p.strip() for p in args.paths.split(",")] if args.paths else DEFAULT_PATHS
+
+    server = spawn_server(args.url, args.workers, args.threads) if args.spawn else None
+    try:
+        result = run_load(args.url, paths, args.concurrency, args.duration, args.warmup)
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait(timeout=30)
+
+    cores = os.cpu_count() or 1
+    if args.spawn:
+        # Воркеров больше, чем ядер, - делим на ядра: они и ограничивают пропускную способность
+        result["ok_rps_per_core"] = round(result["ok_rps"] / min(args.workers, cores), 1)
+
+    print(f"Запросов: {result['requests']} за {result['duration_s']} с, {result['rps']}/с "
+          f"(успешных {result['ok_rps']}/с), ошибок {result['errors']}")
+    if "ok_rps_per_core" in result:
+        print(f"На ядро: {result['ok_rps_per_core']} запросов/с")
+    latency = result["latency_ms"]
+    print(f"Задержка, мс: среднее {latency['mean']}, p50 {latency['p50']}, p95 {latency['p95']}, p99 {latency['p99']}")
+    if result["client_cpu"] > 0.9:
+        print(f"Внимание: клиент занял {result['client_cpu']:.0%} ядра - результат ограничен клиентом")
+
+    write_report("load", {
+        "cpu_count": cores,
+        "url": args.url,
+        "paths": paths,
+        "concurrency": args.concurrency,
+        "spawned": args.spawn,
+        "workers": args.workers if args.spawn else None,
+        "threads": args.threads if args.spawn else None,
+    }, {"result": result}, args.output)
+    return 0 if result["ok"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,321 @@
+"""
+Локальный двойник сайта каталога для офлайн-бенчмарков парсера
+
+Отдает страницы каталога (/produkciya-2/?page=N) и страницы товаров (/shini/<slug>/)
+в разметке, которую разбирают ProductScraper и ProductScraperSafe. Страницы либо
+генерируются детерминированно (MockSiteConfig.seed), либо берутся из каталога
+записанных ответов (pages_dir, см. scraper_bench --record).
+
+Задержка ответа - latency_ms плюс разброс jitter_ms, который зависит только от seed
+и пути, а не от порядка запросов: прогоны с параллельными запросами сравнимы.
+Для проверки кэширования сервер отдает ETag и отвечает 304 на If-None-Match,
+для проверки ограничения частоты - 429 при превышении rate_limit запросов в секунду.
+
+    python -m benchmarks.mock_site --port 8765 --pages 5 --latency-ms 50
+"""
+import argparse
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+CATALOG_PATH = "/produkciya-2/"
+# Адрес, под которым страницы были записаны: в ссылках он заменяется на адрес двойника
+ORIGIN_URL = "https://www.jsc-niir.ru"
+RECORDED_INDEX = "index.json"
+
+CATEGORIES = ["Грузовые шины", "Легко Грузовые шины"]
+TREAD_PATTERNS = ["дорожный", "универсальный", "внедорожный", "зимний", "всесезонный"]
+# Размеры в формате, который распознают регулярные выражения обоих парсеров
+SIZES = ["420/70-457", "12R18", "1200/500-508", "530/70-21", "15R22", "360/70-24"]
+MODEL_LETTERS = ["", "А", "Б", "М"]
+
+
+@dataclass
+class MockSiteConfig:
+    pages: int = 5
+    products_per_page: int = 20
+    latency_ms: float = 0.0
+    jitter_ms: float = 0.0
+    # Запросов в секунду сверх которых отвечать 429; 0 - без ограничения
+    rate_limit: float = 0.0
+    seed: int = 42
+    # Каталог записанных ответов; пусто - синтетические страницы
+    pages_dir: Optional[str] = None
+
+
+def product_slug(page: int, position: int) -> str:
+    return f"k-{page:03d}-{position:03d}"
+
+
+def _product(config: MockSiteConfig, page: int, position: int) -> Dict:
+    # Свой генератор на товар - содержимое не зависит от порядка обращений
+    rng = random.Random(f"{config.seed}:{page}:{position}")
+    number = 100 + (page - 1) * config.products_per_page + position
+    size = SIZES[rng.randrange(len(SIZES))]
+    return {
+        "slug": product_slug(page, position),
+        "name": f"К-{number}{MODEL_LETTERS[rng.randrange(len(MODEL_LETTERS))]} {size}",
+        "category": CATEGORIES[rng.randrange(len(CATEGORIES))],
+        "size": size,
+        "tread_pattern": TREAD_PATTERNS[rng.randrange(len(TREAD_PATTERNS))],
+        "layers": 8 + rng.randrange(8),
+        "price": rng.randrange(20, 150) * 1000,
+    }
+
+
+def render_catalog(config: MockSiteConfig, page: int) -> str:
+    """Страница каталога; после последней страницы - страница без товаров (парсер останавливается)"""
+    items = []
+    if 1 <= page <= config.pages:
+        for position in range(config.products_per_page):
+            product = _product(config, page, position)
+            items.append(
+                f'<li><strong>{product["name"]}</strong> <span>{product["category"]}</span> '
+                f'<a href="/shini/{product["slug"]}/">Подробнее</a></li>'
+            )
+    return (
+        "<html><head><meta charset=\"utf-8\"><title>Продукция</title></head><body>"
+        "<h1>Продукция</h1><h2>Шины</h2>"
+        f"<ul>{''.join(items)}</ul>"
+        "</body></html>"
+    )
+
+
+def render_product(config: MockSiteConfig, slug: str) -> Optional[str]:
+    try:
+        _, page, position = slug.split("-")
+        page, position = int(page), int(position)
+    except ValueError:
+        return None
+    if not (1 <= page <= config.pages and 0 <= position < config.products_per_page):
+        return None
+    product = _product(config, page, position)
+    rows = [
+        ("Размер", product["size"]),
+        ("Тип протектора", product["tread_pattern"]),
+        ("Слойность", str(product["layers"])),
+        ("Категория", product["category"]),
+    ]
+    table = "".join(f"<tr><td>{key}</td><td>{value}</td></tr>" for key, value in rows)
+    price = f"{product['price']:,}".replace(",", " ")
+    return (
+        f"<html><head><meta charset=\"utf-8\"><title>{product['name']}</title></head><body>"
+        f"<h1>{product['name']}</h1>"
+        f"<table>{table}</table>"
+        f"<div class=\"price\">{price} руб.</div>"
+        f"<div class=\"description\">Шина {product['name']}, {product['tread_pattern']} рисунок протектора.</div>"
+        "</body></html>"
+    )
+
+
+class _RateLimiter:
+    """Окно в одну секунду: больше limit запросов за окно - отказ"""
+
+    def __init__(self, limit: float):
+        self.limit = limit
+        self._window = 0
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        if self.limit <= 0:
+            return True
+        window = int(time.monotonic())
+        with self._lock:
+            if window != self._window:
+                self._window, self._count = window, 0
+            self._count += 1
+            return self._count <= self.limit
+
+
+class MockSite:
+    """
+    Двойник сайта в фоновом потоке
+
+        with MockSite(MockSiteConfig(pages=3, latency_ms=20)) as site:
+            scraper.base_url = site.base_url
+            ...
+            print(site.stats())
+    """
+
+    def __init__(self, config: MockSiteConfig, host: str = "127.0.0.1", port: int = 0):
+        self.config = config
+        self._recorded = self._load_recorded(config.pages_dir) if config.pages_dir else None
+        self._limiter = _RateLimiter(config.rate_limit)
+        self._lock = threading.Lock()
+        self._stats = {"requests": 0, "bytes": 0, "status": {}, "in_flight": 0, "max_in_flight": 0}
+        self._server = ThreadingHTTPServer((host, port), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def catalog_url(self) -> str:
+        return f"{self.base_url}{CATALOG_PATH}"
+
+    def start(self) -> "MockSite":
+        self._thread = threading.Thread(target=self._server.serve_forever, name="mock-site", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+        if self._thread is not None:
+            self._thread.join()
+
+    def __enter__(self) -> "MockSite":
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+        return False
+
+    def stats(self) -> Dict:
+        """Счетчики сервера: запросы, байты, ответы по статусам, пик параллельных запросов"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats["status"] = dict(self._stats["status"])
+        stats.pop("in_flight")
+        return stats
+
+    def reset_stats(self) -> None:
+        with self._lock:
+            self._stats.update(requests=0, bytes=0, status={}, max_in_flight=0)
+
+    # --- Ответы -----------------------------------------------------------
+
+    @staticmethod
+    def _load_recorded(pages_dir: str) -> Dict[str, str]:
+        with open(os.path.join(pages_dir, RECORDED_INDEX), encoding="utf-8") as f:
+            index = json.load(f)
+        pages = {}
+        for key, filename in index.items():
+            with open(os.path.join(pages_dir, filename), encoding="utf-8") as f:
+                pages[key] = f.read()
+        return pages
+
+    def _delay(self, path: str) -> float:
+        jitter = 0.0
+        if self.config.jitter_ms:
+            jitter = random.Random(f"{self.config.seed}:{path}").uniform(-1, 1) * self.config.jitter_ms
+        return max(0.0, self.config.latency_ms + jitter) / 1000.0
+
+    def render(self, path: str, query: str) -> Tuple[int, Optional[str]]:
+        """Код ответа и HTML для пути (без задержки и ограничений)"""
+        if self._recorded is not None:
+            key = f"{path}?{query}" if query else path
+            body = self._recorded.get(key)
+            if body is None:
+                return 404, None
+            return 200, body.replace(ORIGIN_URL, self.base_url)
+
+        if path.rstrip("/") == CATALOG_PATH.rstrip("/"):
+            page = parse_qs(query).get("page", ["1"])[0]
+            return 200, render_catalog(self.config, int(page) if page.isdigit() else 1)
+        if path.startswith("/shini/"):
+            body = render_product(self.config, path[len("/shini/"):].strip("/"))
+            return (200, body) if body is not None else (404, None)
+        return 404, None
+
+    def _count(self, status: int, size: int) -> None:
+        with self._lock:
+            self._stats["requests"] += 1
+            self._stats["bytes"] += size
+            self._stats["status"][str(status)] = self._stats["status"].get(str(status), 0) + 1
+
+    def _track_in_flight(self, delta: int) -> None:
+        with self._lock:
+            self._stats["in_flight"] += delta
+            self._stats["max_in_flight"] = max(self._stats["max_in_flight"], self._stats["in_flight"])
+
+    def _handler_class(self):
+        site = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                site._track_in_flight(1)
+                try:
+                    self._respond()
+                finally:
+                    site._track_in_flight(-1)
+
+            def _respond(self):
+                parts = urlsplit(self.path)
+                if not site._limiter.allow():
+                    return self._send(429, b"", {"Retry-After": "1"})
+
+                delay = site._delay(parts.path)
+                if delay:
+                    time.sleep(delay)
+
+                status, body = site.render(parts.path, parts.query)
+                if body is None:
+                    return self._send(status, b"")
+                payload = body.encode("utf-8")
+                etag = '"' + hashlib.md5(payload).hexdigest() + '"'
+                if self.headers.get("If-None-Match") == etag:
+                    return self._send(304, b"", {"ETag": etag})
+                self._send(status, payload, {"ETag": etag, "Content-Type": "text/html; charset=utf-8"})
+
+            def _send(self, status: int, payload: bytes, headers: Optional[Dict[str, str]] = None):
+                # Учет до отправки: клиент, получивший ответ, видит его в stats()
+                site._count(status, len(payload))
+                self.send_response(status)
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                if payload:
+                    self.wfile.write(payload)
+
+            def log_message(self, format, *args):
+                # Журнал каждого запроса искажает замеры
+                pass
+
+        return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Локальный двойник сайта каталога")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--pages", type=int, default=5)
+    parser.add_argument("--products-per-page", type=int, default=20)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--jitter-ms", type=float, default=0.0)
+    parser.add_argument("--rate-limit", type=float, default=0.0, help="запросов в секунду; 0 - без ограничения")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--pages-dir", help="каталог записанных ответов (scraper_bench --record)")
+    args = parser.parse_args()
+
+    config = MockSiteConfig(pages=args.pages, products_per_page=args.products_per_page,
+                            latency_ms=args.latency_ms, jitter_ms=args.jitter_ms,
+                            rate_limit=args.rate_limit, seed=args.seed, pages_dir=args.pages_dir)
+    site = MockSite(config, args.host, args.port).start()
+    print(f"Каталог: {site.catalog_url} (Ctrl+C - остановить)")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        site.stop()
+        print(json.dumps(site.stats(), ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,308 @@
+"""
+Бенчмарки горячих путей на синтетических данных
+
+Засевает отдельную БД (по умолчанию SQLite-файл benchmarks/bench.sqlite),
+замеряет save_traffic_metrics, create_training_dataset, train_demand_model,
+generate_forecasts и маршруты API, пишет результаты в JSON и сравнивает
+медианы с сохраненным базовым прогоном (benchmarks/baseline.json).
+
+    python -m benchmarks.run --products 200 --days 180 --repeat 3
+    python -m benchmarks.run --save-baseline          # зафиксировать текущие результаты
+    python -m benchmarks.run --db-url postgresql+psycopg2://.../bench --reset   # БД с миграциями
+
+Код выхода 1 - есть регрессии (медиана хуже базовой больше чем на --tolerance) или случай
+из базового прогона завершился ошибкой либо не выполнился.
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional, Sequence
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_DB = f"sqlite:///{os.path.join(BENCH_DIR, 'bench.sqlite')}"
+DEFAULT_BASELINE = os.path.join(BENCH_DIR, "baseline.json")
+RESULTS_DIR = os.path.join(BENCH_DIR, "results")
+# Разница медиан меньше этого порога (секунды) - шум, а не регрессия
+MIN_DELTA_S = 0.005
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Бенчмарки пайплайна и API на синтетических данных")
+    parser.add_argument("--db-url", default=DEFAULT_DB, help="БД для бенчмарка (не рабочая!)")
+    parser.add_argument("--reset", action="store_true", help="очистить БД не-SQLite перед засевом")
+    parser.add_argument("--products", type=int, default=200)
+    parser.add_argument("--days", type=int, default=180)
+    parser.add_argument("--train-days", type=int, default=30, help="окно create_training_dataset")
+    parser.add_argument("--forecast-days", type=int, default=7)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--cases", help="через запятую; по умолчанию все")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--save-baseline", action="store_true", help="записать результаты как базовые")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="допустимое замедление медианы (0.2 = 20%%)")
+    parser.add_argument("--output", help="файл результатов (по умолчанию benchmarks/results/bench_<время>.json)")
+    return parser.parse_args()
+
+
+def prepare_database(db_url: str, reset: bool) -> None:
+    """
+    Чистая БД бенчмарка
+
+    SQLite-файл пересоздается по метаданным моделей. Другие БД должны быть с примененными
+    миграциями (alembic upgrade head: партиции forecasts и т.п.); --reset удаляет из них все строки.
+    """
+    from sqlalchemy import delete, inspect
+    from src.db import Base, engine
+
+    if engine is None:
+        raise SystemExit(f"Не удалось создать engine для {db_url}")
+    if db_url.startswith("sqlite:///"):
+        path = db_url[len("sqlite:///"):]
+        engine.dispose()
+        if os.path.exists(path):
+            os.remove(path)
+        Base.metadata.create_all(engine)
+        return
+
+    if not inspect(engine).has_table("products"):
+        raise SystemExit("Схемы нет: примените миграции к БД бенчмарка (alembic upgrade head)")
+    with engine.begin() as conn:
+        has_rows = conn.execute(Base.metadata.tables["products"].select().limit(1)).first() is not None
+        if has_rows and not reset:
+            raise SystemExit("В БД есть данные; запустите с --reset (все строки будут удалены)")
+        for table in reversed(Base.metadata.sorted_tables):
+            conn.execute(delete(table))
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BENCH_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except Exception:
+        return None
+
+
+def measure(func: Callable[[int], object], repeat: int) -> Dict:
+    """Запустить func(номер прогона) repeat раз; ошибка прерывает замеры случая"""
+    runs = []
+    for i in range(repeat):
+        started = time.perf_counter()
+        func(i)
+        runs.append(time.perf_counter() - started)
+    return {
+        "runs_s": [round(r, 6) for r in runs],
+        "median_s": round(statistics.median(runs), 6),
+        "min_s": round(min(runs), 6),
+    }
+
+
+def build_cases(args, seeded: Dict, state: Dict) -> Dict[str, Callable[[int], object]]:
+    """Случаи бенчмарка в порядке выполнения (обучение готовит модель для прогноза)"""
+    from src.db import SessionLocal
+    from src.models import Product
+    from src.etl.load_to_db import save_traffic_metrics
+    from src.features.make_features import create_training_dataset
+    from src.modeling.train import train_demand_model
+    from src.modeling.forecast import generate_forecasts
+
+    end_date = seeded["end_date"] - timedelta(days=1)
+    train_start = end_date - timedelta(days=args.train_days - 1)
+    forecast_dates = [seeded["end_date"] + timedelta(days=i) for i in range(1, args.forecast_days + 1)]
+
+    def bench_save_traffic_metrics(i: int):
+        # Новые имена рядов на каждый прогон - замеряется вставка, а не upsert
+        save_traffic_metrics([
+            {"date": seeded["start_date"] + timedelta(days=d), "metric_name": f"bench_save_{i}:{k}",
+             "region": "RU", "value": float(d)}
+            for k in range(5)
+            for d in range(args.days)
+        ])
+
+    def bench_create_training_dataset(i: int):
+        state["dataset"] = create_training_dataset(train_start, end_date)
+
+    def bench_train_demand_model(i: int):
+        model, _ = train_demand_model(dataset=state["dataset"])
+        if model is None:
+            raise RuntimeError("модель не обучена (нет целевой переменной)")
+        state["model"] = model
+
+    def bench_generate_forecasts(i: int):
+        session = SessionLocal()
+        try:
+            products = session.query(Product).all()
+            generate_forecasts(state["model"], products, forecast_dates, model_version=f"bench_{i}")
+        finally:
+            session.close()
+
+    cases = {
+        "save_traffic_metrics": bench_save_traffic_metrics,
+        "create_training_dataset": bench_create_training_dataset,
+        "train_demand_model": bench_train_demand_model,
+        "generate_forecasts": bench_generate_forecasts,
+    }
+
+    try:
+        from src.app import create_app
+        client = create_app().test_client()
+    except Exception as e:
+        state["api_error"] = f"{type(e).__name__}: {e}"
+        return cases
+
+    def api_case(path: str):
+        def bench(i: int):
+            response = client.get(path)
+            if response.status_code != 200:
+                raise RuntimeError(f"{path}: HTTP {response.status_code}")
+        return bench
+
+    for path in ("/api/products", f"/api/forecasts?days={args.forecast_days}",
+                 "/api/analytics/demand-by-pattern", "/api/recommendations/tread-pattern",
+                 "/api/analytics/trends/шины"):
+        cases[f"api GET {path}"] = api_case(path)
+    return cases
+
+
+def compare(results: Dict, baseline: Dict, tolerance: float,
+            cases: Optional[Sequence[str]] = None) -> List[Dict]:
+    """
+    Сравнить медианы с базовыми; вернуть строки сравнения
+
+    Случай из базового прогона (из cases, если они заданы), который завершился ошибкой
+    или не выполнился, - тоже провал: строка с failed и текстом ошибки.
+    """
+    rows = []
+    for name, base in baseline.get("results", {}).items():
+        if "median_s" not in base or (cases is not None and name not in cases):
+            continue
+        current = results.get(name)
+        if current is None or "median_s" not in current:
+            error = current.get("error") if current else None
+            rows.append({"case": name, "baseline_s": base["median_s"], "current_s": None, "ratio": None,
+                         "regression": False, "failed": True, "error": error or "случай не выполнен"})
+            continue
+        ratio = current["median_s"] / base["median_s"] if base["median_s"] else float("inf")
+        regression = ratio > 1 + tolerance and current["median_s"] - base["median_s"] > MIN_DELTA_S
+        rows.append({"case": name, "baseline_s": base["median_s"], "current_s": current["median_s"],
+                     "ratio": round(ratio, 3), "regression": regression, "failed": False})
+    return rows
+
+
+def write_report(prefix: str, meta: Dict, body: Dict, output: Optional[str] = None) -> Dict:
+    """
+    Записать отчет {"meta": ..., **body} в output или benchmarks/results/<prefix>_<время>.json
+
+    К meta добавляются время, коммит и версии Python и платформы.
+    """
+    report = {
+        "meta": {
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "commit": git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            **meta,
+        },
+        **body,
+    }
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    output = output or os.path.join(RESULTS_DIR, f"{prefix}_{datetime.now():%Y%m%d_%H%M%S}.json")
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"Результаты: {output}")
+    return report
+
+
+def check_baseline(report: Dict, baseline_path: str, save: bool, tolerance: float,
+                   params: Sequence[str], cases: Optional[Sequence[str]] = None, width: int = 50) -> int:
+    """
+    Сохранить отчет как базовый (save) или сравнить с базовым; вернуть код выхода
+
+    Args:
+        params: поля meta, при расхождении которых сравнение только ориентировочное
+        cases: выполнявшиеся случаи (остальные случаи базового прогона не проверяются)
+    """
+    if save:
+        with open(baseline_path, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"Базовые результаты сохранены: {baseline_path}")
+        return 0
+
+    if not os.path.exists(baseline_path):
+        print("Базовых результатов нет - сравнение пропущено (создайте их с --save-baseline)")
+        return 0
+
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = json.load(f)
+    mismatched = [p for p in params if baseline.get("meta", {}).get(p) != report["meta"].get(p)]
+    if mismatched:
+        print(f"Внимание: параметры отличаются от базовых ({', '.join(mismatched)}) - сравнение ориентировочное")
+
+    rows = compare(report["results"], baseline, tolerance, cases)
+    for row in rows:
+        if row["failed"]:
+            print(f"  {row['case']:<{width}} {row['baseline_s']:.4f} -> ПРОВАЛ: {row['error']}")
+            continue
+        mark = "РЕГРЕССИЯ" if row["regression"] else "ok"
+        print(f"  {row['case']:<{width}} {row['baseline_s']:.4f} -> {row['current_s']:.4f} с (x{row['ratio']}) {mark}")
+    return 1 if any(row["regression"] or row["failed"] for row in rows) else 0
+
+
+def main() -> int:
+    args = parse_args()
+    # БД бенчмарка подставляется до импорта src.* - engine создается при импорте src.db
+    os.environ["DATABASE_URL"] = args.db_url
+
+    from loguru import logger
+    from benchmarks.synthetic import SyntheticConfig, seed_catalog
+
+    logger.remove()
+    logger.add(sys.stderr, level="WARNING")
+
+    prepare_database(args.db_url, args.reset)
+    started = time.perf_counter()
+    seeded = seed_catalog(SyntheticConfig(products=args.products, days=args.days, seed=args.seed))
+    seed_s = time.perf_counter() - started
+    print(f"Засеяно за {seed_s:.1f} с: товаров {seeded['products']}, точек трендов {seeded['metric_points']}, "
+          f"снимков цен {seeded['price_snapshots']}")
+
+    state: Dict = {}
+    cases = build_cases(args, seeded, state)
+    if "api_error" in state:
+        print(f"Маршруты API пропущены: приложение не создается ({state['api_error']})")
+    selected = [c.strip() for c in args.cases.split(",")] if args.cases else list(cases)
+
+    results: Dict[str, Dict] = {}
+    for name in selected:
+        if name not in cases:
+            print(f"Неизвестный случай: {name}")
+            continue
+        try:
+            results[name] = measure(cases[name], args.repeat)
+            print(f"  {name:<50} медиана {results[name]['median_s']:.4f} с")
+        except Exception as e:
+            results[name] = {"error": f"{type(e).__name__}: {e}"}
+            print(f"  {name:<50} ошибка: {results[name]['error']}")
+
+    report = write_report("bench", {
+        "dialect": args.db_url.split(":", 1)[0],
+        "products": args.products,
+        "days": args.days,
+        "train_days": args.train_days,
+        "forecast_days": args.forecast_days,
+        "repeat": args.repeat,
+        "seed": args.seed,
+        "seed_s": round(seed_s, 3),
+    }, {"results": results}, args.output)
+    return check_baseline(report, args.baseline, args.save_baseline, args.tolerance,
+                          ("products", "days", "train_days", "forecast_days", "dialect"),
+                          selected if args.cases else None)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
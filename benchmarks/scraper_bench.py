@@ -0,0 +1,240 @@
+"""
+Офлайн-бенчмарк парсеров каталога на локальном двойнике сайта
+
+Поднимает benchmarks.mock_site, направляет на него ProductScraper и ProductScraperSafe
+(scrape_catalog) и замеряет общее время, страниц в секунду и время разбора одной
+страницы - без сети и без паузы REQUESTS_SLEEP_BETWEEN (задается --sleep).
+Задержка и разброс ответов детерминированы, поэтому изменения параллельности,
+кэширования и ограничения частоты можно сравнивать между прогонами.
+
+    python -m benchmarks.scraper_bench --pages 5 --latency-ms 50 --repeat 3
+    python -m benchmarks.scraper_bench --save-baseline
+    python -m benchmarks.scraper_bench --record benchmarks/pages --pages 2   # записать живой сайт
+    python -m benchmarks.scraper_bench --pages-dir benchmarks/pages         # прогон на записи
+
+Код выхода 1 - есть регрессии по медиане общего времени (см. --tolerance) или парсер
+из базового прогона завершился ошибкой.
+"""
+import argparse
+import hashlib
+import json
+import os
+import statistics
+import sys
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from functools import wraps
+from typing import Callable, Dict, List
+from urllib.parse import urlsplit
+
+from benchmarks.mock_site import CATALOG_PATH, RECORDED_INDEX, MockSite, MockSiteConfig
+from benchmarks.run import BENCH_DIR, check_baseline, write_report
+
+DEFAULT_BASELINE = os.path.join(BENCH_DIR, "scraper_baseline.json")
+# Методы парсера, время которых (без вложенных запросов) считается разбором страниц
+PARSE_METHODS = ("get_page", "extract_products_from_page", "extract_product_details")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Бенчмарк парсеров каталога на локальном двойнике сайта")
+    parser.add_argument("--scrapers", default="full,safe", help="через запятую: full (ProductScraper), safe")
+    parser.add_argument("--pages", type=int, default=5, help="страниц каталога (и max_pages парсера)")
+    parser.add_argument("--products-per-page", type=int, default=20)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--jitter-ms", type=float, default=0.0)
+    parser.add_argument("--rate-limit", type=float, default=0.0, help="запросов в секунду; 0 - без ограничения")
+    parser.add_argument("--sleep", type=float, default=0.0, help="REQUESTS_SLEEP_BETWEEN на время прогона")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--pages-dir", help="отдавать записанные страницы вместо синтетических")
+    parser.add_argument("--record", metavar="DIR", help="записать страницы живого сайта (SCRAPE_BASE_URL) и выйти")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--save-baseline", action="store_true", help="записать результаты как базовые")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="допустимое замедление медианы (0.2 = 20%%)")
+    parser.add_argument("--output", help="файл результатов (по умолчанию benchmarks/results/scraper_<время>.json)")
+    return parser.parse_args()
+
+
+class Probe:
+    """Собственное время обернутых функций: из времени вызова вычитается время вложенных оберток"""
+
+    def __init__(self):
+        self.self_s: Dict[str, float] = defaultdict(float)
+        self.calls: Dict[str, int] = defaultdict(int)
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def wrap(self, name: str, func: Callable) -> Callable:
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            stack = self._local.__dict__.setdefault("stack", [])
+            stack.append(0.0)
+            started = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                elapsed = time.perf_counter() - started
+                nested = stack.pop()
+                if stack:
+                    stack[-1] += elapsed
+                with self._lock:
+                    self.self_s[name] += elapsed - nested
+                    self.calls[name] += 1
+        return wrapper
+
+
+def scraper_factories() -> Dict[str, Callable]:
+    from src.etl import scrape_site
+    factories = {"full": (scrape_site, scrape_site.ProductScraper)}
+    try:
+        from src.etl import scrape_site_safe
+        factories["safe"] = (scrape_site_safe, scrape_site_safe.ProductScraperSafe)
+    except ImportError:
+        # Безопасный парсер требует beautifulsoup4
+        pass
+    return factories
+
+
+@contextmanager
+def sleep_between(module, seconds: float):
+    """Пауза между запросами парсера на время прогона (модуль читает ее из глобальной переменной)"""
+    previous = module.REQUESTS_SLEEP_BETWEEN
+    module.REQUESTS_SLEEP_BETWEEN = seconds
+    try:
+        yield
+    finally:
+        module.REQUESTS_SLEEP_BETWEEN = previous
+
+
+def run_once(module, scraper_cls, site: MockSite, args) -> Dict:
+    """Один обход каталога: время, страницы, разбор; счетчики сервера"""
+    scraper = scraper_cls()
+    scraper.base_url = site.base_url
+    probe = Probe()
+    scraper.session.get = probe.wrap("fetch", scraper.session.get)
+    for method in PARSE_METHODS:
+        if hasattr(scraper, method):
+            setattr(scraper, method, probe.wrap(method, getattr(scraper, method)))
+
+    site.reset_stats()
+    with sleep_between(module, args.sleep):
+        started = time.perf_counter()
+        products = scraper.scrape_catalog(site.catalog_url, max_pages=args.pages)
+        wall_s = time.perf_counter() - started
+
+    pages = probe.calls["fetch"]
+    parse_s = sum(probe.self_s[m] for m in PARSE_METHODS)
+    return {
+        "wall_s": wall_s,
+        "pages": pages,
+        "products": len(products),
+        "fetch_s": probe.self_s["fetch"],
+        "parse_s": parse_s,
+        "server": site.stats(),
+    }
+
+
+def summarize(runs: List[Dict]) -> Dict:
+    walls = [r["wall_s"] for r in runs]
+    last = runs[-1]
+    median_s = statistics.median(walls)
+    parse_per_page = [r["parse_s"] / r["pages"] for r in runs if r["pages"]]
+    return {
+        "runs_s": [round(w, 6) for w in walls],
+        "median_s": round(median_s, 6),
+        "min_s": round(min(walls), 6),
+        "pages": last["pages"],
+        "products": last["products"],
+        "pages_per_s": round(last["pages"] / median_s, 2) if median_s else None,
+        "parse_ms_per_page": round(statistics.median(parse_per_page) * 1000, 3) if parse_per_page else None,
+        "fetch_s": round(statistics.median(r["fetch_s"] for r in runs), 6),
+        "parse_s": round(statistics.median(r["parse_s"] for r in runs), 6),
+        "server": last["server"],
+    }
+
+
+def record_pages(directory: str, max_pages: int) -> int:
+    """Обойти живой сайт парсером ProductScraper и сохранить ответы для --pages-dir"""
+    from src.etl.scrape_site import ProductScraper
+
+    os.makedirs(directory, exist_ok=True)
+    index: Dict[str, str] = {}
+    scraper = ProductScraper()
+    session_get = scraper.session.get
+
+    def recording_get(url, *args, **kwargs):
+        response = session_get(url, *args, **kwargs)
+        if response.status_code == 200:
+            parts = urlsplit(response.url)
+            key = f"{parts.path}?{parts.query}" if parts.query else parts.path
+            filename = hashlib.sha1(key.encode("utf-8")).hexdigest()[:16] + ".html"
+            with open(os.path.join(directory, filename), "w", encoding="utf-8") as f:
+                f.write(response.text)
+            index[key] = filename
+        return response
+
+    scraper.session.get = recording_get
+    products = scraper.scrape_catalog(f"{scraper.base_url}{CATALOG_PATH}", max_pages=max_pages)
+    with open(os.path.join(directory, RECORDED_INDEX), "w", encoding="utf-8") as f:
+        json.dump(index, f, ensure_ascii=False, indent=2)
+    print(f"Записано страниц: {len(index)}, товаров: {len(products)} -> {directory}")
+    return len(index)
+
+
+def main() -> int:
+    args = parse_args()
+
+    from loguru import logger
+    logger.remove()
+    logger.add(sys.stderr, level="WARNING")
+
+    if args.record:
+        record_pages(args.record, args.pages)
+        return 0
+
+    factories = scraper_factories()
+    selected = [s.strip() for s in args.scrapers.split(",") if s.strip()]
+    config = MockSiteConfig(pages=args.pages, products_per_page=args.products_per_page,
+                            latency_ms=args.latency_ms, jitter_ms=args.jitter_ms,
+                            rate_limit=args.rate_limit, seed=args.seed, pages_dir=args.pages_dir)
+
+    results: Dict[str, Dict] = {}
+    with MockSite(config) as site:
+        print(f"Двойник сайта: {site.catalog_url}")
+        for name in selected:
+            case = f"scrape_catalog {name}"
+            if name not in factories:
+                results[case] = {"error": "парсер недоступен (нет зависимостей или неизвестное имя)"}
+                print(f"  {case:<30} пропущен: {results[case]['error']}")
+                continue
+            module, scraper_cls = factories[name]
+            try:
+                results[case] = summarize([run_once(module, scraper_cls, site, args) for _ in range(args.repeat)])
+            except Exception as e:
+                results[case] = {"error": f"{type(e).__name__}: {e}"}
+                print(f"  {case:<30} ошибка: {results[case]['error']}")
+                continue
+            r = results[case]
+            print(f"  {case:<30} медиана {r['median_s']:.3f} с, страниц {r['pages']} ({r['pages_per_s']}/с), "
+                  f"разбор {r['parse_ms_per_page']} мс/стр, товаров {r['products']}")
+
+    report = write_report("scraper", {
+        "pages": args.pages,
+        "products_per_page": args.products_per_page,
+        "latency_ms": args.latency_ms,
+        "jitter_ms": args.jitter_ms,
+        "rate_limit": args.rate_limit,
+        "sleep": args.sleep,
+        "repeat": args.repeat,
+        "seed": args.seed,
+        "pages_dir": args.pages_dir,
+    }, {"results": results}, args.output)
+    return check_baseline(report, args.baseline, args.save_baseline, args.tolerance,
+                          ("pages", "products_per_page", "latency_ms", "jitter_ms", "rate_limit", "sleep", "pages_dir"),
+                          [f"scrape_catalog {name}" for name in selected], width=30)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
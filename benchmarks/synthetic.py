@@ -0,0 +1,104 @@
+"""
+Синтетический каталог для бенчмарков: N товаров, D дней трендов и снимков цен
+
+Данные детерминированы (random.Random(seed)), поэтому прогоны с одинаковыми
+параметрами сравнимы между собой.
+"""
+import random
+from dataclasses import dataclass
+from datetime import date, timedelta
+from typing import Dict, List
+from sqlalchemy import insert
+
+from src.db import SessionLocal
+from src.models import Product, PriceSnapshot
+from src.etl.metrics_store import save_metric_values
+
+CATEGORIES = ["Шины для тракторов", "Шины для комбайнов", "Грузовые шины", "Шины для спецтехники"]
+TREAD_PATTERNS = ["зимние", "летние", "всесезонные", "дорожные", "внедорожные"]
+SIZES = ["420/70-457", "12R18", "16.9R38", "1200x500-508", "11.2-20", "21.3-24"]
+INSERT_CHUNK = 5000
+
+
+@dataclass
+class SyntheticConfig:
+    products: int = 200
+    days: int = 180
+    seed: int = 42
+
+
+def trend_keywords() -> List[str]:
+    """Ключевые слова трендов - те же, что ищет make_features.trend_keywords"""
+    return [c.lower() for c in CATEGORIES] + [f"{p} шины" for p in TREAD_PATTERNS] + ["шины"]
+
+
+def _seasonal(day: date, phase: int) -> float:
+    # Годовая волна с пиками весной/осенью, как у спроса на смену шин
+    return 50.0 + 30.0 * abs(((day.timetuple().tm_yday + phase) % 182) - 91) / 91.0
+
+
+def seed_catalog(config: SyntheticConfig, today: date = None) -> Dict:
+    """
+    Засеять БД: товары, тренды (хранилище метрик) и ежедневные снимки цен
+
+    Returns:
+        {"products": ..., "metric_points": ..., "price_snapshots": ..., "start_date", "end_date"}
+    """
+    rng = random.Random(config.seed)
+    today = today or date.today()
+    start_date = today - timedelta(days=config.days - 1)
+    days = [start_date + timedelta(days=i) for i in range(config.days)]
+
+    session = SessionLocal()
+    try:
+        products = [
+            Product(
+                sku=f"bench-{i:06d}",
+                name=f"К-{100 + i} {SIZES[i % len(SIZES)]}",
+                category=CATEGORIES[i % len(CATEGORIES)],
+                tread_pattern=TREAD_PATTERNS[rng.randrange(len(TREAD_PATTERNS))],
+                specifications={"размер": SIZES[i % len(SIZES)], "слойность": str(8 + i % 8)},
+            )
+            for i in range(config.products)
+        ]
+        session.add_all(products)
+        session.flush()
+
+        metric_points = save_metric_values(session, [
+            {"date": day, "metric_name": f"trend_keyword:{keyword}", "region": "RU",
+             "value": round(_seasonal(day, k * 17) + rng.uniform(-5, 5), 2)}
+            for k, keyword in enumerate(trend_keywords())
+            for day in days
+        ])
+
+        snapshots = 0
+        rows = []
+        for product in products:
+            base_price = rng.uniform(20000, 150000)
+            for day in days:
+                rows.append({
+                    "product_id": product.id, "date": day,
+                    "price": round(base_price * rng.uniform(0.95, 1.05), 2),
+                    "in_stock": rng.random() > 0.1, "promo": rng.random() < 0.05,
+                })
+                if len(rows) >= INSERT_CHUNK:
+                    session.execute(insert(PriceSnapshot), rows)
+                    snapshots += len(rows)
+                    rows = []
+        if rows:
+            session.execute(insert(PriceSnapshot), rows)
+            snapshots += len(rows)
+
+        session.commit()
+        return {
+            "products": len(products),
+            "metric_points": metric_points,
+            "price_snapshots": snapshots,
+            "start_date": start_date,
+            "end_date": today,
+        }
+    except Exception:
+        session.rollback()
+        raise
+    finally:
+        session.close()
@@ -0,0 +1,74 @@
+"""
+Конфигурация gunicorn для API
+
+    gunicorn -c gunicorn.conf.py src.wsgi:app
+
+Параметры переопределяются переменными окружения: GUNICORN_BIND, WEB_CONCURRENCY
+(число воркеров), GUNICORN_THREADS (>1 - потоковые воркеры gthread), GUNICORN_TIMEOUT.
+
+/metrics суммирует счетчики всех воркеров через общий каталог
+METRICS_MULTIPROC_DIR (по умолчанию - временный каталог этого запуска, см. src/utils/metrics.py).
+"""
+import gc
+import multiprocessing
+import os
+import shutil
+import tempfile
+
+bind = os.getenv("GUNICORN_BIND", "0.0.0.0:8000")
+workers = int(os.getenv("WEB_CONCURRENCY", str(multiprocessing.cpu_count() * 2 + 1)))
+threads = int(os.getenv("GUNICORN_THREADS", "1"))
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "60"))
+keepalive = 5
+
+# Задается до импорта приложения: src.config читает переменную при загрузке.
+# Не зависит от workers: число воркеров можно переопределить флагом -w
+_default_metrics_dir = os.path.join(tempfile.gettempdir(), f"demand-metrics-{os.getpid()}")
+os.environ.setdefault("METRICS_MULTIPROC_DIR", _default_metrics_dir)
+
+# Приложение и модули прогноза импортируются один раз в мастере (см. src/wsgi.py)
+preload_app = True
+
+# Перезапуск воркера после N запросов ограничивает рост памяти; разброс - чтобы не все сразу
+max_requests = int(os.getenv("GUNICORN_MAX_REQUESTS", "2000"))
+max_requests_jitter = max_requests // 10
+
+accesslog = os.getenv("GUNICORN_ACCESS_LOG") or None
+errorlog = "-"
+
+
+def on_starting(server):
+    # Счетчики прошлого запуска не должны попасть в новый
+    from src.utils.metrics import reset_shared
+    reset_shared()
+
+
+def pre_fork(server, worker):
+    # Объекты, созданные до fork, уходят из-под сборщика мусора: его обходы в воркерах
+    # не трогают их заголовки, и общие страницы памяти не копируются
+    gc.freeze()
+
+
+def post_fork(server, worker):
+    # Соединения пула, открытые в мастере, нельзя делить между процессами
+    from src.db import engine
+    if engine is not None:
+        engine.dispose(close=False)
+
+
+def worker_exit(server, worker):
+    # Последние события воркера - в его файл, пока процесс жив
+    from src.utils.metrics import flush
+    flush()
+
+
+def child_exit(server, worker):
+    # Счетчики завершившегося воркера переходят в архив: сумма по воркерам не уменьшается
+    from src.utils.metrics import archive_process
+    archive_process(worker.pid)
+
+
+def on_exit(server):
+    # Временный каталог метрик этого запуска больше не нужен
+    if os.environ.get("METRICS_MULTIPROC_DIR") == _default_metrics_dir:
+        shutil.rmtree(_default_metrics_dir, ignore_errors=True)
@@ -1,9 +1,15 @@
 from flask import Flask
 from flask_cors import CORS
+from src.config import FLASK_DEBUG
 from src.routes.data_routes import bp as data_bp
 from src.routes.model_routes import bp as model_bp
 from src.routes.product_routes import bp as product_bp
 from src.routes.forecast_routes import bp as forecast_bp
+from src.routes.job_routes import bp as job_bp
+from src.routes.metrics_routes import bp as metrics_bp
+from src.utils.metrics import init_request_metrics
+from src.utils.query_profiler import init_flask_profiling
+from src.utils.http_cache import init_compression
 
 def create_app():
     app = Flask(__name__)
@@ -12,9 +18,16 @@ def create_app():
     app.register_blueprint(model_bp, url_prefix="/api")
     app.register_blueprint(product_bp, url_prefix="/api")
     app.register_blueprint(forecast_bp, url_prefix="/api")
+    app.register_blueprint(job_bp, url_prefix="/api")
+    # /metrics - без префикса /api, как ожидает Prometheus
+    app.register_blueprint(metrics_bp)
+    init_request_metrics(app)
+    # SQL_PROFILE=1: отчет по SQL-запросам каждого HTTP-запроса, N+1 - в лог
+    init_flask_profiling(app)
+    # gzip/brotli для крупных JSON-ответов
+    init_compression(app)
     return app
 
-app = create_app()
-
 if __name__ == "__main__":
-    app.run(debug=True)
\ No newline at end of file
+    # Встроенный сервер - для разработки; production: gunicorn -c gunicorn.conf.py src.wsgi:app
+    create_app().run(debug=FLASK_DEBUG)
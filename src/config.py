@@ -6,4 +6,32 @@ DATABASE_URL = os.getenv("DATABASE_URL")
 SCRAPE_BASE_URL = os.getenv("SCRAPE_BASE_URL")
 REQUESTS_TIMEOUT = int(os.getenv("REQUESTS_TIMEOUT", "15"))
 REQUESTS_SLEEP_BETWEEN = float(os.getenv("REQUESTS_SLEEP_BETWEEN", "1.2"))
-USER_AGENT = os.getenv("USER_AGENT", "demand-forecast-bot/1.0")
\ No newline at end of file
+USER_AGENT = os.getenv("USER_AGENT", "demand-forecast-bot/1.0")
+# Сколько дней хранить все запуски прогнозов; более старые запуски уплотняются
+FORECAST_RETENTION_DAYS = int(os.getenv("FORECAST_RETENTION_DAYS", "90"))
+# Путь к файлу обученной модели
+MODEL_PATH = os.getenv("MODEL_PATH", "models/demand_model.pkl")
+# Сколько фоновых задач выполняется одновременно в одном процессе
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+# Расписание инкрементального пайплайна (crontab) и глубина парсинга каталога
+PIPELINE_CRON = os.getenv("PIPELINE_CRON", "0 3 * * *")
+PIPELINE_SCRAPE_PAGES = int(os.getenv("PIPELINE_SCRAPE_PAGES", "5"))
+# Каталог с выгрузками погодных наблюдений (CSV/Parquet)
+WEATHER_DATA_DIR = os.getenv("WEATHER_DATA_DIR", "data/weather")
+# Уровень логов и файл для структурированных (JSON) логов; пусто - без JSON-файла
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+LOG_JSON_PATH = os.getenv("LOG_JSON_PATH", "")
+# Профилировщик SQL-запросов (1 - включить): отчет по запросам и поиск N+1
+SQL_PROFILE = os.getenv("SQL_PROFILE", "0").lower() in ("1", "true", "yes")
+# С какого числа одинаковых запросов из одного места кода считать их N+1
+SQL_PROFILE_N1_THRESHOLD = int(os.getenv("SQL_PROFILE_N1_THRESHOLD", "10"))
+# Режим отладки встроенного сервера Flask (python -m src.app); в production - gunicorn
+FLASK_DEBUG = os.getenv("FLASK_DEBUG", "0").lower() in ("1", "true", "yes")
+# Импортировать модули прогноза (pandas и др.) в мастер-процессе gunicorn до fork:
+# воркеры делят эти страницы памяти (copy-on-write), а не грузят их каждый сам
+WSGI_PRELOAD_MODULES = os.getenv("WSGI_PRELOAD_MODULES", "1").lower() in ("1", "true", "yes")
+# Общий каталог метрик процессов (воркеров gunicorn): /metrics суммирует счетчики всех
+# воркеров; пусто - метрики только своего процесса. gunicorn.conf.py задает его сам
+METRICS_MULTIPROC_DIR = os.getenv("METRICS_MULTIPROC_DIR", "")
+# Как часто (секунды) процесс записывает свои метрики в общий каталог
+METRICS_FLUSH_INTERVAL = float(os.getenv("METRICS_FLUSH_INTERVAL", "1.0"))
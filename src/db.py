@@ -1,7 +1,9 @@
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker, declarative_base
 
-from .config import DATABASE_URL
+from .config import DATABASE_URL, SQL_PROFILE
+from .utils.logging_setup import instrument_engine
+from .utils.query_profiler import install_profiler
 
 Base = declarative_base()
 
@@ -14,6 +16,11 @@ if DATABASE_URL:
     try:
         engine = create_engine(DATABASE_URL, echo=False, future=True, pool_pre_ping=True)
         SessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False, expire_on_commit=False)
+        # Счетчики обращений к БД и записанных строк (см. utils.logging_setup)
+        instrument_engine(engine)
+        # Профилировщик запросов и поиск N+1 (SQL_PROFILE=1, см. utils.query_profiler)
+        if SQL_PROFILE:
+            install_profiler(engine)
     except Exception:
         # Если не удается создать engine (например, нет psycopg2), 
         # это нормально для генерации миграций
@@ -0,0 +1,189 @@
+"""
+Календарь праздников РФ и сезонов смены шин (офлайн, без сети)
+
+Правила:
+- нерабочие праздничные дни по ст. 112 ТК РФ: 1-8 января, 23 февраля, 8 марта,
+  1 и 9 мая, 12 июня, 4 ноября;
+- праздник, выпавший на субботу/воскресенье, переносится на следующий рабочий день
+  (кроме январских - их переносы задаются постановлением правительства отдельно
+  каждый год и в правила не входят);
+- новогодний период и окна сезонной смены шин задаются диапазонами дат.
+
+Календарь рассчитывается один раз в плотные массивы по дням, признаки на дату -
+чтение по индексу (date.toordinal() - начало календаря).
+"""
+from datetime import date
+from threading import Lock
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+
+# (месяц, день) нерабочих праздничных дней
+NEW_YEAR_HOLIDAYS = [(1, d) for d in range(1, 9)]
+TRANSFERABLE_HOLIDAYS = [(2, 23), (3, 8), (5, 1), (5, 9), (6, 12), (11, 4)]
+
+# Диапазоны ((месяц, день), (месяц, день)) включительно; новогодний период переходит через год
+NEW_YEAR_PERIOD = ((12, 25), (1, 10))
+SPRING_TIRE_CHANGE = ((3, 15), (4, 30))
+AUTUMN_TIRE_CHANGE = ((10, 1), (11, 30))
+
+# Ограничение сверху для "дней до/после праздника"
+NO_HOLIDAY_DISTANCE = 366
+
+REGION = "RU"
+
+
+def _day_range(year: int, period: Tuple[Tuple[int, int], Tuple[int, int]]) -> List[Tuple[date, date]]:
+    """Отрезки [начало, конец] периода, относящиеся к году year"""
+    (m1, d1), (m2, d2) = period
+    start, end = date(year, m1, d1), date(year, m2, d2)
+    if start <= end:
+        return [(start, end)]
+    # Период через границу года: начало года и конец года
+    return [(date(year, 1, 1), end), (start, date(year, 12, 31))]
+
+
+class HolidayCalendar:
+    """Плотные массивы признаков календаря по дням за [start_year, end_year]"""
+
+    def __init__(self, start_year: int, end_year: int):
+        self.start_year = start_year
+        self.end_year = end_year
+        self.origin = date(start_year, 1, 1).toordinal()
+        size = date(end_year, 12, 31).toordinal() - self.origin + 1
+
+        ordinals = np.arange(self.origin, self.origin + size)
+        # date.fromordinal(1) - понедельник
+        self.weekday = ((ordinals - 1) % 7).astype(np.int8)
+        is_weekend = self.weekday >= 5
+
+        self.is_holiday = np.zeros(size, dtype=bool)
+        self.is_new_year_period = np.zeros(size, dtype=bool)
+        self.is_spring_tire_change = np.zeros(size, dtype=bool)
+        self.is_autumn_tire_change = np.zeros(size, dtype=bool)
+
+        for year in range(start_year, end_year + 1):
+            for month, day in NEW_YEAR_HOLIDAYS:
+                self.is_holiday[self.index(date(year, month, day))] = True
+            for month, day in TRANSFERABLE_HOLIDAYS:
+                self.is_holiday[self.index(date(year, month, day))] = True
+
+            for flags, period in ((self.is_new_year_period, NEW_YEAR_PERIOD),
+                                  (self.is_spring_tire_change, SPRING_TIRE_CHANGE),
+                                  (self.is_autumn_tire_change, AUTUMN_TIRE_CHANGE)):
+                for start, end in _day_range(year, period):
+                    flags[self.index(start):self.index(end) + 1] = True
+
+        # Переносы: праздник в выходной -> следующий рабочий день
+        for year in range(start_year, end_year + 1):
+            for month, day in TRANSFERABLE_HOLIDAYS:
+                i = self.index(date(year, month, day))
+                if not is_weekend[i]:
+                    continue
+                j = i + 1
+                while j < size and (is_weekend[j] or self.is_holiday[j]):
+                    j += 1
+                if j < size:
+                    self.is_holiday[j] = True
+
+        self.is_day_off = self.is_holiday | is_weekend
+
+        # Расстояния до ближайших праздников - бинарный поиск по позициям праздников
+        positions = np.arange(size)
+        holiday_idx = np.flatnonzero(self.is_holiday)
+        # За границами календаря: 4 ноября предыдущего года и 1 января следующего
+        before = date(start_year - 1, 11, 4).toordinal() - self.origin
+        after = size
+        padded = np.concatenate(([before], holiday_idx, [after]))
+        next_idx = padded[np.searchsorted(padded, positions, side="left")]
+        prev_idx = padded[np.searchsorted(padded, positions, side="right") - 1]
+        self.days_to_next_holiday = np.minimum(next_idx - positions, NO_HOLIDAY_DISTANCE).astype(np.int16)
+        self.days_since_last_holiday = np.minimum(positions - prev_idx, NO_HOLIDAY_DISTANCE).astype(np.int16)
+
+    def covers(self, day: date) -> bool:
+        """Попадает ли дата в календарь"""
+        return self.start_year <= day.year <= self.end_year
+
+    def index(self, day: date) -> int:
+        """Позиция даты в массивах календаря"""
+        return day.toordinal() - self.origin
+
+    def features(self, day: date) -> Dict:
+        """Признаки календаря на дату"""
+        i = self.index(day)
+        return {
+            "is_holiday": bool(self.is_holiday[i]),
+            "is_day_off": bool(self.is_day_off[i]),
+            "days_to_next_holiday": int(self.days_to_next_holiday[i]),
+            "days_since_last_holiday": int(self.days_since_last_holiday[i]),
+            "is_new_year_period": bool(self.is_new_year_period[i]),
+            "is_spring_tire_change": bool(self.is_spring_tire_change[i]),
+            "is_autumn_tire_change": bool(self.is_autumn_tire_change[i]),
+        }
+
+    def metric_records(self, start_date: date, end_date: date) -> List[Dict]:
+        """
+        Записи для хранилища метрик за [start_date, end_date]
+
+        Формат как у трендов: {"date", "metric_name", "region", "value"}, имена вида holiday:<признак>
+        """
+        start, end = self.index(start_date), self.index(end_date) + 1
+        series = {
+            "holiday:is_holiday": self.is_holiday,
+            "holiday:is_day_off": self.is_day_off,
+            "holiday:days_to_next_holiday": self.days_to_next_holiday,
+            "holiday:is_new_year_period": self.is_new_year_period,
+            "holiday:tire_change_window": self.is_spring_tire_change | self.is_autumn_tire_change,
+        }
+        days = [date.fromordinal(o) for o in range(self.origin + start, self.origin + end)]
+        records = []
+        for name, values in series.items():
+            for day, value in zip(days, values[start:end].tolist()):
+                records.append({"date": day, "metric_name": name, "region": REGION, "value": float(value)})
+        return records
+
+
+_calendar: Optional[HolidayCalendar] = None
+_calendar_lock = Lock()
+
+
+def get_holiday_calendar(day: Optional[date] = None) -> HolidayCalendar:
+    """
+    Общий календарь, покрывающий дату day
+
+    Строится с запасом (10 лет назад, 2 вперед) и перестраивается, только если
+    дата выходит за его границы.
+    """
+    global _calendar
+    day = day or date.today()
+    calendar = _calendar
+    if calendar is not None and calendar.covers(day):
+        return calendar
+
+    with _calendar_lock:
+        if _calendar is None or not _calendar.covers(day):
+            today = date.today()
+            start_year = min(day.year, today.year - 10, _calendar.start_year if _calendar else day.year)
+            end_year = max(day.year, today.year + 2, _calendar.end_year if _calendar else day.year)
+            _calendar = HolidayCalendar(start_year, end_year)
+        return _calendar
+
+
+def holiday_features(day: date) -> Dict:
+    """Признаки праздников и сезонов смены шин на дату"""
+    return get_holiday_calendar(day).features(day)
+
+
+def save_holiday_metrics(start_date: date, end_date: date) -> int:
+    """Записать ряды календаря за период в хранилище метрик одной пачкой"""
+    from ..load_to_db import save_traffic_metrics
+
+    calendar = get_holiday_calendar(start_date)
+    if not calendar.covers(end_date):
+        calendar = get_holiday_calendar(end_date)
+    return save_traffic_metrics(calendar.metric_records(start_date, end_date))
+
+
+if __name__ == "__main__":
+    # Тестовый запуск
+    today = date.today()
+    print(f"Признаки календаря на {today}: {holiday_features(today)}")
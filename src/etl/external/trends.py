@@ -4,7 +4,7 @@
 """
 import time
 from datetime import datetime, timedelta
-from typing import List, Dict, Optional
+from typing import Callable, List, Dict, Optional
 from pytrends.request import TrendReq
 from loguru import logger
 
@@ -102,10 +102,10 @@ class TrendsCollector:
     
     def format_trends_for_db(self, trends_data: Dict, metric_name_prefix: str = "trend") -> List[Dict]:
         """
-        Форматировать данные трендов для сохранения в БД (TrafficMetric)
+        Форматировать данные трендов для сохранения в БД (save_traffic_metrics)
         
         Returns:
-            Список записей для таблицы traffic_metrics
+            Список записей {"date", "metric_name", "value", "region"}
         """
         records = []
         
@@ -136,12 +136,14 @@ class TrendsCollector:
         return records
 
 
-def collect_tire_trends(tread_patterns: List[str] = None) -> List[Dict]:
+def collect_tire_trends(tread_patterns: List[str] = None,
+                        progress_callback: Optional[Callable[[int, int], None]] = None) -> List[Dict]:
     """
     Собрать тренды по шинам с разными типами протектора
     
     Args:
         tread_patterns: список типов протектора (например, ['зимние шины', 'летние шины'])
+        progress_callback: вызывается после каждой группы запросов как (обработано групп, всего групп)
     
     Returns:
         Список записей для БД
@@ -164,10 +166,12 @@ def collect_tire_trends(tread_patterns: List[str] = None) -> List[Dict]:
     
     all_records = []
     
-    for group in groups:
+    for i, group in enumerate(groups, 1):
         trends = collector.get_trends(group, timeframe='today 12-m', geo='RU')
         records = collector.format_trends_for_db(trends, metric_name_prefix="trend_keyword")
         all_records.extend(records)
+        if progress_callback:
+            progress_callback(i, len(groups))
         time.sleep(1.5)  # Задержка между группами
     
     return all_records
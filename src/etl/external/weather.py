@@ -0,0 +1,185 @@
+"""
+Погодные признаки из локальных выгрузок наблюдений (CSV/Parquet по регионам)
+
+Файлы кладутся в WEATHER_DATA_DIR. Ожидаемые колонки (регистр не важен):
+    date, region, temp_mean, [temp_min], [snow]
+где snow - осадки снегом/высота снежного покрова (> 0 - снежный день).
+Если колонки region нет, регион берется из имени файла.
+
+Признаки считаются оконными функциями pandas по каждому региону:
+    temp_mean_7d         - средняя температура за 7 дней
+    frost_day            - день с температурой ниже 0 °C
+    days_since_first_frost - дней с первого мороза сезона (сезон начинается 1 июля), -1 до него
+    snow_days_7d         - снежных дней за 7 дней
+и пишутся пачкой в хранилище метрик как weather:<признак>.
+"""
+import os
+from datetime import date, timedelta
+from glob import glob
+from typing import Dict, List, Optional
+import pandas as pd
+from loguru import logger
+
+from ...config import WEATHER_DATA_DIR
+
+WEATHER_FEATURES = ["temp_mean_7d", "frost_day", "days_since_first_frost", "snow_days_7d"]
+# Колонки признаков модели: есть в каждой строке, NaN - значения нет
+WEATHER_FEATURE_COLUMNS = [f"weather_{name}" for name in WEATHER_FEATURES]
+METRIC_PREFIX = "weather:"
+# На сколько дней назад искать последнее наблюдение для дат без данных
+ASOF_LOOKBACK_DAYS = 30
+
+# Синонимы колонок в выгрузках разных источников
+COLUMN_ALIASES = {
+    "day": "date",
+    "dt": "date",
+    "city": "region",
+    "station": "region",
+    "t_mean": "temp_mean",
+    "tavg": "temp_mean",
+    "temperature": "temp_mean",
+    "t_min": "temp_min",
+    "tmin": "temp_min",
+    "snow_depth": "snow",
+    "snowfall": "snow",
+}
+
+
+def _read_file(path: str) -> Optional[pd.DataFrame]:
+    try:
+        if path.endswith(".parquet"):
+            df = pd.read_parquet(path)
+        else:
+            df = pd.read_csv(path)
+    except ImportError as e:
+        # Для Parquet нужен pyarrow или fastparquet
+        logger.warning(f"Не удалось прочитать {path}: {e}")
+        return None
+
+    df = df.rename(columns=lambda c: COLUMN_ALIASES.get(str(c).strip().lower(), str(c).strip().lower()))
+    if "region" not in df.columns:
+        df["region"] = os.path.splitext(os.path.basename(path))[0]
+    return df
+
+
+def load_weather_observations(data_dir: str = WEATHER_DATA_DIR) -> pd.DataFrame:
+    """Прочитать все выгрузки наблюдений из каталога в один DataFrame"""
+    paths = sorted(glob(os.path.join(data_dir, "*.csv")) + glob(os.path.join(data_dir, "*.parquet")))
+    frames = [df for df in (_read_file(p) for p in paths) if df is not None]
+    if not frames:
+        logger.warning(f"Нет файлов с погодой в {data_dir}")
+        return pd.DataFrame(columns=["date", "region", "temp_mean", "temp_min", "snow"])
+
+    df = pd.concat(frames, ignore_index=True)
+    missing = {"date", "temp_mean"} - set(df.columns)
+    if missing:
+        raise ValueError(f"В выгрузках погоды нет колонок: {sorted(missing)}")
+
+    df["date"] = pd.to_datetime(df["date"]).dt.normalize()
+    df["region"] = df["region"].astype(str)
+    for column in ("temp_min", "snow"):
+        if column not in df.columns:
+            df[column] = float("nan")
+
+    # Повторы одного дня в разных файлах: среднее
+    df = df.groupby(["region", "date"], as_index=False)[["temp_mean", "temp_min", "snow"]].mean()
+    logger.info(f"Загружено наблюдений погоды: {len(df)} ({df['region'].nunique()} регионов)")
+    return df
+
+
+def compute_weather_features(observations: pd.DataFrame) -> pd.DataFrame:
+    """
+    Оконные признаки погоды по регионам
+
+    Returns:
+        DataFrame с колонками date, region и WEATHER_FEATURES
+    """
+    if observations.empty:
+        return pd.DataFrame(columns=["date", "region"] + WEATHER_FEATURES)
+
+    df = observations.sort_values(["region", "date"]).reset_index(drop=True)
+
+    # Окна по календарным дням ("7D"), а не по строкам - пропуски в данных не растягивают окно
+    indexed = df.set_index("date").groupby("region", sort=False)
+    df["temp_mean_7d"] = indexed["temp_mean"].rolling("7D", min_periods=1).mean().to_numpy()
+
+    frost_source = df["temp_min"].fillna(df["temp_mean"])
+    df["frost_day"] = (frost_source < 0).astype(float)
+
+    df["snow_day"] = (df["snow"].fillna(0) > 0).astype(float)
+    indexed = df.set_index("date").groupby("region", sort=False)
+    df["snow_days_7d"] = indexed["snow_day"].rolling("7D", min_periods=1).sum().to_numpy()
+
+    # Первый мороз сезона: сезон с 1 июля по 30 июня
+    df["season"] = df["date"].dt.year - (df["date"].dt.month < 7).astype(int)
+    first_frost = df[df["frost_day"] > 0].groupby(["region", "season"])["date"].min().rename("first_frost")
+    df = df.join(first_frost, on=["region", "season"])
+    days_since = (df["date"] - df["first_frost"]).dt.days
+    df["days_since_first_frost"] = days_since.where(days_since >= 0, -1).fillna(-1)
+
+    return df[["date", "region"] + WEATHER_FEATURES]
+
+
+def weather_metric_records(features: pd.DataFrame) -> List[Dict]:
+    """Записи для хранилища метрик: {"date", "metric_name", "region", "value"}"""
+    long = features.melt(id_vars=["date", "region"], value_vars=WEATHER_FEATURES,
+                         var_name="feature", value_name="value").dropna(subset=["value"])
+    return [
+        {"date": d.date(), "metric_name": f"{METRIC_PREFIX}{feature}", "region": region, "value": float(value)}
+        for d, region, feature, value in long[["date", "region", "feature", "value"]].itertuples(index=False)
+    ]
+
+
+def ingest_weather(data_dir: str = WEATHER_DATA_DIR) -> int:
+    """Прочитать выгрузки, посчитать признаки и записать их пачкой в хранилище метрик"""
+    from ..load_to_db import save_traffic_metrics
+
+    features = compute_weather_features(load_weather_observations(data_dir))
+    if features.empty:
+        return 0
+    return save_traffic_metrics(weather_metric_records(features))
+
+
+def weather_feature_lookup(session, dates: List[date], region: Optional[str] = None) -> Dict[date, Dict]:
+    """
+    Погодные признаки на набор дат одним запросом
+
+    Значения по регионам усредняются (или берется один region). Для дат позже
+    последнего наблюдения (прогноз) используются последние известные значения.
+
+    Returns:
+        {дата: {"weather_<признак>": значение}} со всеми WEATHER_FEATURE_COLUMNS
+        (NaN - нет наблюдений за ASOF_LOOKBACK_DAYS); пустой словарь, если погоды нет
+    """
+    from ..metrics_store import metric_records_query
+    from ...models import MetricValue, Metric
+
+    if not dates:
+        return {}
+
+    query = metric_records_query(session, METRIC_PREFIX).filter(
+        MetricValue.date >= min(dates) - timedelta(days=ASOF_LOOKBACK_DAYS),
+        MetricValue.date <= max(dates)
+    )
+    if region:
+        query = query.filter(Metric.region == region)
+    rows = query.all()
+    if not rows:
+        return {}
+
+    df = pd.DataFrame([tuple(r) for r in rows], columns=["date", "name", "region", "value"])
+    wide = df.pivot_table(index="date", columns="name", values="value", aggfunc="mean")
+    wide.columns = [f"weather_{c[len(METRIC_PREFIX):]}" for c in wide.columns]
+    wide.index = pd.to_datetime(wide.index)
+
+    # as-of: последнее известное значение на каждую дату, не старше ASOF_LOOKBACK_DAYS
+    requested = pd.DatetimeIndex(sorted(set(pd.to_datetime(dates))))
+    wide = wide.reindex(wide.index.union(requested)).sort_index()
+    wide = wide.ffill(limit=ASOF_LOOKBACK_DAYS).reindex(index=requested, columns=WEATHER_FEATURE_COLUMNS)
+    return {ts.date(): values.to_dict() for ts, values in wide.iterrows()}
+
+
+if __name__ == "__main__":
+    # Тестовый запуск
+    saved = ingest_weather()
+    print(f"Сохранено погодных метрик: {saved}")
@@ -2,46 +2,74 @@
 Загрузка данных в БД
 """
 from datetime import date
-from typing import List, Dict, Optional
-from sqlalchemy import and_
+from typing import Iterable, List, Dict, Optional, Union
 from loguru import logger
 
 from ..db import SessionLocal
-from ..models import Product, PriceSnapshot, TrafficMetric
+from ..models import Product, PriceSnapshot
+from .metrics_store import save_metric_values
+from .normalize import NormalizedProduct
+from ..features.series_index import notify
+from ..utils.logging_setup import timed
 
+ProductRecord = Union[Dict, NormalizedProduct]
 
-def save_products(products: List[Dict]) -> List[Product]:
+
+def _upsert_products(session, products: List[ProductRecord]) -> List[Product]:
+    """Добавить/обновить товары пачки по SKU (один запрос на поиск существующих)"""
+    products = [p.to_record() if isinstance(p, NormalizedProduct) else dict(p) for p in products]
+    # SKU прежней схемы нужен только для поиска - в таблицу не пишется
+    legacy = {p["sku"]: p.pop("legacy_sku") for p in products if p.get("legacy_sku")}
+    # Дубликаты SKU внутри пачки: побеждает последняя запись; товары без SKU не схлопываем
+    by_sku = {p["sku"]: p for p in products if p.get("sku")}
+    records = list(by_sku.values()) + [p for p in products if not p.get("sku")]
+    existing = {
+        p.sku: p for p in session.query(Product).filter(Product.sku.in_(list(by_sku))).all()
+    } if by_sku else {}
+    
+    # Товары, сохраненные до нормализации названий (SKU - хэш исходного названия):
+    # переводим их на новый SKU, чтобы не завести дубликат и не оторвать историю цен и прогнозов
+    missing = {old: sku for sku, old in legacy.items() if sku in by_sku and sku not in existing}
+    if missing:
+        for product in session.query(Product).filter(Product.sku.in_(list(missing))).all():
+            product.sku = missing[product.sku]
+            existing[product.sku] = product
+    
+    saved_products = []
+    for product_data in records:
+        sku = product_data.get("sku")
+        product = existing.get(sku)
+        if product:
+            # Обновляем данные
+            for key, value in product_data.items():
+                if key in ["sku"]:  # SKU не обновляем
+                    continue
+                setattr(product, key, value)
+        else:
+            # Создаем новый товар
+            product = Product(
+                sku=sku,
+                name=product_data.get("name"),
+                category=product_data.get("category"),
+                url=product_data.get("url"),
+                tread_pattern=product_data.get("tread_pattern"),
+                specifications=product_data.get("specifications"),
+                size_width=product_data.get("size_width"),
+                size_ratio=product_data.get("size_ratio"),
+                size_diameter=product_data.get("size_diameter")
+            )
+            session.add(product)
+        saved_products.append(product)
+    return saved_products
+
+
+@timed()
+def save_products(products: List[ProductRecord]) -> List[Product]:
     """Сохранить товары в БД"""
     session = SessionLocal()
-    saved_products = []
     
     try:
-        for product_data in products:
-            # Проверяем, существует ли товар с таким SKU
-            existing = session.query(Product).filter(
-                Product.sku == product_data.get("sku")
-            ).first()
-            
-            if existing:
-                # Обновляем данные
-                for key, value in product_data.items():
-                    if key in ["sku"]:  # SKU не обновляем
-                        continue
-                    setattr(existing, key, value)
-                saved_products.append(existing)
-            else:
-                # Создаем новый товар
-                product = Product(
-                    sku=product_data.get("sku"),
-                    name=product_data.get("name"),
-                    category=product_data.get("category"),
-                    url=product_data.get("url"),
-                    tread_pattern=product_data.get("tread_pattern"),
-                    specifications=product_data.get("specifications")
-                )
-                session.add(product)
-                saved_products.append(product)
-        
+        saved_products = _upsert_products(session, products)
         session.commit()
         logger.info(f"Сохранено товаров: {len(saved_products)}")
         return saved_products
@@ -53,20 +81,55 @@ def save_products(products: List[Dict]) -> List[Product]:
         session.close()
 
 
+@timed()
+def save_product_batches(batches: Iterable[List[ProductRecord]]) -> int:
+    """
+    Сохранять товары пачками по мере поступления (например, постранично из парсера)
+    
+    Каждая пачка коммитится отдельно - уже сохраненное не теряется при ошибке
+    в середине обхода, а весь каталог не держится в памяти.
+    
+    Returns:
+        Количество сохраненных товаров
+    """
+    session = SessionLocal()
+    saved_count = 0
+    
+    try:
+        for batch in batches:
+            if not batch:
+                continue
+            saved_count += len(_upsert_products(session, batch))
+            session.commit()
+            # Пачка записана - объекты из сессии больше не нужны
+            session.expunge_all()
+            logger.info(f"Сохранена пачка товаров: {len(batch)} (всего {saved_count})")
+        return saved_count
+    except Exception as e:
+        session.rollback()
+        logger.error(f"Ошибка при сохранении товаров: {e}")
+        raise
+    finally:
+        session.close()
+
+
 def save_price_snapshot(product_id: int, price: float, in_stock: bool = True, promo: bool = False) -> PriceSnapshot:
     """Сохранить снимок цены товара"""
     session = SessionLocal()
     
     try:
+        today = date.today()
         snapshot = PriceSnapshot(
             product_id=product_id,
-            date=date.today(),
+            date=today,
             price=price,
             in_stock=in_stock,
             promo=promo
         )
         session.add(snapshot)
         session.commit()
+        # Индексы истории цен, открытые в текущих прогонах, дописываются без перезагрузки
+        notify(("price", product_id), today, price, in_stock, promo)
         return snapshot
     except Exception as e:
         session.rollback()
@@ -76,35 +139,21 @@ def save_price_snapshot(product_id: int, price: float, in_stock: bool = True, pr
         session.close()
 
 
+@timed()
 def save_traffic_metrics(metrics: List[Dict]) -> int:
-    """Сохранить метрики трафика/трендов"""
+    """
+    Сохранить метрики трафика/трендов
+    
+    Формат записей прежний ({"date", "metric_name", "region", "value"}),
+    хранятся они в metrics + metric_values (см. metrics_store)
+    """
     session = SessionLocal()
-    saved_count = 0
     
     try:
-        for metric_data in metrics:
-            # Проверяем, не существует ли уже такая запись
-            existing = session.query(TrafficMetric).filter(
-                and_(
-                    TrafficMetric.date == metric_data["date"],
-                    TrafficMetric.metric_name == metric_data["metric_name"],
-                    TrafficMetric.region == metric_data.get("region")
-                )
-            ).first()
-            
-            if existing:
-                existing.value = metric_data["value"]
-            else:
-                metric = TrafficMetric(
-                    date=metric_data["date"],
-                    region=metric_data.get("region"),
-                    metric_name=metric_data["metric_name"],
-                    value=metric_data["value"]
-                )
-                session.add(metric)
-                saved_count += 1
-        
+        saved_count = save_metric_values(session, metrics)
         session.commit()
+        for record in metrics:
+            notify(("metric", record["metric_name"]), record["date"], record["value"], record.get("region") or "")
         logger.info(f"Сохранено метрик: {saved_count}")
         return saved_count
     except Exception as e:
@@ -113,4 +162,3 @@ def save_traffic_metrics(metrics: List[Dict]) -> int:
         raise
     finally:
         session.close()
-
@@ -0,0 +1,215 @@
+"""
+Хранилище временных рядов метрик (тренды, праздники и т.д.)
+
+Ряды лежат в двух таблицах: справочник metrics (имя + регион -> id) и
+компактная таблица фактов metric_values (metric_id, date, value).
+Модуль прячет эту раскладку: наружу отдаются те же записи
+{"date", "metric_name", "region", "value"}, что раньше хранились в traffic_metrics.
+"""
+import time
+from datetime import date
+from threading import Lock
+from typing import Dict, Iterable, List, Optional, Tuple
+from sqlalchemy import event, func, tuple_
+from sqlalchemy.orm import Session
+
+from ..models import Metric, MetricValue
+from ..utils.metrics import record_cache
+
+# Кэш справочника (name, region) -> id. Id метрики не меняется, пока строка справочника
+# существует, но кэшируются только закоммиченные строки: строки, прочитанные или созданные
+# в транзакции, которая сама создавала метрики, публикуются в кэш после ее коммита
+_metric_ids: Dict[Tuple[str, str], int] = {}
+# name -> ([id], когда устаревает): регионы ряда могут добавить другие процессы, поэтому
+# список живет METRIC_IDS_TTL секунд
+_ids_by_name: Dict[str, Tuple[List[int], float]] = {}
+_metric_ids_lock = Lock()
+
+METRIC_IDS_TTL = 300.0
+INSERT_CHUNK_SIZE = 1000
+
+# Ключи session.info: транзакция создавала метрики / строки, ждущие коммита
+_CREATED_KEY = "metrics_created"
+_PENDING_KEY = "metric_ids_pending"
+
+
+def _publish(rows) -> None:
+    with _metric_ids_lock:
+        for metric_id, name, region in rows:
+            if _metric_ids.get((name, region)) != metric_id:
+                _metric_ids[(name, region)] = metric_id
+                _ids_by_name.pop(name, None)
+
+
+def _cache_metrics(session: Session, rows) -> None:
+    """Закэшировать строки справочника - сразу или после коммита транзакции"""
+    if session.info.get(_CREATED_KEY):
+        session.info.setdefault(_PENDING_KEY, []).extend(rows)
+    else:
+        _publish(rows)
+
+
+@event.listens_for(Session, "after_commit")
+def _publish_committed(session: Session) -> None:
+    session.info.pop(_CREATED_KEY, None)
+    _publish(session.info.pop(_PENDING_KEY, ()))
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_pending(session: Session) -> None:
+    session.info.pop(_CREATED_KEY, None)
+    session.info.pop(_PENDING_KEY, None)
+
+
+def reset_metric_cache() -> None:
+    """Сбросить кэш справочника (после удаления метрик)"""
+    with _metric_ids_lock:
+        _metric_ids.clear()
+        _ids_by_name.clear()
+
+
+def metric_ids_by_name(session: Session, metric_name: str) -> List[int]:
+    """Id всех рядов с этим именем (по всем регионам)"""
+    cached = _ids_by_name.get(metric_name)
+    hit = cached is not None and cached[1] > time.monotonic()
+    record_cache("metric_ids", hit)
+    if hit:
+        return cached[0]
+
+    rows = session.query(Metric.id, Metric.name, Metric.region).filter(Metric.name == metric_name).all()
+    _cache_metrics(session, rows)
+    ids = [r[0] for r in rows]
+    if ids and not session.info.get(_CREATED_KEY):
+        with _metric_ids_lock:
+            _ids_by_name[metric_name] = (ids, time.monotonic() + METRIC_IDS_TTL)
+    return ids
+
+
+def resolve_metric_ids(session: Session, keys: Iterable[Tuple[str, str]]) -> Dict[Tuple[str, str], int]:
+    """
+    Получить id метрик для пар (name, region), создав недостающие строки справочника
+
+    Созданные строки попадают в общий кэш только после коммита транзакции
+    """
+    keys = set(keys)
+    resolved = {k: _metric_ids[k] for k in keys if k in _metric_ids}
+    missing = [k for k in keys if k not in resolved]
+
+    if missing:
+        rows = session.query(Metric.id, Metric.name, Metric.region).filter(
+            tuple_(Metric.name, Metric.region).in_(missing)
+        ).all()
+        _cache_metrics(session, rows)
+        resolved.update({(name, region): metric_id for metric_id, name, region in rows})
+
+        new_metrics = [Metric(name=name, region=region) for name, region in missing if (name, region) not in resolved]
+        if new_metrics:
+            session.add_all(new_metrics)
+            session.flush()
+            session.info[_CREATED_KEY] = True
+            _cache_metrics(session, [(m.id, m.name, m.region) for m in new_metrics])
+            resolved.update({(m.name, m.region): m.id for m in new_metrics})
+
+    return resolved
+
+
+def metric_series_query(session: Session, metric_name: str, start_date: date, end_date: date,
+                        include_end: bool = False):
+    """
+    Точки ряда (date, value) за [start_date, end_date) - диапазон по первичному ключу
+
+    Args:
+        include_end: включить end_date в диапазон
+    """
+    ids = metric_ids_by_name(session, metric_name)
+    query = session.query(MetricValue.date, MetricValue.value).filter(
+        MetricValue.metric_id.in_(ids),
+        MetricValue.date >= start_date
+    )
+    if include_end:
+        return query.filter(MetricValue.date <= end_date)
+    return query.filter(MetricValue.date < end_date)
+
+
+def metric_records_query(session: Session, name_prefix: Optional[str] = None):
+    """Все точки в виде (date, metric_name, region, value), опционально по префиксу имени"""
+    query = session.query(MetricValue.date, Metric.name, Metric.region, MetricValue.value).join(
+        Metric, Metric.id == MetricValue.metric_id
+    )
+    if name_prefix:
+        query = query.filter(Metric.name.like(f"{name_prefix}%"))
+    return query
+
+
+def list_metric_names(session: Session, prefix: Optional[str] = None) -> List[str]:
+    """Имена рядов, у которых есть хотя бы одна точка"""
+    query = session.query(Metric.name).filter(
+        session.query(MetricValue.metric_id).filter(MetricValue.metric_id == Metric.id).exists()
+    )
+    if prefix:
+        query = query.filter(Metric.name.like(f"{prefix}%"))
+    return [r[0] for r in query.distinct().order_by(Metric.name).all()]
+
+
+def count_metric_values(session: Session) -> int:
+    """Количество точек во всех рядах"""
+    return session.query(func.count()).select_from(MetricValue).scalar() or 0
+
+
+def _upsert_statement(session: Session, rows: List[Dict]):
+    """INSERT ... ON CONFLICT (metric_id, date) DO UPDATE для Postgres/SQLite"""
+    dialect = session.get_bind().dialect.name
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        return None
+
+    stmt = insert(MetricValue).values(rows)
+    return stmt.on_conflict_do_update(
+        index_elements=[MetricValue.metric_id, MetricValue.date],
+        set_={"value": stmt.excluded.value}
+    )
+
+
+def save_metric_values(session: Session, records: List[Dict]) -> int:
+    """
+    Записать точки рядов пачками (upsert по (metric_id, date))
+
+    Args:
+        records: записи {"date", "metric_name", "region", "value"}
+
+    Returns:
+        Количество новых точек (обновленные не считаются)
+    """
+    if not records:
+        return 0
+
+    ids = resolve_metric_ids(session, ((r["metric_name"], r.get("region") or "") for r in records))
+
+    # Дубликаты внутри пачки: побеждает последняя запись
+    rows: Dict[Tuple[int, date], Dict] = {}
+    for r in records:
+        metric_id = ids[(r["metric_name"], r.get("region") or "")]
+        rows[(metric_id, r["date"])] = {"metric_id": metric_id, "date": r["date"], "value": r["value"]}
+
+    dates = [key[1] for key in rows]
+    existing = {tuple(r) for r in session.query(MetricValue.metric_id, MetricValue.date).filter(
+        MetricValue.metric_id.in_(list(set(ids.values()))),
+        MetricValue.date >= min(dates),
+        MetricValue.date <= max(dates)
+    ).all()}
+    new_count = sum(1 for key in rows if key not in existing)
+
+    values = list(rows.values())
+    for i in range(0, len(values), INSERT_CHUNK_SIZE):
+        chunk = values[i:i + INSERT_CHUNK_SIZE]
+        stmt = _upsert_statement(session, chunk)
+        if stmt is not None:
+            session.execute(stmt)
+        else:
+            for row in chunk:
+                session.merge(MetricValue(**row))
+
+    return new_count
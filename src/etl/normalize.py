@@ -0,0 +1,256 @@
+"""
+Нормализация товаров между парсерами и загрузкой в БД
+
+Парсеры отдают "сырые" словари; здесь они один раз приводятся к типизированным
+записям NormalizedProduct: каноническое название и SKU, разобранный размер шины
+(ширина/профиль/посадочный диаметр), тип протектора, характеристики словарем.
+Дальше по конвейеру строки повторно не разбираются.
+
+Этап потоковый: normalize_products / normalize_batches - генераторы.
+"""
+import hashlib
+import json
+import re
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, Iterator, List, Optional, Union
+
+# Типы протектора и ключевые слова; порядок - приоритет при нескольких совпадениях
+TREAD_PATTERN_KEYWORDS = {
+    "протектор": ["протектор", "tread", "pattern"],
+    "зимние": ["зимн", "winter", "snow"],
+    "летние": ["летн", "summer"],
+    "всесезонные": ["всесезон", "all-season", "all-weather"],
+    "дорожные": ["дорожн", "highway"],
+    "внедорожные": ["внедорожн", "off-road", "mud"],
+}
+
+# Все ключевые слова - одно регулярное выражение (один проход по тексту);
+# имя группы - индекс типа протектора в TREAD_PATTERN_KEYWORDS
+_TREAD_NAMES = list(TREAD_PATTERN_KEYWORDS)
+_TREAD_RE = re.compile("|".join(
+    f"(?P<p{i}>{'|'.join(re.escape(kw) for kw in keywords)})"
+    for i, keywords in enumerate(TREAD_PATTERN_KEYWORDS.values())
+))
+
+# Размер шины: 420/70-457, 420/70R24, 12R18, 16.9R38, 11.2-20, 1200x500-508
+_SIZE_RE = re.compile(
+    r"(?<![\d.,])(?P<width>\d{1,4}(?:[.,]\d+)?)"
+    r"(?:\s*/\s*(?P<ratio>\d{2,3}(?:[.,]\d+)?)|\s*[xXхХ×]\s*(?P<height>\d{2,4}))?"
+    r"\s*(?P<construction>Z?R|-)\s*"
+    r"(?P<diameter>\d{1,3}(?:[.,]\d+)?)(?![\d.,])"
+)
+
+# Характеристики, в которых может быть указан размер
+SIZE_SPEC_KEYS = ("размер", "size", "типоразмер")
+
+# Латинские буквы, похожие на кириллические, в обозначениях моделей (К-83А, КИ-115АМ);
+# заменяются только в обозначениях с преимущественно кириллическим префиксом
+_LOOKALIKES = str.maketrans("KMAEOPCTXBH", "КМАЕОРСТХВН")
+_CYRILLIC_RE = re.compile(r"[А-Яа-яЁё]")
+_MODEL_RE = re.compile(r"^([A-Za-zА-Яа-яЁё]{1,3})-?(\d+)([A-Za-zА-Яа-яЁё]*)")
+_DASHES_RE = re.compile(r"[‐‑‒–—−]")
+_SPACES_RE = re.compile(r"\s+")
+
+
+@dataclass
+class TireSize:
+    """Размер шины в обозначении производителя"""
+    width: float
+    diameter: float
+    ratio: Optional[float] = None  # профиль, % от ширины
+    construction: str = "bias"  # radial (R) / bias (-)
+
+    @property
+    def label(self) -> str:
+        width = f"{self.width:g}"
+        ratio = f"/{self.ratio:g}" if self.ratio is not None else ""
+        sep = "R" if self.construction == "radial" else "-"
+        return f"{width}{ratio}{sep}{self.diameter:g}"
+
+
+@dataclass
+class NormalizedProduct:
+    """Товар после нормализации"""
+    sku: str
+    name: str
+    category: Optional[str] = None
+    url: Optional[str] = None
+    tread_pattern: Optional[str] = None
+    specifications: Dict[str, str] = field(default_factory=dict)
+    size: Optional[TireSize] = None
+    price: Optional[float] = None
+    # SKU прежней схемы, если отличается от sku (см. legacy_sku)
+    legacy_sku: Optional[str] = None
+
+    def to_record(self) -> Dict:
+        """Поля таблицы products (пустые характеристики и размер не затирают уже сохраненные)"""
+        record = {
+            "sku": self.sku,
+            "name": self.name,
+            "category": self.category,
+            "url": self.url,
+            "tread_pattern": self.tread_pattern,
+        }
+        if self.specifications:
+            record["specifications"] = dict(self.specifications)
+        if self.size:
+            record.update(size_width=self.size.width, size_ratio=self.size.ratio, size_diameter=self.size.diameter)
+        if self.legacy_sku:
+            record["legacy_sku"] = self.legacy_sku
+        return record
+
+
+def _number(text: str) -> float:
+    return float(text.replace(",", "."))
+
+
+def canonical_name(name: str) -> str:
+    """
+    Единые пробелы и тире; обозначение модели с кириллическим префиксом - заглавными
+    буквами, через тире и без латинских двойников: 'к-83a  420/70–457' -> 'К-83А 420/70-457'
+
+    Префиксы из латиницы ('Bel-26') не трогаем - иначе получится смесь алфавитов.
+    """
+    name = _SPACES_RE.sub(" ", _DASHES_RE.sub("-", name)).strip()
+    match = _MODEL_RE.match(name)
+    if match:
+        prefix, number, suffix = match.groups()
+        if 2 * len(_CYRILLIC_RE.findall(prefix)) >= len(prefix):
+            model = f"{prefix.upper().translate(_LOOKALIKES)}-{number}{suffix.upper().translate(_LOOKALIKES)}"
+            name = model + name[match.end():]
+    return name
+
+
+def canonical_sku(name: str, sku: Optional[str] = None) -> str:
+    """Артикул с сайта, иначе - хэш канонического названия"""
+    if sku and sku.strip():
+        return sku.strip()
+    return hashlib.md5(canonical_name(name).encode()).hexdigest()[:12]
+
+
+def legacy_sku(name: str) -> str:
+    """
+    SKU прежней схемы - хэш названия в том виде, как его отдал парсер
+
+    Товары, сохраненные до нормализации, ищутся по нему, если канонического SKU
+    в БД еще нет (см. load_to_db._upsert_products).
+    """
+    return hashlib.md5(name.encode()).hexdigest()[:12]
+
+
+def parse_tire_size(text: Optional[str]) -> Optional[TireSize]:
+    """Разобрать размер шины из названия или характеристики"""
+    if not text:
+        return None
+    match = _SIZE_RE.search(text)
+    if not match:
+        return None
+
+    width = _number(match.group("width"))
+    ratio = None
+    if match.group("ratio"):
+        ratio = _number(match.group("ratio"))
+    elif match.group("height"):
+        # 1200x500-508: высота профиля в мм -> % от ширины
+        ratio = round(_number(match.group("height")) / width * 100, 1)
+
+    return TireSize(
+        width=width,
+        diameter=_number(match.group("diameter")),
+        ratio=ratio,
+        construction="radial" if match.group("construction").endswith("R") else "bias",
+    )
+
+
+def product_size(name: str, specs: Optional[Dict[str, str]] = None) -> Optional[TireSize]:
+    """Размер товара: из названия, иначе из характеристики размера"""
+    size = parse_tire_size(name)
+    if size is None and specs:
+        for key in SIZE_SPEC_KEYS:
+            size = parse_tire_size(specs.get(key))
+            if size:
+                break
+    return size
+
+
+def classify_tread_pattern(texts: Iterable[str]) -> Optional[str]:
+    """
+    Тип протектора по текстам (характеристики, описание)
+
+    Тексты проверяются по порядку; в первом тексте с совпадениями побеждает тип
+    с наибольшим приоритетом в TREAD_PATTERN_KEYWORDS. Ключевые слова ищутся как
+    непересекающиеся совпадения: "внедорожный" дает "внедорожные", а не "дорожные"
+    (прежняя проверка подстрок находила в нем "дорожн" и возвращала "дорожные").
+    """
+    for text in texts:
+        if not text:
+            continue
+        found = {int(m.lastgroup[1:]) for m in _TREAD_RE.finditer(text.lower())}
+        if found:
+            return _TREAD_NAMES[min(found)]
+    return None
+
+
+def _specifications(raw: Union[str, Dict, None]) -> Dict[str, str]:
+    if not raw:
+        return {}
+    if isinstance(raw, dict):
+        return {str(k).strip().lower(): str(v).strip() for k, v in raw.items()}
+    try:
+        return _specifications(json.loads(raw))
+    except (TypeError, ValueError):
+        return {}
+
+
+def normalize_product(raw: Dict) -> Optional[NormalizedProduct]:
+    """Нормализовать один сырой товар; None - если нет названия"""
+    if not raw.get("name"):
+        return None
+
+    name = canonical_name(raw["name"])
+    specs = _specifications(raw.get("specifications"))
+
+    size = product_size(name, specs)
+
+    tread_pattern = raw.get("tread_pattern") or classify_tread_pattern(f"{k} {v}" for k, v in specs.items())
+
+    sku = canonical_sku(name, raw.get("sku"))
+    old_sku = legacy_sku(raw["name"])
+
+    return NormalizedProduct(
+        sku=sku,
+        legacy_sku=old_sku if old_sku != sku else None,
+        name=name,
+        category=raw.get("category"),
+        url=raw.get("url"),
+        tread_pattern=tread_pattern,
+        specifications=specs,
+        size=size,
+        price=raw.get("price"),
+    )
+
+
+def normalize_products(records: Iterable[Dict]) -> Iterator[NormalizedProduct]:
+    """Поток нормализованных товаров без дубликатов SKU"""
+    seen = set()
+    for raw in records:
+        product = normalize_product(raw)
+        if product is None or product.sku in seen:
+            continue
+        seen.add(product.sku)
+        yield product
+
+
+def normalize_batches(batches: Iterable[List[Dict]]) -> Iterator[List[NormalizedProduct]]:
+    """Нормализация постраничного потока (дубликаты отбрасываются по всему потоку)"""
+    seen = set()
+    for batch in batches:
+        normalized = []
+        for raw in batch:
+            product = normalize_product(raw)
+            if product is None or product.sku in seen:
+                continue
+            seen.add(product.sku)
+            normalized.append(product)
+        if normalized:
+            yield normalized
@@ -0,0 +1,419 @@
+"""
+Инкрементальный пайплайн: scrape -> save, trends, weather -> features -> train -> forecast -> recommend
+
+Каждый этап описывает свои входы "водяными знаками" (watermark): дата, размеры и
+максимумы таблиц, хэш данных, отпечатки предыдущих этапов. Хэш водяных знаков
+(fingerprint) сохраняется в pipeline_stage_runs; если он совпадает с последним
+успешным запуском этапа - этап пропускается.
+
+Независимые этапы выполняются параллельно (парсинг и тренды друг от друга не
+зависят). Ошибка этапа блокирует только зависящие от него этапы.
+
+Запуск:
+    python -m src.etl.orchestrator --once      # один прогон
+    python -m src.etl.orchestrator             # по расписанию PIPELINE_CRON
+"""
+import argparse
+import hashlib
+import json
+import os
+import uuid
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from datetime import date, datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from loguru import logger
+from sqlalchemy import func
+
+from ..config import MODEL_PATH, PIPELINE_CRON, PIPELINE_SCRAPE_PAGES, WEATHER_DATA_DIR
+from ..db import SessionLocal
+from ..models import Product, PriceSnapshot, MetricValue, ForecastRun, PipelineStageRun
+from ..utils.query_profiler import profiled
+
+# Этапы - сетевые и I/O задачи, потоков хватает
+MAX_PARALLEL_STAGES = 4
+
+
+@dataclass
+class Stage:
+    """
+    Этап пайплайна
+
+    run(inputs) получает выходы этапов из deps текущего прогона (или None, если этап
+    был пропущен) и возвращает (выход в памяти, JSON-сводка).
+    watermark(results) возвращает состояние входов; None - входов нет, этап пропускается.
+    deps - жесткие зависимости (их ошибка блокирует этап), after - только порядок.
+    """
+    name: str
+    run: Callable[[Dict[str, Any]], Tuple[Any, Dict]]
+    watermark: Callable[[Dict[str, "StageResult"]], Optional[Dict]]
+    deps: Tuple[str, ...] = ()
+    after: Tuple[str, ...] = ()
+
+
+@dataclass
+class StageResult:
+    """Результат этапа в текущем прогоне"""
+    status: str  # ok/skipped/failed/blocked
+    fingerprint: Optional[str] = None
+    output: Any = None
+    summary: Dict = field(default_factory=dict)
+    error: Optional[str] = None
+
+
+def _fingerprint(watermark: Dict) -> str:
+    return hashlib.sha1(json.dumps(watermark, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+def last_successful_fingerprint(stage: str) -> Optional[str]:
+    """Отпечаток входов последнего успешного запуска этапа"""
+    session = SessionLocal()
+    try:
+        row = session.query(PipelineStageRun.fingerprint).filter(
+            PipelineStageRun.stage == stage,
+            PipelineStageRun.status == "ok"
+        ).order_by(PipelineStageRun.id.desc()).first()
+        return row[0] if row else None
+    finally:
+        session.close()
+
+
+def last_status(stage: str) -> Optional[str]:
+    """Статус последнего выполненного (не пропущенного) запуска этапа"""
+    session = SessionLocal()
+    try:
+        row = session.query(PipelineStageRun.status).filter(
+            PipelineStageRun.stage == stage,
+            PipelineStageRun.status != "skipped"
+        ).order_by(PipelineStageRun.id.desc()).first()
+        return row[0] if row else None
+    finally:
+        session.close()
+
+
+def _table_watermark(session, count_column, max_column) -> List:
+    count, latest = session.query(func.count(count_column), func.max(max_column)).one()
+    return [count, latest.isoformat() if latest is not None else None]
+
+
+def _stage_fingerprint(name: str, results: Dict[str, StageResult]) -> Optional[str]:
+    """Отпечаток этапа: из текущего прогона, иначе - последнего успешного"""
+    if name in results and results[name].fingerprint:
+        return results[name].fingerprint
+    return last_successful_fingerprint(name)
+
+
+# --- Этапы -----------------------------------------------------------------
+
+def _scrape(inputs: Dict) -> Tuple[Any, Dict]:
+    try:
+        # Безопасная версия парсера (только BeautifulSoup)
+        from .scrape_site_safe import scrape_products_safe as scrape_products
+    except Exception:
+        from .scrape_site import scrape_products
+    from .normalize import normalize_products
+    products = list(normalize_products(scrape_products(max_pages=PIPELINE_SCRAPE_PAGES)))
+    return products, {"products": len(products)}
+
+
+def _scrape_watermark(results: Dict) -> Dict:
+    # Каталог сайта меняется редко: парсим не чаще раза в день. Выход парсинга живет
+    # только в памяти, поэтому после неудачного сохранения парсим повторно
+    return {
+        "day": date.today(),
+        "max_pages": PIPELINE_SCRAPE_PAGES,
+        "saved": last_status("save") in (None, "ok"),
+    }
+
+
+def _save(inputs: Dict) -> Tuple[Any, Dict]:
+    from .load_to_db import save_products
+    saved = save_products(inputs["scrape"])
+    return None, {"saved": len(saved)}
+
+
+def _save_watermark(results: Dict) -> Optional[Dict]:
+    products = results["scrape"].output if "scrape" in results else None
+    if not products:
+        return None
+    # Тот же каталог, что уже сохранен, - писать в БД нечего
+    records = sorted(json.dumps(p.to_record(), sort_keys=True, default=str, ensure_ascii=False) for p in products)
+    return {"records": hashlib.sha1("\n".join(records).encode("utf-8")).hexdigest()}
+
+
+def _trends(inputs: Dict) -> Tuple[Any, Dict]:
+    from .external.trends import collect_tire_trends
+    from .load_to_db import save_traffic_metrics
+    records = collect_tire_trends()
+    saved = save_traffic_metrics(records) if records else 0
+    return None, {"collected": len(records), "saved": saved}
+
+
+def _trends_watermark(results: Dict) -> Dict:
+    # Google Trends отдает дневные точки
+    return {"day": date.today()}
+
+
+def _weather(inputs: Dict) -> Tuple[Any, Dict]:
+    from .external.weather import ingest_weather
+    return None, {"saved": ingest_weather(WEATHER_DATA_DIR)}
+
+
+def _weather_watermark(results: Dict) -> Optional[Dict]:
+    # Новые/измененные выгрузки в каталоге погоды
+    if not os.path.isdir(WEATHER_DATA_DIR):
+        return None
+    files = []
+    for name in sorted(os.listdir(WEATHER_DATA_DIR)):
+        if name.endswith((".csv", ".parquet")):
+            stat = os.stat(os.path.join(WEATHER_DATA_DIR, name))
+            files.append([name, stat.st_mtime, stat.st_size])
+    return {"files": files} if files else None
+
+
+def _features(inputs: Dict) -> Tuple[Any, Dict]:
+    from ..features.make_features import create_training_dataset
+    from ..modeling.train import default_training_window
+    df = create_training_dataset(*default_training_window())
+    return df, {"rows": len(df), "columns": len(df.columns)}
+
+
+def _features_watermark(results: Dict) -> Dict:
+    from ..modeling.train import default_training_window
+    session = SessionLocal()
+    try:
+        return {
+            "window": default_training_window(),
+            "products": _table_watermark(session, Product.id, Product.id),
+            "prices": _table_watermark(session, PriceSnapshot.id, PriceSnapshot.date),
+            "metrics": _table_watermark(session, MetricValue.metric_id, MetricValue.date),
+            "save": _stage_fingerprint("save", results),
+            "trends": _stage_fingerprint("trends", results),
+            "weather": _stage_fingerprint("weather", results),
+        }
+    finally:
+        session.close()
+
+
+def _train(inputs: Dict) -> Tuple[Any, Dict]:
+    from ..modeling.train import train_demand_model, save_model
+    # Датасет из этапа features; если тот пропущен - собирается заново
+    model, metrics = train_demand_model(dataset=inputs.get("features"))
+    if model is None:
+        raise RuntimeError("Нет данных для обучения")
+    os.makedirs(os.path.dirname(MODEL_PATH) or ".", exist_ok=True)
+    save_model(model, MODEL_PATH)
+    return model, {"test_r2": float(metrics.get("test_r2", 0)), "test_mae": float(metrics.get("test_mae", 0))}
+
+
+def _train_watermark(results: Dict) -> Dict:
+    return {"features": _stage_fingerprint("features", results), "model_exists": os.path.exists(MODEL_PATH)}
+
+
+def _forecast(inputs: Dict) -> Tuple[Any, Dict]:
+    from ..modeling.train import load_model
+    from ..modeling.forecast import generate_forecasts
+    model = inputs.get("train")
+    if model is None:
+        model = load_model(MODEL_PATH)
+    forecast_dates = [date.today() + timedelta(days=i) for i in range(1, 31)]
+    forecasts = generate_forecasts(model, None, forecast_dates)
+    return None, {"forecasts": len(forecasts)}
+
+
+def _forecast_watermark(results: Dict) -> Optional[Dict]:
+    if not os.path.exists(MODEL_PATH):
+        return None
+    session = SessionLocal()
+    try:
+        # Горизонт прогноза сдвигается каждый день
+        return {
+            "day": date.today(),
+            "model_mtime": os.path.getmtime(MODEL_PATH),
+            "products": _table_watermark(session, Product.id, Product.id),
+        }
+    finally:
+        session.close()
+
+
+def _recommend(inputs: Dict) -> Tuple[Any, Dict]:
+    from ..modeling.forecast import get_tread_pattern_recommendations
+    recommendations = get_tread_pattern_recommendations(
+        date.today() + timedelta(days=1), date.today() + timedelta(days=30)
+    )
+    if recommendations is None or recommendations.empty:
+        return None, {"patterns": []}
+    by_pattern = recommendations.groupby(level="tread_pattern")["avg_demand"].mean().sort_values(ascending=False)
+    return recommendations, {"patterns": [[p, float(v)] for p, v in by_pattern.items()]}
+
+
+def _recommend_watermark(results: Dict) -> Optional[Dict]:
+    session = SessionLocal()
+    try:
+        latest_run = session.query(func.max(ForecastRun.id)).scalar()
+    finally:
+        session.close()
+    return {"forecast_run": latest_run} if latest_run else None
+
+
+STAGES: List[Stage] = [
+    Stage("scrape", _scrape, _scrape_watermark),
+    Stage("save", _save, _save_watermark, deps=("scrape",)),
+    Stage("trends", _trends, _trends_watermark),
+    Stage("weather", _weather, _weather_watermark),
+    Stage("features", _features, _features_watermark, after=("save", "trends", "weather")),
+    Stage("train", _train, _train_watermark, deps=("features",)),
+    Stage("forecast", _forecast, _forecast_watermark, deps=("train",)),
+    Stage("recommend", _recommend, _recommend_watermark, deps=("forecast",)),
+]
+
+
+# --- Выполнение ------------------------------------------------------------
+
+def _record(pipeline_run: str, stage: str, result: StageResult, watermark: Optional[Dict],
+            started_at: datetime) -> None:
+    session = SessionLocal()
+    try:
+        session.add(PipelineStageRun(
+            pipeline_run=pipeline_run,
+            stage=stage,
+            status=result.status,
+            fingerprint=result.fingerprint,
+            watermark=json.dumps(watermark, default=str, ensure_ascii=False) if watermark is not None else None,
+            output=json.dumps(result.summary, default=str, ensure_ascii=False),
+            error=result.error,
+            started_at=started_at,
+            finished_at=datetime.utcnow()
+        ))
+        session.commit()
+    finally:
+        session.close()
+
+
+def _run_stage(pipeline_run: str, stage: Stage, results: Dict[str, StageResult], force: bool) -> StageResult:
+    started_at = datetime.utcnow()
+    watermark = None
+    try:
+        watermark = stage.watermark(results)
+        if watermark is None:
+            result = StageResult("skipped", summary={"reason": "нет входных данных"})
+        else:
+            fingerprint = _fingerprint(watermark)
+            if not force and fingerprint == last_successful_fingerprint(stage.name):
+                result = StageResult("skipped", fingerprint, summary={"reason": "входы не изменились"})
+            else:
+                logger.info(f"Этап {stage.name}: запуск")
+                inputs = {dep: results[dep].output for dep in stage.deps}
+                output, summary = stage.run(inputs)
+                result = StageResult("ok", fingerprint, output, summary)
+    except Exception as e:
+        logger.exception(f"Этап {stage.name}: ошибка {e}")
+        result = StageResult("failed", error=f"{type(e).__name__}: {e}")
+
+    _record(pipeline_run, stage.name, result, watermark, started_at)
+    logger.info(f"Этап {stage.name}: {result.status} {result.summary or result.error or ''}")
+    return result
+
+
+def run_pipeline(force: bool = False, stages: Optional[List[Stage]] = None,
+                 progress_callback: Optional[Callable[[int, int], None]] = None) -> Dict[str, StageResult]:
+    """
+    Прогнать пайплайн
+
+    Этап стартует, как только завершились все этапы из его deps и after.
+
+    Args:
+        force: выполнить все этапы, даже если входы не изменились
+        stages: этапы (по умолчанию STAGES)
+        progress_callback: вызывается как (завершено этапов, всего этапов)
+
+    Returns:
+        Результаты этапов по имени
+    """
+    stages = stages or STAGES
+    by_name = {s.name: s for s in stages}
+    for s in stages:
+        unknown = [d for d in s.deps + s.after if d not in by_name]
+        if unknown:
+            raise ValueError(f"Этап {s.name} зависит от неизвестных этапов: {unknown}")
+
+    pipeline_run = uuid.uuid4().hex
+    logger.info(f"=== Пайплайн {pipeline_run}: {len(stages)} этапов ===")
+
+    results: Dict[str, StageResult] = {}
+    pending = dict(by_name)
+    running = {}
+
+    with ThreadPoolExecutor(MAX_PARALLEL_STAGES) as pool:
+        while pending or running:
+            # Запускаем все этапы, предшественники которых завершены
+            ready = [s for s in pending.values() if all(d in results for d in s.deps + s.after)]
+            for stage in ready:
+                del pending[stage.name]
+                failed_deps = [d for d in stage.deps if results[d].status in ("failed", "blocked")]
+                if failed_deps:
+                    results[stage.name] = StageResult("blocked", summary={"failed_deps": failed_deps})
+                    _record(pipeline_run, stage.name, results[stage.name], None, datetime.utcnow())
+                    logger.warning(f"Этап {stage.name}: пропущен из-за ошибок в {failed_deps}")
+                    if progress_callback:
+                        progress_callback(len(results), len(stages))
+                else:
+                    running[pool.submit(_run_stage, pipeline_run, stage, results, force)] = stage.name
+
+            if ready and not running:
+                # Заблокированные этапы могли освободить следующих - проверяем снова
+                continue
+            if not running:
+                raise ValueError(f"Циклические зависимости этапов: {sorted(pending)}")
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                results[running.pop(future)] = future.result()
+                if progress_callback:
+                    progress_callback(len(results), len(stages))
+
+    summary = ", ".join(f"{name}={r.status}" for name, r in results.items())
+    logger.info(f"=== Пайплайн {pipeline_run} завершен: {summary} ===")
+    return results
+
+
+def schedule_pipeline(scheduler=None, cron: str = PIPELINE_CRON):
+    """
+    Добавить пайплайн в планировщик APScheduler по расписанию cron
+
+    Returns:
+        Планировщик (по умолчанию BlockingScheduler - запускать через start())
+    """
+    from apscheduler.schedulers.blocking import BlockingScheduler
+    from apscheduler.triggers.cron import CronTrigger
+
+    if scheduler is None:
+        scheduler = BlockingScheduler()
+    scheduler.add_job(
+        run_pipeline, CronTrigger.from_crontab(cron), id="pipeline",
+        max_instances=1, coalesce=True, replace_existing=True
+    )
+    logger.info(f"Пайплайн запланирован: {cron}")
+    return scheduler
+
+
+def main():
+    """Основная функция"""
+    parser = argparse.ArgumentParser(description="Инкрементальный пайплайн анализа спроса")
+    parser.add_argument("--once", action="store_true", help="один прогон вместо расписания")
+    parser.add_argument("--force", action="store_true", help="выполнить все этапы")
+    args = parser.parse_args()
+
+    if args.once:
+        with profiled("pipeline"):
+            results = run_pipeline(force=args.force)
+        if any(r.status in ("failed", "blocked") for r in results.values()):
+            raise SystemExit(1)
+        return
+
+    schedule_pipeline().start()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,42 +1,115 @@
 """
 Основной пайплайн для сбора данных и анализа спроса
 """
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import date, timedelta
+from queue import Queue
+from threading import Event
+from typing import Iterator, List, Dict
 from loguru import logger
 
-from .scrape_site import scrape_products
+from .scrape_site import iter_products
 from .external.trends import collect_tire_trends
-from .load_to_db import save_products, save_traffic_metrics
+from .load_to_db import save_product_batches, save_traffic_metrics
+from .normalize import normalize_batches
+from ..utils.logging_setup import timed
+
+# Сколько страниц каталога парсер может опережать запись в БД
+SCRAPE_PREFETCH_PAGES = 4
+
+_DONE = object()
+
+
+def prefetch(batches: Iterator[List[Dict]], executor: ThreadPoolExecutor,
+             maxsize: int = SCRAPE_PREFETCH_PAGES) -> Iterator[List[Dict]]:
+    """
+    Выполнять итератор в потоке executor, отдавая готовые пачки через очередь
+    
+    Пока потребитель пишет пачку в БД, парсер уже скачивает следующие страницы.
+    Ошибка парсера пробрасывается потребителю.
+    """
+    queue: Queue = Queue(maxsize=maxsize)
+    stop = Event()
+    
+    def produce():
+        try:
+            for batch in batches:
+                if stop.is_set():
+                    break
+                queue.put(batch)
+        except Exception as e:
+            queue.put(e)
+        finally:
+            queue.put(_DONE)
+    
+    executor.submit(produce)
+    done = False
+    try:
+        while True:
+            item = queue.get()
+            if item is _DONE:
+                done = True
+                return
+            if isinstance(item, Exception):
+                raise item
+            yield item
+    finally:
+        # Потребитель упал или остановился раньше - останавливаем парсер и освобождаем очередь
+        stop.set()
+        while not done:
+            done = queue.get() is _DONE
+
+
+@timed()
+def collect_products(max_pages: int = 5) -> int:
+    """Парсинг каталога с потоковой записью в БД: страницы нормализуются и сохраняются по мере обхода"""
+    with ThreadPoolExecutor(max_workers=1, thread_name_prefix="scrape") as scrape_executor:
+        pages = prefetch(iter_products(max_pages=max_pages), scrape_executor)
+        return save_product_batches(normalize_batches(pages))
+
+
+@timed()
+def collect_trends() -> int:
+    """Сбор и сохранение трендов"""
+    trend_records = collect_tire_trends()
+    return save_traffic_metrics(trend_records)
 
 
 def run_data_collection_pipeline():
     """Запустить полный пайплайн сбора данных"""
     logger.info("=== Начало сбора данных ===")
+    started = time.perf_counter()
     
-    # 1. Парсинг продукции с сайта
-    logger.info("Шаг 1: Парсинг продукции...")
-    try:
-        products = scrape_products(max_pages=5)  # Начать с 5 страниц для теста
-        saved_products = save_products(products)
-        logger.info(f"✓ Сохранено товаров: {len(saved_products)}")
-    except Exception as e:
-        logger.error(f"✗ Ошибка парсинга продукции: {e}")
-        return False
+    # Парсинг и тренды независимы и упираются в сеть и паузы между запросами -
+    # выполняем их одновременно, каждый в своем executor
+    logger.info("Шаги 1-2: Парсинг продукции и сбор данных Google Trends (параллельно)...")
+    with ThreadPoolExecutor(max_workers=1, thread_name_prefix="products") as products_executor, \
+            ThreadPoolExecutor(max_workers=1, thread_name_prefix="trends") as trends_executor:
+        products_future = products_executor.submit(collect_products, 5)  # Начать с 5 страниц для теста
+        trends_future = trends_executor.submit(collect_trends)
+        
+        success = True
+        try:
+            saved_products = products_future.result()
+            logger.info(f"✓ Сохранено товаров: {saved_products}")
+        except Exception as e:
+            logger.error(f"✗ Ошибка парсинга продукции: {e}")
+            success = False
+        
+        try:
+            saved_count = trends_future.result()
+            logger.info(f"✓ Сохранено метрик трендов: {saved_count}")
+        except Exception as e:
+            logger.error(f"✗ Ошибка сбора трендов: {e}")
+            success = False
     
-    # 2. Сбор данных о трендах
-    logger.info("Шаг 2: Сбор данных Google Trends...")
-    try:
-        trend_records = collect_tire_trends()
-        saved_count = save_traffic_metrics(trend_records)
-        logger.info(f"✓ Сохранено метрик трендов: {saved_count}")
-    except Exception as e:
-        logger.error(f"✗ Ошибка сбора трендов: {e}")
+    if not success:
         return False
     
-    logger.info("=== Сбор данных завершен ===")
+    logger.info(f"=== Сбор данных завершен за {time.perf_counter() - started:.1f} с ===")
     return True
 
 
 if __name__ == "__main__":
     run_data_collection_pipeline()
-
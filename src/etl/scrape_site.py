@@ -3,10 +3,9 @@
 Извлекает товары, категории и их характеристики
 """
 import time
-import json
 import requests
 from loguru import logger
-from typing import List, Dict, Optional
+from typing import Iterator, List, Dict, Optional
 from urllib.parse import urljoin
 
 # Пробуем использовать selectolax, если не работает - используем BeautifulSoup
@@ -22,6 +21,8 @@ except (ImportError, SystemError, OSError):
         raise ImportError("Необходим selectolax или beautifulsoup4")
 
 from ..config import SCRAPE_BASE_URL, REQUESTS_TIMEOUT, REQUESTS_SLEEP_BETWEEN, USER_AGENT
+from ..utils.logging_setup import timed, record_http
+from .normalize import canonical_sku, classify_tread_pattern
 
 
 class ProductScraper:
@@ -42,10 +43,12 @@ class ProductScraper:
         self.session = requests.Session()
         self.session.headers.update({"User-Agent": USER_AGENT})
     
+    @timed("scrape.get_page")
     def get_page(self, url: str):
         """Получить HTML страницы"""
         try:
             response = self.session.get(url, timeout=REQUESTS_TIMEOUT)
+            record_http(response)
             response.raise_for_status()
             
             if USE_SELECTOLAX:
@@ -326,9 +329,7 @@ class ProductScraper:
     
     def _generate_sku(self, name: str) -> str:
         """Генерировать SKU из названия"""
-        # Простая генерация SKU из названия
-        import hashlib
-        return hashlib.md5(name.encode()).hexdigest()[:12]
+        return canonical_sku(name)
     
     def extract_product_details(self, product_url: str) -> Dict:
         """Извлечь детальную информацию о товаре со страницы товара"""
@@ -355,8 +356,8 @@ class ProductScraper:
             except Exception:
                 continue
         
-        # Сохраняем характеристики в JSON формате
-        details["specifications"] = json.dumps(specs, ensure_ascii=False) if specs else None
+        # Характеристики словарем - в JSON их переводит драйвер БД
+        details["specifications"] = specs or None
         
         # Извлечение типа протектора для шин
         tread_pattern = self._extract_tread_pattern(specs, html)
@@ -380,37 +381,17 @@ class ProductScraper:
     
     def _extract_tread_pattern(self, specs: Dict, html: HTMLParser) -> Optional[str]:
         """Извлечь тип протектора для шин"""
-        # Поиск в характеристиках
-        pattern_keywords = {
-            "протектор": ["протектор", "tread", "pattern"],
-            "зимние": ["зимн", "winter", "snow"],
-            "летние": ["летн", "summer"],
-            "всесезонные": ["всесезон", "all-season", "all-weather"],
-            "дорожные": ["дорожн", "highway"],
-            "внедорожные": ["внедорожн", "off-road", "mud"]
-        }
+        texts = [f"{key} {value}" for key, value in specs.items()]
         
-        # Проверяем характеристики
-        for key, value in specs.items():
-            value_lower = value.lower()
-            for pattern, keywords in pattern_keywords.items():
-                if any(kw in value_lower or kw in key.lower() for kw in keywords):
-                    return pattern
-        
-        # Проверяем описание товара
+        # Описание товара проверяется после характеристик
         desc_elem = html.css_first(".description, .product-description, .content")
         if desc_elem:
-            desc_text = desc_elem.text().lower()
-            for pattern, keywords in pattern_keywords.items():
-                if any(kw in desc_text for kw in keywords):
-                    return pattern
+            texts.append(desc_elem.text())
         
-        return None
+        return classify_tread_pattern(texts)
     
-    def scrape_catalog(self, category_url: Optional[str] = None, max_pages: int = 10) -> List[Dict]:
-        """Спарсить каталог товаров"""
-        products = []
-        
+    def iter_catalog(self, category_url: Optional[str] = None, max_pages: int = 10) -> Iterator[List[Dict]]:
+        """Спарсить каталог постранично: отдает товары каждой страницы, не дожидаясь конца обхода"""
         if not category_url:
             # Если SCRAPE_BASE_URL уже содержит путь, используем его напрямую
             if SCRAPE_BASE_URL and SCRAPE_BASE_URL != "https://www.jsc-niir.ru":
@@ -471,9 +452,15 @@ class ProductScraper:
                     except Exception as e:
                         logger.warning(f"Не удалось получить детали для {product['url']}: {e}")
             
-            products.extend(page_products)
+            yield page_products
             page_num += 1
             time.sleep(REQUESTS_SLEEP_BETWEEN)
+    
+    def scrape_catalog(self, category_url: Optional[str] = None, max_pages: int = 10) -> List[Dict]:
+        """Спарсить каталог товаров"""
+        products = []
+        for page_products in self.iter_catalog(category_url, max_pages):
+            products.extend(page_products)
         
         logger.info(f"Найдено товаров: {len(products)}")
         return products
@@ -485,6 +472,12 @@ def scrape_products(category_url: Optional[str] = None, max_pages: int = 10) ->
     return scraper.scrape_catalog(category_url, max_pages)
 
 
+def iter_products(category_url: Optional[str] = None, max_pages: int = 10) -> Iterator[List[Dict]]:
+    """Постраничный парсинг товаров: список товаров каждой страницы каталога"""
+    scraper = ProductScraper()
+    return scraper.iter_catalog(category_url, max_pages)
+
+
 if __name__ == "__main__":
     # Тестовый запуск
     products = scrape_products(max_pages=2)
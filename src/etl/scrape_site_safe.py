@@ -7,11 +7,13 @@ import json
 import requests
 from bs4 import BeautifulSoup
 from loguru import logger
-from typing import List, Dict, Optional
+from typing import Iterator, List, Dict, Optional
 from urllib.parse import urljoin
 import re
 
 from ..config import SCRAPE_BASE_URL, REQUESTS_TIMEOUT, REQUESTS_SLEEP_BETWEEN, USER_AGENT
+from ..utils.logging_setup import timed, record_http
+from .normalize import canonical_sku
 
 
 class ProductScraperSafe:
@@ -30,10 +32,12 @@ class ProductScraperSafe:
         self.session = requests.Session()
         self.session.headers.update({"User-Agent": USER_AGENT})
     
+    @timed("scrape.get_page")
     def get_page(self, url: str):
         """Получить HTML страницы"""
         try:
             response = self.session.get(url, timeout=REQUESTS_TIMEOUT)
+            record_http(response)
             response.raise_for_status()
             return BeautifulSoup(response.text, 'html.parser')
         except Exception as e:
@@ -131,13 +135,10 @@ class ProductScraperSafe:
     
     def _generate_sku(self, name: str) -> str:
         """Генерировать SKU из названия"""
-        import hashlib
-        return hashlib.md5(name.encode()).hexdigest()[:12]
+        return canonical_sku(name)
     
-    def scrape_catalog(self, category_url: Optional[str] = None, max_pages: int = 10) -> List[Dict]:
-        """Спарсить каталог товаров"""
-        products = []
-        
+    def iter_catalog(self, category_url: Optional[str] = None, max_pages: int = 10) -> Iterator[List[Dict]]:
+        """Спарсить каталог постранично: отдает товары каждой страницы, не дожидаясь конца обхода"""
         if not category_url:
             if SCRAPE_BASE_URL and SCRAPE_BASE_URL != "https://www.jsc-niir.ru":
                 category_url = SCRAPE_BASE_URL
@@ -178,9 +179,15 @@ class ProductScraperSafe:
                 logger.info(f"Товары не найдены на странице {page_num}, остановка")
                 break
             
-            products.extend(page_products)
+            yield page_products
             page_num += 1
             time.sleep(REQUESTS_SLEEP_BETWEEN)
+    
+    def scrape_catalog(self, category_url: Optional[str] = None, max_pages: int = 10) -> List[Dict]:
+        """Спарсить каталог товаров"""
+        products = []
+        for page_products in self.iter_catalog(category_url, max_pages):
+            products.extend(page_products)
         
         logger.info(f"Найдено товаров: {len(products)}")
         return products
@@ -191,3 +198,8 @@ def scrape_products_safe(category_url: Optional[str] = None, max_pages: int = 10
     scraper = ProductScraperSafe()
     return scraper.scrape_catalog(category_url, max_pages)
 
+
+def iter_products_safe(category_url: Optional[str] = None, max_pages: int = 10) -> Iterator[List[Dict]]:
+    """Постраничный парсинг товаров (только BeautifulSoup)"""
+    scraper = ProductScraperSafe()
+    return scraper.iter_catalog(category_url, max_pages)
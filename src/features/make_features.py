@@ -2,14 +2,24 @@
 Feature Engineering для прогнозирования спроса
 Извлечение признаков из данных товаров, трендов, сезонности
 """
-import json
-from datetime import date, datetime
-from typing import Dict, List, Optional
+from datetime import date, datetime, timedelta
+from typing import Callable, Dict, Iterable, List, Optional
 import pandas as pd
 from loguru import logger
 
 from ..db import SessionLocal
-from ..models import Product, PriceSnapshot, TrafficMetric
+from ..models import Product, PriceSnapshot, Metric, MetricValue
+from ..etl.metrics_store import metric_series_query
+from ..etl.external.holiday import holiday_features
+from ..etl.external.weather import WEATHER_FEATURE_COLUMNS, weather_feature_lookup
+from .series_index import TrendIndex, PriceIndex, track
+from ..utils.logging_setup import timed
+
+# Окна признаков (дней до целевой даты, не включая ее)
+TREND_LOOKBACK_DAYS = 30
+PRICE_LOOKBACK_DAYS = 90
+# Сколько товаров за один запрос при загрузке истории цен в кэш
+PRICE_PRELOAD_CHUNK = 500
 
 
 def extract_product_features(product: Product) -> Dict:
@@ -21,17 +31,19 @@ def extract_product_features(product: Product) -> Dict:
         "tread_pattern": product.tread_pattern or "unknown"
     }
     
-    # Парсим характеристики если есть
-    if product.specifications:
-        try:
-            specs = json.loads(product.specifications)
-            features["specs_count"] = len(specs)
-            # Добавляем ключевые характеристики если есть
-            for key in ["размер", "size", "диаметр", "width", "ratio"]:
-                if key in specs:
-                    features[f"spec_{key}"] = specs[key]
-        except Exception:
-            pass
+    # Характеристики уже разобраны при загрузке: словарь из JSON-колонки и числовой размер
+    specs = product.specifications or {}
+    if specs:
+        features["specs_count"] = len(specs)
+        # Добавляем ключевые характеристики если есть
+        for key in ["размер", "size", "диаметр", "width", "ratio"]:
+            if key in specs:
+                features[f"spec_{key}"] = specs[key]
+    
+    # Колонки размера есть у каждого товара (None -> fillna при обучении и прогнозе),
+    # чтобы набор признаков модели не зависел от того, распознан ли размер первого товара
+    for column in ("size_width", "size_ratio", "size_diameter"):
+        features[column] = getattr(product, column)
     
     return features
 
@@ -54,35 +66,54 @@ def extract_temporal_features(target_date: date) -> Dict:
     features["winter_tire_season"] = 1.0 if target_date.month in [10, 11, 12, 1, 2, 3] else 0.0
     features["summer_tire_season"] = 1.0 if target_date.month in [4, 5, 6, 7, 8, 9] else 0.0
     
+    # Праздники, новогодний период и окна смены шин - из предрассчитанного календаря
+    features.update(holiday_features(target_date))
+    
     return features
 
 
-def get_trend_features(product: Product, target_date: date, lookback_days: int = 30) -> Dict:
+def trend_series_query(session, metric_name: str, start_date: date, end_date: date):
+    """Точки тренда (date, value) за [start_date, end_date) - диапазон по ключу (metric_id, date)"""
+    return metric_series_query(session, metric_name, start_date, end_date)
+
+
+def price_history_query(session, product_id: int, start_date: date, end_date: date):
+    """Снимки цен товара за [start_date, end_date), новые первыми - индекс (product_id, date)"""
+    return session.query(PriceSnapshot).filter(
+        PriceSnapshot.product_id == product_id,
+        PriceSnapshot.date >= start_date,
+        PriceSnapshot.date < end_date
+    ).order_by(PriceSnapshot.date.desc())
+
+
+def trend_keywords(product: Product) -> List[str]:
+    """Ключевые слова трендов для товара: категория, тип протектора, общий запрос"""
+    category_keywords = []
+    if product.category:
+        category_keywords.append(product.category.lower())
+    if product.tread_pattern:
+        category_keywords.append(f"{product.tread_pattern} шины")
+    
+    # Добавляем общий запрос для шин
+    category_keywords.append("шины")
+    return category_keywords
+
+
+def get_trend_features(product: Product, target_date: date, lookback_days: int = TREND_LOOKBACK_DAYS) -> Dict:
     """Получить признаки из трендов"""
     session = SessionLocal()
     features = {}
     
     try:
         # Ищем тренды для категории товара
-        category_keywords = []
-        if product.category:
-            category_keywords.append(product.category.lower())
-        if product.tread_pattern:
-            category_keywords.append(f"{product.tread_pattern} шины")
-        
-        # Добавляем общий запрос для шин
-        category_keywords.append("шины")
+        category_keywords = trend_keywords(product)
         
         # Получаем средние значения трендов за последние N дней
         start_date = target_date - pd.Timedelta(days=lookback_days)
         
         for keyword in category_keywords:
             metric_name = f"trend_keyword:{keyword}"
-            trends = session.query(TrafficMetric).filter(
-                TrafficMetric.metric_name == metric_name,
-                TrafficMetric.date >= start_date,
-                TrafficMetric.date < target_date
-            ).all()
+            trends = trend_series_query(session, metric_name, start_date, target_date).all()
             
             if trends:
                 avg_trend = sum(t.value for t in trends) / len(trends)
@@ -94,11 +125,7 @@ def get_trend_features(product: Product, target_date: date, lookback_days: int =
         if product.tread_pattern:
             pattern_keyword = f"{product.tread_pattern} шины"
             metric_name = f"trend_keyword:{pattern_keyword}"
-            pattern_trends = session.query(TrafficMetric).filter(
-                TrafficMetric.metric_name == metric_name,
-                TrafficMetric.date >= start_date,
-                TrafficMetric.date < target_date
-            ).all()
+            pattern_trends = trend_series_query(session, metric_name, start_date, target_date).all()
             
             if pattern_trends:
                 features["tread_pattern_trend_avg"] = sum(t.value for t in pattern_trends) / len(pattern_trends)
@@ -112,7 +139,7 @@ def get_trend_features(product: Product, target_date: date, lookback_days: int =
     return features
 
 
-def get_price_features(product: Product, target_date: date, lookback_days: int = 90) -> Dict:
+def get_price_features(product: Product, target_date: date, lookback_days: int = PRICE_LOOKBACK_DAYS) -> Dict:
     """Получить признаки из истории цен"""
     session = SessionLocal()
     features = {}
@@ -120,11 +147,7 @@ def get_price_features(product: Product, target_date: date, lookback_days: int =
     try:
         start_date = target_date - pd.Timedelta(days=lookback_days)
         
-        prices = session.query(PriceSnapshot).filter(
-            PriceSnapshot.product_id == product.id,
-            PriceSnapshot.date >= start_date,
-            PriceSnapshot.date < target_date
-        ).order_by(PriceSnapshot.date.desc()).all()
+        prices = price_history_query(session, product.id, start_date, target_date).all()
         
         if prices:
             price_values = [p.price for p in prices if p.price]
@@ -153,27 +176,207 @@ def get_price_features(product: Product, target_date: date, lookback_days: int =
     return features
 
 
-def create_feature_vector(product: Product, target_date: date) -> Dict:
-    """Создать вектор признаков для товара на целевую дату"""
+def load_weather_features(dates: List[date]) -> Dict[date, Dict]:
+    """Погодные признаки на все даты датасета/прогноза - один запрос вместо запроса на строку"""
+    session = SessionLocal()
+    try:
+        return weather_feature_lookup(session, dates)
+    except Exception as e:
+        logger.error(f"Ошибка при получении погодных признаков: {e}")
+        return {}
+    finally:
+        session.close()
+
+
+class FeatureCache:
+    """
+    Кэш признаков на один прогон (датасет обучения, запуск прогноза)
+    
+    Статические признаки товара считаются один раз на товар. Ряды трендов
+    и история цен загружаются один раз на весь период прогона в индексы
+    series_index (дневные массивы NumPy по date.toordinal() с префиксными суммами
+    и разреженными таблицами) - агрегаты окна на любую дату за O(1).
+    Индексы подписаны на новые точки, сохраняемые загрузчиками во время прогона.
+    Для дат вне периода используются обычные запросы.
+    """
+    
+    def __init__(self, start_date: date, end_date: date):
+        self.start_date = start_date
+        self.end_date = end_date
+        self.origin = start_date - timedelta(days=max(TREND_LOOKBACK_DAYS, PRICE_LOOKBACK_DAYS))
+        
+        self._product_features: Dict[int, Dict] = {}
+        self._keywords: Dict[int, List[str]] = {}
+        self._trends: Dict[str, TrendIndex] = {}
+        self._prices: Dict[int, PriceIndex] = {}
+    
+    def covers(self, target_date: date) -> bool:
+        return self.start_date <= target_date <= self.end_date
+    
+    # --- Загрузка ---------------------------------------------------------
+    
+    def _load_trend(self, session, metric_name: str) -> TrendIndex:
+        rows = session.query(Metric.region, MetricValue.date, MetricValue.value).join(
+            Metric, Metric.id == MetricValue.metric_id
+        ).filter(
+            Metric.name == metric_name,
+            MetricValue.date >= self.origin,
+            MetricValue.date <= self.end_date
+        ).all()
+        index = TrendIndex(self.origin, rows)
+        track(("metric", metric_name), index)
+        return index
+    
+    @timed()
+    def preload(self, products: Iterable[Product]) -> None:
+        """Загрузить ряды трендов и историю цен для всех товаров прогона пачкой запросов"""
+        products = list(products)
+        session = SessionLocal()
+        try:
+            for product in products:
+                for keyword in self.keywords(product):
+                    metric_name = f"trend_keyword:{keyword}"
+                    if metric_name not in self._trends:
+                        self._trends[metric_name] = self._load_trend(session, metric_name)
+            
+            ids = list(dict.fromkeys(p.id for p in products if p.id not in self._prices))
+            for offset in range(0, len(ids), PRICE_PRELOAD_CHUNK):
+                chunk = ids[offset:offset + PRICE_PRELOAD_CHUNK]
+                snapshots: Dict[int, List] = {product_id: [] for product_id in chunk}
+                rows = session.query(
+                    PriceSnapshot.product_id, PriceSnapshot.date, PriceSnapshot.price,
+                    PriceSnapshot.in_stock, PriceSnapshot.promo
+                ).filter(
+                    PriceSnapshot.product_id.in_(chunk),
+                    PriceSnapshot.date >= self.origin,
+                    PriceSnapshot.date <= self.end_date
+                ).all()
+                for product_id, day, price, in_stock, promo in rows:
+                    snapshots[product_id].append((day, price, in_stock, promo))
+                for product_id, history in snapshots.items():
+                    index = PriceIndex(self.origin, history)
+                    track(("price", product_id), index)
+                    self._prices[product_id] = index
+        finally:
+            session.close()
+    
+    def _trend(self, metric_name: str) -> TrendIndex:
+        if metric_name not in self._trends:
+            session = SessionLocal()
+            try:
+                self._trends[metric_name] = self._load_trend(session, metric_name)
+            finally:
+                session.close()
+        return self._trends[metric_name]
+    
+    def _price_index(self, product: Product) -> PriceIndex:
+        if product.id not in self._prices:
+            self.preload([product])
+        return self._prices[product.id]
+    
+    # --- Признаки ---------------------------------------------------------
+    
+    def keywords(self, product: Product) -> List[str]:
+        if product.id not in self._keywords:
+            self._keywords[product.id] = trend_keywords(product)
+        return self._keywords[product.id]
+    
+    def product_features(self, product: Product) -> Dict:
+        if product.id not in self._product_features:
+            self._product_features[product.id] = extract_product_features(product)
+        return dict(self._product_features[product.id])
+    
+    def trend_features(self, product: Product, target_date: date) -> Dict:
+        """То же, что get_trend_features, по индексам рядов"""
+        if not self.covers(target_date):
+            return get_trend_features(product, target_date)
+        
+        start = target_date - timedelta(days=TREND_LOOKBACK_DAYS)
+        features = {}
+        for keyword in self.keywords(product):
+            window = self._trend(f"trend_keyword:{keyword}").window(start, target_date)
+            if window:
+                features[f"trend_avg_{keyword.replace(' ', '_')}"] = window.mean
+                features[f"trend_max_{keyword.replace(' ', '_')}"] = window.max
+        
+        if product.tread_pattern:
+            window = self._trend(f"trend_keyword:{product.tread_pattern} шины").window(start, target_date)
+            if window:
+                features["tread_pattern_trend_avg"] = window.mean
+                features["tread_pattern_trend_max"] = window.max
+        return features
+    
+    def price_features(self, product: Product, target_date: date) -> Dict:
+        """То же, что get_price_features, по индексам истории цен"""
+        if not self.covers(target_date):
+            return get_price_features(product, target_date)
+        
+        index = self._price_index(product)
+        start = target_date - timedelta(days=PRICE_LOOKBACK_DAYS)
+        snapshots = index.snapshots.window(start, target_date)
+        if not snapshots:
+            return {}
+        
+        features = {}
+        prices = index.prices.window(start, target_date)
+        if prices:
+            features["price_mean"] = prices.mean
+            features["price_min"] = prices.min
+            features["price_max"] = prices.max
+            features["price_std"] = prices.std
+            
+            # Последняя цена - самый поздний снимок в окне
+            last_day, _ = index.snapshots.last(start, target_date)
+            features["last_price"] = index.prices.value_on(last_day)
+        
+        in_stock = index.in_stock.window(start, target_date)
+        promo = index.promo.window(start, target_date)
+        features["in_stock_ratio"] = in_stock.sum / snapshots.count if in_stock else 0.0
+        features["promo_ratio"] = promo.sum / snapshots.count if promo else 0.0
+        return features
+
+
+def create_feature_vector(product: Product, target_date: date, weather: Optional[Dict[date, Dict]] = None,
+                          cache: Optional[FeatureCache] = None) -> Dict:
+    """
+    Создать вектор признаков для товара на целевую дату
+    
+    Args:
+        weather: погодные признаки по датам (см. load_weather_features); если None - колонки погоды NaN
+        cache: кэш признаков прогона (см. FeatureCache); если None - признаки запрашиваются из БД
+    """
     features = {}
     
     # Признаки товара
-    features.update(extract_product_features(product))
+    features.update(cache.product_features(product) if cache else extract_product_features(product))
     
     # Временные признаки
     features.update(extract_temporal_features(target_date))
     
     # Признаки из трендов
-    features.update(get_trend_features(product, target_date))
+    features.update(cache.trend_features(product, target_date) if cache else get_trend_features(product, target_date))
     
     # Признаки из цен
-    features.update(get_price_features(product, target_date))
+    features.update(cache.price_features(product, target_date) if cache else get_price_features(product, target_date))
+    
+    # Погода (первый мороз, средняя температура, снежные дни). Колонки есть всегда (NaN -> fillna),
+    # как и у размера: набор признаков не должен зависеть от того, есть ли погода на дату
+    day_weather = weather.get(target_date, {}) if weather else {}
+    for column in WEATHER_FEATURE_COLUMNS:
+        features[column] = day_weather.get(column, float("nan"))
     
     return features
 
 
-def create_training_dataset(start_date: date, end_date: date) -> pd.DataFrame:
-    """Создать датасет для обучения модели"""
+@timed()
+def create_training_dataset(start_date: date, end_date: date,
+                            progress_callback: Optional[Callable[[int, int], None]] = None) -> pd.DataFrame:
+    """
+    Создать датасет для обучения модели
+    
+    Args:
+        progress_callback: вызывается после каждой даты как (обработано дат, всего дат)
+    """
     session = SessionLocal()
     records = []
     
@@ -181,12 +384,20 @@ def create_training_dataset(start_date: date, end_date: date) -> pd.DataFrame:
         products = session.query(Product).all()
         
         # Генерируем записи для каждого товара и каждой даты
+        total_days = (end_date - start_date).days + 1
+        weather = load_weather_features([start_date + timedelta(days=i) for i in range(total_days)])
+        cache = FeatureCache(start_date, end_date)
+        cache.preload(products)
+        days_done = 0
         current_date = start_date
         while current_date <= end_date:
             for product in products:
-                features = create_feature_vector(product, current_date)
+                features = create_feature_vector(product, current_date, weather, cache)
                 records.append(features)
             current_date += pd.Timedelta(days=1)
+            days_done += 1
+            if progress_callback:
+                progress_callback(days_done, total_days)
         
         df = pd.DataFrame(records)
         logger.info(f"Создан датасет: {len(df)} записей, {len(df.columns)} признаков")
@@ -0,0 +1,289 @@
+"""
+Индексы временных рядов для оконных агрегатов за O(1)
+
+SeriesIndex хранит ряд с шагом в день (не больше одной точки на день) начиная с origin:
+- префиксные суммы количества точек, значений и квадратов - count/sum/mean/std окна;
+- разреженные таблицы (sparse table) минимумов и максимумов - min/max окна;
+- последний день с точкой для каждой позиции - последнее значение в окне.
+Любой агрегат по окну [start, end) - O(1).
+
+Точка в конец ряда добавляется за O(log n); исправление точки в середине помечает
+индекс устаревшим, и он перестраивается при следующем запросе. Загрузчики
+(save_traffic_metrics, save_price_snapshot) сообщают о сохраненных точках через
+notify() всем живым индексам ряда. Запись и чтение идут под блокировкой индекса:
+notify() вызывается из потоков загрузчиков параллельно с запросами.
+"""
+import math
+import weakref
+from dataclasses import dataclass
+from datetime import date
+from threading import Lock
+from typing import Dict, Hashable, Iterable, List, Optional, Tuple
+import numpy as np
+
+MIN_CAPACITY = 64
+
+
+@dataclass
+class WindowStats:
+    """Агрегаты точек ряда в окне"""
+    count: int
+    sum: float
+    sum_sq: float
+    min: float
+    max: float
+
+    @property
+    def mean(self) -> float:
+        return self.sum / self.count
+
+    @property
+    def std(self) -> float:
+        """Выборочное стандартное отклонение (ddof=1), NaN для одной точки"""
+        if self.count < 2:
+            return float("nan")
+        variance = (self.sum_sq - self.sum * self.sum / self.count) / (self.count - 1)
+        return math.sqrt(max(variance, 0.0))
+
+    def merge(self, other: Optional["WindowStats"]) -> "WindowStats":
+        """Объединить агрегаты двух рядов за одно окно"""
+        if other is None:
+            return self
+        return WindowStats(self.count + other.count, self.sum + other.sum, self.sum_sq + other.sum_sq,
+                           min(self.min, other.min), max(self.max, other.max))
+
+
+def _resized(array: np.ndarray, capacity: int, fill) -> np.ndarray:
+    grown = np.full(capacity, fill, dtype=array.dtype)
+    grown[:len(array)] = array
+    return grown
+
+
+class SeriesIndex:
+    """Дневной ряд с префиксными суммами и разреженными таблицами min/max"""
+
+    def __init__(self, origin: date, points: Iterable[Tuple[date, float]] = ()):
+        self.origin = origin.toordinal()
+        self._lock = Lock()
+        self._n = 0  # дней в индексе, начиная с origin
+        self._values = np.full(MIN_CAPACITY, np.nan)  # NaN - нет точки
+
+        by_index = {}
+        for day, value in points:
+            i = day.toordinal() - self.origin
+            if i >= 0:
+                by_index[i] = value
+        if by_index:
+            self._n = max(by_index) + 1
+            self._values = np.full(max(self._n, MIN_CAPACITY), np.nan)
+            for i, value in by_index.items():
+                self._values[i] = np.nan if value is None else value
+        self._rebuild()
+
+    @property
+    def capacity(self) -> int:
+        return len(self._values)
+
+    def _rebuild(self) -> None:
+        """Пересчитать префиксные суммы и разреженные таблицы по _values[:_n]"""
+        n, capacity = self._n, self.capacity
+        values = self._values[:n]
+        has = ~np.isnan(values)
+        filled = np.where(has, values, 0.0)
+
+        self._cum_count = np.zeros(capacity + 1, dtype=np.int64)
+        self._cum_sum = np.zeros(capacity + 1)
+        self._cum_sq = np.zeros(capacity + 1)
+        np.cumsum(has, out=self._cum_count[1:n + 1])
+        np.cumsum(filled, out=self._cum_sum[1:n + 1])
+        np.cumsum(filled * filled, out=self._cum_sq[1:n + 1])
+
+        self._last = np.full(capacity, -1, dtype=np.int64)
+        if n:
+            self._last[:n] = np.maximum.accumulate(np.where(has, np.arange(n), -1))
+
+        # Уровень k: min/max по [j, j + 2^k); валидны позиции j <= n - 2^k
+        self._min_levels = [_resized(np.where(has, values, np.inf), capacity, np.inf)]
+        self._max_levels = [_resized(np.where(has, values, -np.inf), capacity, -np.inf)]
+        k = 1
+        while (1 << k) <= n:
+            half, count = 1 << (k - 1), n - (1 << k) + 1
+            prev_min, prev_max = self._min_levels[-1], self._max_levels[-1]
+            level_min = np.full(capacity, np.inf)
+            level_max = np.full(capacity, -np.inf)
+            level_min[:count] = np.minimum(prev_min[:count], prev_min[half:half + count])
+            level_max[:count] = np.maximum(prev_max[:count], prev_max[half:half + count])
+            self._min_levels.append(level_min)
+            self._max_levels.append(level_max)
+            k += 1
+        self._dirty = False
+
+    def _grow(self, needed: int) -> None:
+        capacity = max(needed, 2 * self.capacity, MIN_CAPACITY)
+        self._values = _resized(self._values, capacity, np.nan)
+        self._cum_count = _resized(self._cum_count, capacity + 1, 0)
+        self._cum_sum = _resized(self._cum_sum, capacity + 1, 0.0)
+        self._cum_sq = _resized(self._cum_sq, capacity + 1, 0.0)
+        self._last = _resized(self._last, capacity, -1)
+        self._min_levels = [_resized(level, capacity, np.inf) for level in self._min_levels]
+        self._max_levels = [_resized(level, capacity, -np.inf) for level in self._max_levels]
+
+    def _append(self, value: float) -> None:
+        """Добавить день в конец ряда: O(log n)"""
+        p = self._n
+        if p >= self.capacity:
+            self._grow(p + 1)
+        has = not math.isnan(value)
+        self._values[p] = value
+        self._cum_count[p + 1] = self._cum_count[p] + has
+        self._cum_sum[p + 1] = self._cum_sum[p] + (value if has else 0.0)
+        self._cum_sq[p + 1] = self._cum_sq[p] + (value * value if has else 0.0)
+        self._last[p] = p if has else (self._last[p - 1] if p else -1)
+        self._min_levels[0][p] = value if has else np.inf
+        self._max_levels[0][p] = value if has else -np.inf
+
+        # Новые валидные ячейки уровней: отрезки, заканчивающиеся на p
+        k = 1
+        while (1 << k) <= p + 1:
+            if k == len(self._min_levels):
+                self._min_levels.append(np.full(self.capacity, np.inf))
+                self._max_levels.append(np.full(self.capacity, -np.inf))
+            j, half = p - (1 << k) + 1, 1 << (k - 1)
+            self._min_levels[k][j] = min(self._min_levels[k - 1][j], self._min_levels[k - 1][j + half])
+            self._max_levels[k][j] = max(self._max_levels[k - 1][j], self._max_levels[k - 1][j + half])
+            k += 1
+        # Длина публикуется последней, когда все уровни уже заполнены
+        self._n = p + 1
+
+    def set(self, day: date, value: Optional[float]) -> None:
+        """Записать точку дня (None/NaN - удалить точку)"""
+        i = day.toordinal() - self.origin
+        if i < 0:
+            return
+        value = np.nan if value is None else float(value)
+        with self._lock:
+            if i >= self._n:
+                if self._dirty:
+                    self._rebuild()
+                while self._n < i:
+                    self._append(np.nan)
+                self._append(value)
+                return
+            current = self._values[i]
+            if current == value or (math.isnan(current) and math.isnan(value)):
+                return
+            self._values[i] = value
+            self._dirty = True
+
+    def _bounds(self, start: date, end: date) -> Tuple[int, int]:
+        return max(start.toordinal() - self.origin, 0), min(end.toordinal() - self.origin, self._n)
+
+    def _ensure_fresh(self) -> None:
+        """Перестроить устаревший индекс; вызывается под _lock"""
+        if self._dirty:
+            self._rebuild()
+
+    def window(self, start: date, end: date) -> Optional[WindowStats]:
+        """Агрегаты точек за [start, end); None - если точек нет"""
+        # Под блокировкой: set() из потока загрузчика дописывает и перевыделяет массивы
+        with self._lock:
+            self._ensure_fresh()
+            a, b = self._bounds(start, end)
+            if a >= b:
+                return None
+            count = int(self._cum_count[b] - self._cum_count[a])
+            if not count:
+                return None
+            k = (b - a).bit_length() - 1
+            return WindowStats(
+                count=count,
+                sum=float(self._cum_sum[b] - self._cum_sum[a]),
+                sum_sq=float(self._cum_sq[b] - self._cum_sq[a]),
+                min=float(min(self._min_levels[k][a], self._min_levels[k][b - (1 << k)])),
+                max=float(max(self._max_levels[k][a], self._max_levels[k][b - (1 << k)])),
+            )
+
+    def last(self, start: date, end: date) -> Optional[Tuple[date, float]]:
+        """Последняя точка за [start, end)"""
+        with self._lock:
+            self._ensure_fresh()
+            a, b = self._bounds(start, end)
+            if a >= b:
+                return None
+            j = int(self._last[b - 1])
+            if j < a:
+                return None
+            return date.fromordinal(self.origin + j), float(self._values[j])
+
+    def value_on(self, day: date) -> Optional[float]:
+        """Значение точки дня"""
+        i = day.toordinal() - self.origin
+        with self._lock:
+            if i < 0 or i >= self._n or math.isnan(self._values[i]):
+                return None
+            return float(self._values[i])
+
+
+class TrendIndex:
+    """Ряд метрики по всем регионам: агрегаты окна объединяют точки регионов"""
+
+    def __init__(self, origin: date, points: Iterable[Tuple[str, date, float]] = ()):
+        self.origin = origin
+        by_region: Dict[str, List[Tuple[date, float]]] = {}
+        for region, day, value in points:
+            by_region.setdefault(region or "", []).append((day, value))
+        self._regions = {region: SeriesIndex(origin, series) for region, series in by_region.items()}
+
+    def set(self, day: date, value: Optional[float], region: str = "") -> None:
+        region = region or ""
+        if region not in self._regions:
+            self._regions[region] = SeriesIndex(self.origin)
+        self._regions[region].set(day, value)
+
+    def window(self, start: date, end: date) -> Optional[WindowStats]:
+        stats = None
+        for index in list(self._regions.values()):
+            current = index.window(start, end)
+            if current is not None:
+                stats = current.merge(stats)
+        return stats
+
+
+class PriceIndex:
+    """История цен товара: снимки, цены, наличие и промо как дневные ряды"""
+
+    def __init__(self, origin: date, snapshots: Iterable[Tuple[date, Optional[float], bool, bool]] = ()):
+        snapshots = list(snapshots)
+        self.snapshots = SeriesIndex(origin, ((d, 1.0) for d, _, _, _ in snapshots))
+        # Как в get_price_features: пустые и нулевые цены не учитываются
+        self.prices = SeriesIndex(origin, ((d, p) for d, p, _, _ in snapshots if p))
+        self.in_stock = SeriesIndex(origin, ((d, float(bool(s))) for d, _, s, _ in snapshots))
+        self.promo = SeriesIndex(origin, ((d, float(bool(m))) for d, _, _, m in snapshots))
+
+    def set(self, day: date, price: Optional[float], in_stock: bool, promo: bool) -> None:
+        self.snapshots.set(day, 1.0)
+        self.prices.set(day, price if price else None)
+        self.in_stock.set(day, float(bool(in_stock)))
+        self.promo.set(day, float(bool(promo)))
+
+
+# Живые индексы по ключу ряда: ("metric", имя) или ("price", product_id)
+_live: Dict[Hashable, "weakref.WeakSet"] = {}
+_live_lock = Lock()
+
+
+def track(key: Hashable, index) -> None:
+    """Подписать индекс на новые точки ряда (индекс не удерживается от сборки мусора)"""
+    with _live_lock:
+        _live.setdefault(key, weakref.WeakSet()).add(index)
+
+
+def notify(key: Hashable, day: date, *values) -> None:
+    """Сообщить живым индексам ряда о сохраненной точке"""
+    indexes = _live.get(key)
+    if not indexes:
+        return
+    with _live_lock:
+        indexes = list(indexes)
+    for index in indexes:
+        index.set(day, *values)
@@ -0,0 +1,312 @@
+"""
+Фоновые задачи: очередь в таблице jobs + пул потоков APScheduler
+
+Задача - функция task(ctx, **params), зарегистрированная через @register_task
+(см. tasks.py). Прогресс задача сообщает через ctx.report(done, total, message);
+там же проверяется запрос на отмену - в этом случае бросается JobCancelled.
+Состояние хранится в БД, поэтому статус можно опрашивать из любого процесса
+(Streamlit, Flask), а перезагрузка страницы задачу не прерывает.
+"""
+import inspect
+import json
+import os
+import socket
+import time
+from datetime import datetime
+from threading import Lock
+from typing import TYPE_CHECKING, Callable, Dict, List, Optional
+
+from loguru import logger
+
+from ..config import JOB_WORKERS
+from ..db import SessionLocal
+from ..models import Job
+
+if TYPE_CHECKING:
+    from apscheduler.schedulers.background import BackgroundScheduler
+
+ACTIVE_STATUSES = ("queued", "running")
+FINISHED_STATUSES = ("succeeded", "failed", "cancelled")
+
+# Как часто задача пишет прогресс в БД и проверяет отмену, секунды
+REPORT_INTERVAL = 1.0
+
+_tasks: Dict[str, Callable] = {}
+_scheduler: Optional["BackgroundScheduler"] = None
+_scheduler_lock = Lock()
+
+
+class JobCancelled(Exception):
+    """Задача отменена пользователем"""
+
+
+def register_task(kind: str):
+    """Декоратор: зарегистрировать функцию task(ctx, **params) под именем kind"""
+    def decorator(func: Callable) -> Callable:
+        _tasks[kind] = func
+        return func
+    return decorator
+
+
+def _load_tasks() -> None:
+    from . import tasks  # noqa: F401 - регистрирует задачи
+
+
+def _worker_id() -> str:
+    # pid берем при вызове: после fork (gunicorn --preload) он другой
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def _job_to_dict(job: Job) -> Dict:
+    return {
+        "id": job.id,
+        "kind": job.kind,
+        "status": job.status,
+        "params": json.loads(job.params) if job.params else {},
+        "progress": job.progress,
+        "message": job.message,
+        "result": json.loads(job.result) if job.result else None,
+        "error": job.error,
+        "cancel_requested": job.cancel_requested,
+        "created_at": job.created_at.isoformat() if job.created_at else None,
+        "started_at": job.started_at.isoformat() if job.started_at else None,
+        "finished_at": job.finished_at.isoformat() if job.finished_at else None,
+    }
+
+
+class JobContext:
+    """Канал задачи к ее строке в jobs: прогресс, сообщения, отмена"""
+    
+    def __init__(self, job_id: int):
+        self.job_id = job_id
+        self._last_report = 0.0
+    
+    def report(self, done: float, total: Optional[float] = None, message: Optional[str] = None,
+               force: bool = False) -> None:
+        """
+        Сообщить прогресс: done из total (или долю 0..1, если total не задан)
+        
+        Пишет в БД не чаще REPORT_INTERVAL (если не force).
+        Бросает JobCancelled, если пользователь запросил отмену.
+        """
+        now = time.monotonic()
+        if not force and now - self._last_report < REPORT_INTERVAL:
+            return
+        self._last_report = now
+        
+        progress = done / total if total else done
+        session = SessionLocal()
+        try:
+            job = session.get(Job, self.job_id)
+            job.progress = min(max(float(progress), 0.0), 1.0)
+            if message:
+                job.message = message[:512]
+            cancel_requested = job.cancel_requested
+            session.commit()
+        finally:
+            session.close()
+        
+        if cancel_requested:
+            raise JobCancelled(f"Задача {self.job_id} отменена")
+    
+    def progress_callback(self, message: Optional[str] = None, start: float = 0.0, end: float = 1.0):
+        """
+        Callback (done, total) для функций пайплайна
+        
+        start, end - доля общего прогресса задачи, которую занимает этот этап
+        """
+        def callback(done: int, total: int) -> None:
+            fraction = done / total if total else 1.0
+            self.report(start + (end - start) * fraction, message=message, force=done == total)
+        return callback
+
+
+def _update_job(job_id: int, **values) -> None:
+    session = SessionLocal()
+    try:
+        session.query(Job).filter(Job.id == job_id).update(values, synchronize_session=False)
+        session.commit()
+    finally:
+        session.close()
+
+
+def _run_job(job_id: int) -> None:
+    """Выполнить задачу в потоке пула"""
+    session = SessionLocal()
+    try:
+        # queued -> running одним UPDATE: отмененная до старта задача не запустится
+        started = session.query(Job).filter(Job.id == job_id, Job.status == "queued").update(
+            {"status": "running", "started_at": datetime.utcnow(), "worker": _worker_id()},
+            synchronize_session=False
+        )
+        session.commit()
+        if not started:
+            return
+        job = session.get(Job, job_id)
+        kind = job.kind
+        params = json.loads(job.params) if job.params else {}
+    finally:
+        session.close()
+    
+    logger.info(f"Задача {job_id} ({kind}) запущена")
+    try:
+        result = _tasks[kind](JobContext(job_id), **params)
+        _update_job(job_id, status="succeeded", progress=1.0, finished_at=datetime.utcnow(),
+                    result=json.dumps(result, default=str, ensure_ascii=False))
+        logger.info(f"Задача {job_id} ({kind}) выполнена")
+    except JobCancelled:
+        _update_job(job_id, status="cancelled", message="Отменено", finished_at=datetime.utcnow())
+        logger.info(f"Задача {job_id} ({kind}) отменена")
+    except Exception as e:
+        logger.exception(f"Задача {job_id} ({kind}) завершилась с ошибкой: {e}")
+        _update_job(job_id, status="failed", error=f"{type(e).__name__}: {e}", finished_at=datetime.utcnow())
+
+
+def _process_alive(pid: int) -> bool:
+    if os.name != "posix":
+        # os.kill(pid, 0) в Windows завершает процесс - не проверяем
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def recover_orphaned_jobs() -> int:
+    """
+    Пометить как failed задачи, чей процесс-исполнитель на этом хосте завершился
+    
+    Returns:
+        Количество восстановленных задач
+    """
+    host = socket.gethostname()
+    session = SessionLocal()
+    try:
+        orphaned = []
+        for job in session.query(Job).filter(Job.status.in_(ACTIVE_STATUSES)).all():
+            if not job.worker:
+                continue
+            job_host, _, pid = job.worker.rpartition(":")
+            if job_host == host and pid.isdigit() and not _process_alive(int(pid)):
+                job.status = "failed"
+                job.error = f"Процесс {job.worker} завершился до окончания задачи"
+                job.finished_at = datetime.utcnow()
+                orphaned.append(job.id)
+        session.commit()
+    finally:
+        session.close()
+    
+    if orphaned:
+        logger.warning(f"Задачи без исполнителя помечены как failed: {orphaned}")
+    return len(orphaned)
+
+
+def _get_scheduler() -> "BackgroundScheduler":
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            # APScheduler нужен только процессу, который запускает задачи, - не при импорте
+            from apscheduler.executors.pool import ThreadPoolExecutor
+            from apscheduler.schedulers.background import BackgroundScheduler
+            
+            recover_orphaned_jobs()
+            scheduler = BackgroundScheduler(
+                executors={"default": ThreadPoolExecutor(JOB_WORKERS)},
+                job_defaults={"coalesce": False, "max_instances": 1, "misfire_grace_time": None}
+            )
+            scheduler.start()
+            _scheduler = scheduler
+        return _scheduler
+
+
+def submit_job(kind: str, params: Optional[Dict] = None, dedupe: bool = True) -> Dict:
+    """
+    Поставить задачу в очередь
+    
+    Args:
+        kind: имя задачи ("scrape", "trends", "train", "forecast")
+        params: именованные параметры задачи (JSON-сериализуемые)
+        dedupe: если задача того же вида уже в очереди или выполняется - вернуть ее
+    
+    Returns:
+        Задача в виде словаря
+    """
+    _load_tasks()
+    if kind not in _tasks:
+        raise ValueError(f"Неизвестная задача: {kind}")
+    try:
+        inspect.signature(_tasks[kind]).bind(None, **(params or {}))
+    except TypeError as e:
+        raise ValueError(f"Неверные параметры задачи {kind}: {e}")
+    
+    session = SessionLocal()
+    try:
+        if dedupe:
+            active = session.query(Job).filter(
+                Job.kind == kind, Job.status.in_(ACTIVE_STATUSES)
+            ).order_by(Job.id.desc()).first()
+            if active:
+                return _job_to_dict(active)
+        
+        job = Job(kind=kind, status="queued", params=json.dumps(params or {}, default=str, ensure_ascii=False),
+                  worker=_worker_id())
+        session.add(job)
+        session.commit()
+        job_dict = _job_to_dict(job)
+    finally:
+        session.close()
+    
+    _get_scheduler().add_job(_run_job, args=[job_dict["id"]], id=f"job-{job_dict['id']}")
+    logger.info(f"Задача {job_dict['id']} ({kind}) поставлена в очередь")
+    return job_dict
+
+
+def get_job(job_id: int) -> Optional[Dict]:
+    """Задача по id"""
+    session = SessionLocal()
+    try:
+        job = session.get(Job, job_id)
+        return _job_to_dict(job) if job else None
+    finally:
+        session.close()
+
+
+def list_jobs(limit: int = 20, kinds: Optional[List[str]] = None, status: Optional[str] = None) -> List[Dict]:
+    """Последние задачи, новые первыми"""
+    session = SessionLocal()
+    try:
+        query = session.query(Job)
+        if kinds:
+            query = query.filter(Job.kind.in_(kinds))
+        if status:
+            query = query.filter(Job.status == status)
+        return [_job_to_dict(j) for j in query.order_by(Job.id.desc()).limit(limit).all()]
+    finally:
+        session.close()
+
+
+def cancel_job(job_id: int) -> Optional[Dict]:
+    """
+    Отменить задачу
+    
+    Задача из очереди отменяется сразу, выполняющаяся - при следующем ctx.report()
+    """
+    session = SessionLocal()
+    try:
+        job = session.get(Job, job_id)
+        if job is None:
+            return None
+        
+        if job.status == "queued":
+            job.status = "cancelled"
+            job.message = "Отменено до запуска"
+            job.finished_at = datetime.utcnow()
+        elif job.status == "running":
+            job.cancel_requested = True
+        session.commit()
+        return _job_to_dict(job)
+    finally:
+        session.close()
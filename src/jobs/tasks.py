@@ -0,0 +1,119 @@
+"""
+Фоновые задачи интерфейса: парсинг, тренды, обучение модели, прогнозы
+
+Тяжелые модули импортируются внутри задач - регистрация задач ничего не грузит.
+"""
+import os
+from datetime import date, timedelta
+from typing import Dict, Optional
+
+from ..config import MODEL_PATH
+from .runner import JobContext, register_task
+
+
+@register_task("scrape")
+def scrape_task(ctx: JobContext, url: Optional[str] = None, max_pages: int = 1) -> Dict:
+    """Спарсить каталог и сохранять товары постранично"""
+    try:
+        # Безопасная версия парсера (только BeautifulSoup)
+        from ..etl.scrape_site_safe import iter_products_safe as iter_products
+    except Exception:
+        from ..etl.scrape_site import iter_products
+    from ..etl.load_to_db import save_product_batches
+    from ..etl.normalize import normalize_batches
+    
+    ctx.report(0.0, message="Парсинг каталога", force=True)
+    scraped = 0
+    examples = []
+    
+    def reported_pages(pages):
+        # Прогресс и проверка отмены после каждой страницы: отмена не теряет сохраненные страницы
+        for page, batch in enumerate(pages, 1):
+            ctx.report(page, max_pages, message=f"Страница {page}/{max_pages}: товаров {len(batch)}", force=True)
+            yield batch
+    
+    def counted(batches):
+        nonlocal scraped
+        for batch in batches:
+            scraped += len(batch)
+            examples.extend({"name": p.name, "category": p.category} for p in batch[:10 - len(examples)])
+            yield batch
+    
+    pages = iter_products(category_url=url, max_pages=max_pages)
+    saved = save_product_batches(counted(normalize_batches(reported_pages(pages))))
+    
+    return {
+        "scraped": scraped,
+        "saved": saved,
+        "examples": examples,
+    }
+
+
+@register_task("trends")
+def trends_task(ctx: JobContext) -> Dict:
+    """Собрать тренды и сохранить в хранилище метрик"""
+    from ..etl.external.trends import collect_tire_trends
+    from ..etl.load_to_db import save_traffic_metrics
+    
+    ctx.report(0.0, message="Сбор данных трендов", force=True)
+    # Прогресс и проверка отмены - после каждой группы запросов
+    trends = collect_tire_trends(progress_callback=ctx.progress_callback("Сбор данных трендов", end=0.8))
+    
+    ctx.report(0.8, message=f"Сохранение метрик: {len(trends)}", force=True)
+    saved = save_traffic_metrics(trends) if trends else 0
+    
+    return {"collected": len(trends), "saved": saved}
+
+
+@register_task("train")
+def train_task(ctx: JobContext, model_path: str = MODEL_PATH) -> Dict:
+    """Обучить модель и сохранить ее в model_path"""
+    from ..modeling.train import train_demand_model, save_model
+    
+    model, metrics = train_demand_model(
+        progress_callback=ctx.progress_callback("Сбор признаков", end=0.9)
+    )
+    if not model or not metrics:
+        return {"trained": False}
+    
+    ctx.report(0.95, message="Сохранение модели", force=True)
+    os.makedirs(os.path.dirname(model_path) or ".", exist_ok=True)
+    save_model(model, model_path)
+    
+    importances = metrics.get("feature_importance", {})
+    top_features = sorted(importances.items(), key=lambda x: x[1], reverse=True)[:10]
+    return {
+        "trained": True,
+        "model_path": model_path,
+        "test_r2": float(metrics.get("test_r2", 0)),
+        "test_mae": float(metrics.get("test_mae", 0)),
+        "test_rmse": float(metrics.get("test_rmse", 0)),
+        "top_features": [[name, float(value)] for name, value in top_features],
+    }
+
+
+@register_task("forecast")
+def forecast_task(ctx: JobContext, days: int = 30, model_path: str = MODEL_PATH) -> Dict:
+    """Сгенерировать прогнозы на days дней вперед"""
+    from ..modeling.train import load_model
+    from ..modeling.forecast import generate_forecasts
+    
+    model = load_model(model_path)
+    forecast_dates = [date.today() + timedelta(days=i) for i in range(1, days + 1)]
+    forecasts = generate_forecasts(
+        model, None, forecast_dates,
+        progress_callback=ctx.progress_callback("Генерация прогнозов")
+    )
+    return {"forecasts": len(forecasts)}
+
+
+@register_task("pipeline")
+def pipeline_task(ctx: JobContext, force: bool = False) -> Dict:
+    """Прогнать инкрементальный пайплайн (см. etl/orchestrator.py)"""
+    from ..etl.orchestrator import run_pipeline
+    
+    results = run_pipeline(force=force, progress_callback=ctx.progress_callback("Этапы пайплайна"))
+    return {
+        name: {"status": r.status, "summary": r.summary, "error": r.error}
+        for name, r in results.items()
+    }
@@ -0,0 +1,198 @@
+"""
+Материализованные агрегаты прогнозов для аналитики по типам протектора
+"""
+from datetime import date, datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+from sqlalchemy import func, select, insert, delete, literal
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
+from loguru import logger
+
+from ..models import Product, Forecast, ForecastPatternSummary
+from .history import latest_forecasts_subquery
+
+# Оценка строк прогнозов (товары с протектором x дни), выше которой агрегация по прогнозам
+# идет потоком: GROUP BY по такому диапазону держит в БД все группы и дольше отвечает
+STREAM_AGGREGATE_MIN_ROWS = 500_000
+
+
+def _summary_source(dates: Optional[List[date]] = None):
+    """SELECT с агрегатами последних прогнозов по (тип протектора, дата, версия модели)"""
+    if dates:
+        latest = latest_forecasts_subquery(date_from=dates[0], date_to=dates[-1])
+    else:
+        latest = latest_forecasts_subquery()
+    model_version = func.coalesce(Forecast.model_version, "unknown")
+
+    query = select(
+        Product.tread_pattern,
+        Forecast.date,
+        model_version,
+        func.sum(Forecast.yhat),
+        func.count(Forecast.id),
+        func.avg(Forecast.yhat),
+        literal(datetime.utcnow())
+    ).join(
+        Product, Product.id == Forecast.product_id
+    ).join(
+        latest,
+        (Forecast.product_id == latest.c.product_id)
+        & (Forecast.date == latest.c.date)
+        & (Forecast.run_id == latest.c.run_id)
+    ).where(
+        Product.tread_pattern.isnot(None)
+    )
+    if dates is not None:
+        query = query.where(Forecast.date.in_(dates))
+
+    return query.group_by(Product.tread_pattern, Forecast.date, model_version)
+
+
+def refresh_pattern_summary(session: Session, dates: Optional[Iterable[date]] = None) -> int:
+    """
+    Пересчитать агрегаты по типам протектора
+
+    Args:
+        dates: даты, затронутые запуском прогноза (если None - полный пересчет)
+
+    Returns:
+        Количество строк агрегата после обновления
+    """
+    if dates is not None:
+        dates = sorted(set(dates))
+        if not dates:
+            return 0
+
+    cleanup = delete(ForecastPatternSummary)
+    if dates is not None:
+        cleanup = cleanup.where(ForecastPatternSummary.date.in_(dates))
+    session.execute(cleanup.execution_options(synchronize_session=False))
+
+    result = session.execute(
+        insert(ForecastPatternSummary).from_select(
+            [
+                ForecastPatternSummary.tread_pattern,
+                ForecastPatternSummary.date,
+                ForecastPatternSummary.model_version,
+                ForecastPatternSummary.demand_sum,
+                ForecastPatternSummary.forecast_count,
+                ForecastPatternSummary.demand_mean,
+                ForecastPatternSummary.refreshed_at,
+            ],
+            _summary_source(dates)
+        )
+    )
+    rows = result.rowcount or 0
+    logger.info(f"Обновлены агрегаты по типам протектора: {rows} строк")
+    return rows
+
+
+def pattern_demand_query(session: Session, by_date: bool = False):
+    """
+    Спрос по типам протектора из агрегата
+
+    Среднее пересчитывается как sum/count, чтобы корректно объединять
+    несколько дат и версий модели
+
+    Args:
+        by_date: группировать еще и по дате (первая колонка - date)
+    """
+    total = func.sum(ForecastPatternSummary.demand_sum)
+    count = func.sum(ForecastPatternSummary.forecast_count)
+    group_cols = [ForecastPatternSummary.tread_pattern]
+    if by_date:
+        group_cols.insert(0, ForecastPatternSummary.date)
+
+    return session.query(
+        *group_cols,
+        (total / func.nullif(count, 0)).label("avg_demand"),
+        total.label("total_demand"),
+        count.label("forecast_count")
+    ).group_by(*group_cols)
+
+
+def _latest_forecast_rows(session: Session, date_from: date, date_to: date):
+    """Последние прогнозы в диапазоне дат, соединенные с товарами с известным протектором"""
+    latest = latest_forecasts_subquery(date_from=date_from, date_to=date_to)
+    return session.query(
+        Forecast.date,
+        Product.tread_pattern,
+    ).join(
+        Product, Product.id == Forecast.product_id
+    ).join(
+        latest,
+        (Forecast.product_id == latest.c.product_id)
+        & (Forecast.date == latest.c.date)
+        & (Forecast.run_id == latest.c.run_id)
+    ).filter(
+        Product.tread_pattern.isnot(None),
+        Forecast.date >= date_from,
+        Forecast.date <= date_to
+    )
+
+
+def forecast_pattern_demand_query(session: Session, date_from: date, date_to: date):
+    """GROUP BY (дата, тип протектора) прямо по последним прогнозам"""
+    return _latest_forecast_rows(session, date_from, date_to).with_entities(
+        Forecast.date,
+        Product.tread_pattern,
+        func.avg(Forecast.yhat),
+        func.sum(Forecast.yhat),
+        func.count(Forecast.id)
+    ).group_by(Forecast.date, Product.tread_pattern)
+
+
+def pattern_demand_from_forecasts(session: Session, date_from: date, date_to: date) -> List[Tuple]:
+    """
+    Агрегация по (дата, тип протектора) прямо по прогнозам одним GROUP BY
+
+    Используется, когда агрегат еще не обновлен для запрошенных дат
+    """
+    return forecast_pattern_demand_query(session, date_from, date_to).all()
+
+
+def stream_pattern_demand(session: Session, date_from: date, date_to: date,
+                          batch_size: int = 5000) -> List[Tuple]:
+    """
+    Потоковая агрегация по (дата, тип протектора) с постоянной памятью
+
+    Строки читаются серверным курсором пачками по batch_size, в памяти
+    держатся только накопленные суммы по группам
+    """
+    totals: Dict[Tuple[date, str], List[float]] = {}
+    rows = _latest_forecast_rows(session, date_from, date_to).with_entities(
+        Forecast.date,
+        Product.tread_pattern,
+        Forecast.yhat
+    ).yield_per(batch_size)
+
+    for forecast_date, tread_pattern, yhat in rows:
+        acc = totals.setdefault((forecast_date, tread_pattern), [0.0, 0])
+        acc[0] += yhat
+        acc[1] += 1
+
+    return [
+        (forecast_date, tread_pattern, total / count, total, count)
+        for (forecast_date, tread_pattern), (total, count) in totals.items()
+    ]
+
+
+def pattern_demand_fallback(session: Session, date_from: date, date_to: date) -> List[Tuple]:
+    """
+    Агрегация по (дата, тип протектора) прямо по прогнозам для дат без агрегата
+
+    Небольшие диапазоны - одним GROUP BY в БД, большие (по оценке числа строк) - потоком;
+    если GROUP BY не удался, тоже потоком
+    """
+    products = session.query(func.count(Product.id)).filter(Product.tread_pattern.isnot(None)).scalar() or 0
+    estimated_rows = products * ((date_to - date_from).days + 1)
+    if estimated_rows > STREAM_AGGREGATE_MIN_ROWS:
+        logger.info(f"Потоковая агрегация прогнозов: около {estimated_rows} строк за {date_from}..{date_to}")
+        return stream_pattern_demand(session, date_from, date_to)
+
+    try:
+        return pattern_demand_from_forecasts(session, date_from, date_to)
+    except SQLAlchemyError as e:
+        logger.warning(f"Агрегация в БД не удалась ({e}), переключаюсь на потоковую агрегацию")
+        session.rollback()
+        return stream_pattern_demand(session, date_from, date_to)
@@ -2,18 +2,25 @@
 Прогнозирование спроса на товары
 """
 from datetime import date, timedelta
-from typing import List, Dict
+from typing import Callable, List, Dict, Optional
 import pandas as pd
 from loguru import logger
 
 from ..db import SessionLocal
-from ..models import Product, Forecast
-from .train import load_model, analyze_tread_pattern_demand
-from ..features.make_features import create_feature_vector
+from ..models import Product, Forecast, ForecastPatternSummary
+from .train import load_model, analyze_tread_pattern_demand, feature_frame
+from .history import create_forecast_run, compact_forecast_history
+from .aggregates import (
+    refresh_pattern_summary, pattern_demand_query, pattern_demand_fallback
+)
+from ..features.make_features import create_feature_vector, load_weather_features, FeatureCache
+from ..utils.logging_setup import timed
 
 
+@timed()
 def generate_forecasts(model, products: List[Product] = None, forecast_dates: List[date] = None, 
-                      model_version: str = "rf_v1") -> List[Forecast]:
+                      model_version: str = "rf_v1",
+                      progress_callback: Optional[Callable[[int, int], None]] = None) -> List[Forecast]:
     """
     Сгенерировать прогнозы спроса для товаров
     
@@ -22,6 +29,8 @@ def generate_forecasts(model, products: List[Product] = None, forecast_dates: Li
         products: список товаров (если None, берет все из БД)
         forecast_dates: список дат для прогноза (если None, следующие 30 дней)
         model_version: версия модели
+        progress_callback: вызывается как (обработано товаров, всего товаров);
+                           исключение из него откатывает запуск целиком
     
     Returns:
         Список объектов Forecast
@@ -35,15 +44,20 @@ def generate_forecasts(model, products: List[Product] = None, forecast_dates: Li
         if forecast_dates is None:
             forecast_dates = [date.today() + timedelta(days=i) for i in range(1, 31)]
         
+        weather = load_weather_features(forecast_dates)
+        cache = FeatureCache(min(forecast_dates), max(forecast_dates)) if forecast_dates else None
+        if cache:
+            cache.preload(products)
+        
+        # Каждый запуск пишет новые строки - история прогнозов сохраняется
+        run = create_forecast_run(session, model_version)
         forecasts = []
         
-        for product in products:
+        for i, product in enumerate(products, 1):
             for forecast_date in forecast_dates:
                 try:
-                    features = create_feature_vector(product, forecast_date)
-                    feature_cols = [k for k in features.keys() if k not in ["product_id", "date"]]
-                    
-                    X = pd.DataFrame([features])[feature_cols].fillna(0)
+                    features = create_feature_vector(product, forecast_date, weather, cache)
+                    X = feature_frame(model, features)
                     
                     # Предсказание
                     prediction = model.predict(X)[0]
@@ -52,34 +66,34 @@ def generate_forecasts(model, products: List[Product] = None, forecast_dates: Li
                     yhat_lower = prediction * 0.8
                     yhat_upper = prediction * 1.2
                     
-                    # Проверяем, нет ли уже прогноза
-                    existing = session.query(Forecast).filter(
-                        Forecast.product_id == product.id,
-                        Forecast.date == forecast_date
-                    ).first()
-                    
-                    if existing:
-                        existing.yhat = prediction
-                        existing.yhat_lower = yhat_lower
-                        existing.yhat_upper = yhat_upper
-                        existing.model_version = model_version
-                    else:
-                        forecast = Forecast(
-                            product_id=product.id,
-                            date=forecast_date,
-                            yhat=prediction,
-                            yhat_lower=yhat_lower,
-                            yhat_upper=yhat_upper,
-                            model_version=model_version
-                        )
-                        session.add(forecast)
-                        forecasts.append(forecast)
+                    forecast = Forecast(
+                        product_id=product.id,
+                        date=forecast_date,
+                        run_id=run.id,
+                        issue_date=run.issue_date,
+                        yhat=prediction,
+                        yhat_lower=yhat_lower,
+                        yhat_upper=yhat_upper,
+                        model_version=model_version
+                    )
+                    session.add(forecast)
+                    forecasts.append(forecast)
                 
                 except Exception as e:
                     logger.warning(f"Ошибка прогноза для товара {product.id} на {forecast_date}: {e}")
+            
+            if progress_callback:
+                progress_callback(i, len(products))
         
+        run.forecasts_count = len(forecasts)
+        session.flush()
+        
+        # Запуск, его прогнозы и агрегат фиксируются одной транзакцией: id запуска - версия
+        # ответов API (ETag), и новый id не должен быть виден раньше обновленного агрегата
+        compact_forecast_history(session)
+        refresh_pattern_summary(session, forecast_dates)
         session.commit()
-        logger.info(f"Создано прогнозов: {len(forecasts)}")
+        logger.info(f"Создано прогнозов: {len(forecasts)} (запуск {run.id})")
         return forecasts
     
     except Exception as e:
@@ -90,53 +104,63 @@ def generate_forecasts(model, products: List[Product] = None, forecast_dates: Li
         session.close()
 
 
-def get_tread_pattern_recommendations(forecast_date: date = None) -> pd.DataFrame:
+@timed()
+def get_tread_pattern_recommendations(forecast_date: date = None, end_date: date = None) -> pd.DataFrame:
     """
     Получить рекомендации по типам протектора на основе прогнозов
     
+    Args:
+        forecast_date: целевая дата (или начало диапазона)
+        end_date: конец диапазона дат включительно (если None - только forecast_date)
+    
     Returns:
-        DataFrame с рекомендациями по протекторам
+        DataFrame с рекомендациями по протекторам; для одной даты индекс - tread_pattern,
+        для диапазона - (date, tread_pattern)
     """
     session = SessionLocal()
     
     try:
         if forecast_date is None:
             forecast_date = date.today() + timedelta(days=30)
+        single_date = end_date is None
+        if single_date:
+            end_date = forecast_date
         
-        # Получаем прогнозы на целевую дату
-        forecasts = session.query(Forecast).filter(
-            Forecast.date == forecast_date
-        ).join(Product).filter(
-            Product.tread_pattern.isnot(None)
+        # Все даты диапазона - одним GROUP BY по материализованному агрегату
+        rows = pattern_demand_query(session, by_date=True).filter(
+            ForecastPatternSummary.date >= forecast_date,
+            ForecastPatternSummary.date <= end_date
         ).all()
         
-        if not forecasts:
+        # Даты, для которых агрегат еще не обновлен (весь диапазон или его часть), -
+        # считаем по прогнозам
+        covered = {r[0] for r in rows}
+        days = [forecast_date + timedelta(days=i) for i in range((end_date - forecast_date).days + 1)]
+        missing = [d for d in days if d not in covered]
+        if missing:
+            missing_dates = set(missing)
+            rows = list(rows) + [
+                r for r in pattern_demand_fallback(session, missing[0], missing[-1]) if r[0] in missing_dates
+            ]
+        
+        if not rows:
             logger.warning("Нет прогнозов для анализа")
             return pd.DataFrame()
         
-        results = []
-        for forecast in forecasts:
-            results.append({
-                "tread_pattern": forecast.product.tread_pattern,
-                "predicted_demand": forecast.yhat,
-                "product_name": forecast.product.name,
-                "product_id": forecast.product_id
-            })
-        
-        df = pd.DataFrame(results)
+        recommendations = pd.DataFrame(
+            [tuple(r) for r in rows],
+            columns=["date", "tread_pattern", "avg_demand", "total_demand", "products_count"]
+        ).sort_values(["date", "avg_demand"], ascending=[True, False])
         
-        # Группируем по типу протектора
-        recommendations = df.groupby("tread_pattern").agg({
-            "predicted_demand": ["mean", "sum", "count"]
-        }).sort_values(("predicted_demand", "mean"), ascending=False)
+        if single_date:
+            recommendations = recommendations.drop(columns="date").set_index("tread_pattern")
+        else:
+            recommendations = recommendations.set_index(["date", "tread_pattern"])
         
-        recommendations.columns = ["avg_demand", "total_demand", "products_count"]
-        
-        logger.info(f"\nРекомендации по типам протектора на {forecast_date}:")
+        logger.info(f"\nРекомендации по типам протектора на {forecast_date}..{end_date}:")
         logger.info(recommendations)
         
         return recommendations
     
     finally:
         session.close()
-
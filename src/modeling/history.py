@@ -0,0 +1,122 @@
+"""
+История прогнозов: запуски, партиции по месяцу выпуска и политика хранения
+"""
+from datetime import date, timedelta
+from typing import Optional
+from sqlalchemy import func, text, delete, select, exists
+from sqlalchemy.orm import Session, aliased
+from loguru import logger
+
+from ..config import FORECAST_RETENTION_DAYS
+from ..models import Forecast, ForecastRun
+
+
+def _month_bounds(day: date):
+    """Границы месяца [начало, начало следующего)"""
+    start = day.replace(day=1)
+    end = (start + timedelta(days=32)).replace(day=1)
+    return start, end
+
+
+def ensure_forecast_partition(session: Session, issue_date: date) -> None:
+    """Создать партицию forecasts для месяца issue_date (только Postgres)"""
+    if session.get_bind().dialect.name != "postgresql":
+        return
+
+    start, end = _month_bounds(issue_date)
+    partition = f"forecasts_p{start:%Y_%m}"
+    session.execute(text(
+        f"CREATE TABLE IF NOT EXISTS {partition} PARTITION OF forecasts "
+        f"FOR VALUES FROM ('{start.isoformat()}') TO ('{end.isoformat()}')"
+    ))
+
+
+def create_forecast_run(session: Session, model_version: str, issue_date: Optional[date] = None) -> ForecastRun:
+    """Зарегистрировать новый запуск прогнозирования"""
+    if issue_date is None:
+        issue_date = date.today()
+
+    ensure_forecast_partition(session, issue_date)
+    run = ForecastRun(issue_date=issue_date, model_version=model_version)
+    session.add(run)
+    session.flush()
+    return run
+
+
+def latest_forecasts_subquery(issued_before: Optional[date] = None,
+                              date_from: Optional[date] = None, date_to: Optional[date] = None):
+    """
+    Подзапрос (product_id, date, run_id) с последним запуском для каждой пары товар/дата
+
+    Args:
+        issued_before: учитывать только запуски, выпущенные строго до этой даты
+                       (для бэктестинга - "что мы прогнозировали на тот момент")
+        date_from, date_to: ограничить даты прогноза (включительно), чтобы подзапрос
+                            читал только диапазон индекса (date, product_id, run_id)
+
+    Читается целиком из индексов ix_forecasts_product_date_run / ix_forecasts_date_product_run
+    """
+    query = select(
+        Forecast.product_id,
+        Forecast.date,
+        func.max(Forecast.run_id).label("run_id")
+    )
+    if issued_before is not None:
+        query = query.where(Forecast.issue_date < issued_before)
+    if date_from is not None:
+        query = query.where(Forecast.date >= date_from)
+    if date_to is not None:
+        query = query.where(Forecast.date <= date_to)
+
+    return query.group_by(Forecast.product_id, Forecast.date).subquery("latest_forecasts")
+
+
+def latest_forecasts_query(session: Session, issued_before: Optional[date] = None,
+                           date_from: Optional[date] = None, date_to: Optional[date] = None):
+    """Запрос последних прогнозов для каждой пары товар/дата"""
+    latest = latest_forecasts_subquery(issued_before, date_from, date_to)
+    return session.query(Forecast).join(
+        latest,
+        (Forecast.product_id == latest.c.product_id)
+        & (Forecast.date == latest.c.date)
+        & (Forecast.run_id == latest.c.run_id)
+    )
+
+
+def compact_forecast_history(session: Session, retention_days: int = FORECAST_RETENTION_DAYS) -> int:
+    """
+    Уплотнить старые запуски прогнозов
+
+    Для запусков старше retention_days оставляем по каждой паре товар/дата только
+    последний прогноз - его достаточно для бэктестинга. Опустевшие запуски удаляются.
+
+    Returns:
+        Количество удаленных прогнозов
+    """
+    cutoff = date.today() - timedelta(days=retention_days)
+    newer = aliased(Forecast)
+
+    superseded = exists().where(
+        newer.product_id == Forecast.product_id,
+        newer.date == Forecast.date,
+        newer.run_id > Forecast.run_id,
+        newer.issue_date < cutoff
+    )
+    result = session.execute(
+        delete(Forecast)
+        .where(Forecast.issue_date < cutoff, superseded)
+        .execution_options(synchronize_session=False)
+    )
+    removed = result.rowcount or 0
+
+    empty_runs = session.execute(
+        delete(ForecastRun)
+        .where(
+            ForecastRun.issue_date < cutoff,
+            ~exists().where(Forecast.run_id == ForecastRun.id)
+        )
+        .execution_options(synchronize_session=False)
+    ).rowcount or 0
+
+    logger.info(f"Уплотнение истории прогнозов до {cutoff}: удалено прогнозов {removed}, запусков {empty_runs}")
+    return removed
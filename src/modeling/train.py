@@ -3,36 +3,36 @@
 """
 import pickle
 from datetime import date, timedelta
-from typing import List, Tuple, Optional
+from typing import TYPE_CHECKING, Callable, Dict, List, Tuple, Optional
 import pandas as pd
 import numpy as np
-from sklearn.ensemble import RandomForestRegressor, GradientBoostingRegressor
-from sklearn.model_selection import train_test_split
-from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score
 from loguru import logger
 
 from ..features.make_features import create_training_dataset
 from ..db import SessionLocal
-from ..models import Product, TrafficMetric
+from ..models import Product
+from ..etl.metrics_store import metric_records_query
+from ..utils.logging_setup import timed
+
+if TYPE_CHECKING:
+    from sklearn.ensemble import RandomForestRegressor
 
 
 def prepare_target_variable(df: pd.DataFrame, target_days_ahead: int = 7) -> pd.DataFrame:
     """
     Подготовить целевую переменную (спрос на N дней вперед)
-    Используем данные из TrafficMetric как прокси спроса
+    Используем ряды трендов из хранилища метрик как прокси спроса
     """
     session = SessionLocal()
     
     try:
         # Получаем данные о трендах как целевую переменную
-        metrics = session.query(TrafficMetric).filter(
-            TrafficMetric.metric_name.like("trend_keyword:%")
-        ).all()
+        metrics = metric_records_query(session, "trend_keyword:").all()
         
         # Создаем словарь: (date, product_id) -> value
         demand_dict = {}
         for metric in metrics:
-            key = (metric.date, metric.metric_name)
+            key = (metric.date, metric.name)
             demand_dict[key] = metric.value
         
         # Для каждого товара ищем соответствующий тренд
@@ -68,20 +68,34 @@ def prepare_target_variable(df: pd.DataFrame, target_days_ahead: int = 7) -> pd.
         session.close()
 
 
-def train_demand_model(products: Optional[List[Product]] = None, start_date: Optional[date] = None, end_date: Optional[date] = None) -> Tuple[Optional[RandomForestRegressor], dict]:
+def default_training_window() -> Tuple[date, date]:
+    """Период обучения по умолчанию: год истории без последних 30 дней"""
+    return date.today() - timedelta(days=365), date.today() - timedelta(days=30)
+
+
+@timed()
+def train_demand_model(products: Optional[List[Product]] = None, start_date: Optional[date] = None, end_date: Optional[date] = None,
+                       progress_callback: Optional[Callable[[int, int], None]] = None,
+                       dataset: Optional[pd.DataFrame] = None) -> Tuple[Optional["RandomForestRegressor"], dict]:
     """
     Обучить модель прогнозирования спроса
     
+    Args:
+        progress_callback: прогресс сборки датасета (см. create_training_dataset)
+        dataset: готовый датасет признаков (если None - собирается за [start_date, end_date])
+    
     Returns:
         (model, metrics_dict)
     """
-    if start_date is None:
-        start_date = date.today() - timedelta(days=365)
-    if end_date is None:
-        end_date = date.today() - timedelta(days=30)
-    
-    logger.info(f"Создание датасета с {start_date} по {end_date}")
-    df = create_training_dataset(start_date, end_date)
+    if dataset is not None:
+        df = dataset.copy()
+    else:
+        default_start, default_end = default_training_window()
+        start_date = start_date or default_start
+        end_date = end_date or default_end
+        
+        logger.info(f"Создание датасета с {start_date} по {end_date}")
+        df = create_training_dataset(start_date, end_date, progress_callback)
     
     # Подготовка целевой переменной
     df = prepare_target_variable(df)
@@ -98,6 +112,11 @@ def train_demand_model(products: Optional[List[Product]] = None, start_date: Opt
     X = df[feature_cols].fillna(0)
     y = df["demand"]
     
+    # sklearn грузится только для обучения: прогноз и рекомендации работают с уже обученной моделью
+    from sklearn.ensemble import RandomForestRegressor
+    from sklearn.model_selection import train_test_split
+    from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score
+    
     # Разделение на train/test
     X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
     
@@ -132,6 +151,20 @@ def train_demand_model(products: Optional[List[Product]] = None, start_date: Opt
     return model, metrics
 
 
+def feature_frame(model, features: Dict) -> pd.DataFrame:
+    """
+    Строка признаков для model.predict в порядке признаков обучения
+
+    Признаки, которых модель не знает, отбрасываются, недостающие (модель обучена на
+    другом наборе) заполняются 0 - иначе sklearn отказывается предсказывать
+    """
+    X = pd.DataFrame([features]).drop(columns=["product_id", "date"], errors="ignore")
+    columns = getattr(model, "feature_names_in_", None)
+    if columns is not None:
+        X = X.reindex(columns=columns, fill_value=0)
+    return X.fillna(0)
+
+
 def analyze_tread_pattern_demand(model, products: List[Product], forecast_date: date) -> pd.DataFrame:
     """
     Анализ спроса по типам протектора на целевую дату
@@ -139,19 +172,21 @@ def analyze_tread_pattern_demand(model, products: List[Product], forecast_date:
     Returns:
         DataFrame с прогнозами по каждому типу протектора
     """
-    from ..features.make_features import create_feature_vector
+    from ..features.make_features import create_feature_vector, load_weather_features, FeatureCache
     
     results = []
+    weather = load_weather_features([forecast_date])
+    cache = FeatureCache(forecast_date, forecast_date)
+    cache.preload(p for p in products if p.tread_pattern)
     
     for product in products:
         if not product.tread_pattern:
             continue
         
-        features = create_feature_vector(product, forecast_date)
-        feature_cols = [k for k in features.keys() if k not in ["product_id", "date"]]
+        features = create_feature_vector(product, forecast_date, weather, cache)
         
         # Преобразуем в DataFrame для модели
-        X = pd.DataFrame([features])[feature_cols].fillna(0)
+        X = feature_frame(model, features)
         
         # Предсказание
         prediction = model.predict(X)[0]
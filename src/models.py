@@ -1,4 +1,7 @@
-from sqlalchemy import Column, Integer, String, Date, Float, Boolean, ForeignKey, UniqueConstraint
+from datetime import date, datetime
+
+from sqlalchemy import Column, Integer, String, Text, Date, DateTime, Float, Boolean, ForeignKey, UniqueConstraint, Index, JSON
+from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.orm import relationship
 from .db import Base
 
@@ -10,8 +13,22 @@ class Product(Base):
     name = Column(String(255), nullable=False)
     category = Column(String(128))
     url = Column(String(512))  # ссылка на карточку товара
-    tread_pattern = Column(String(64), index=True)  # тип протектора (для шин)
-    specifications = Column(String(2048))  # JSON строка с характеристиками
+    tread_pattern = Column(String(64))  # тип протектора (для шин)
+    # Характеристики словарем (JSONB на PostgreSQL), разбираются драйвером при загрузке
+    specifications = Column(JSON().with_variant(JSONB(), "postgresql"))
+    # Размер шины, разобранный при загрузке (420/70-457: 420 / 70 / 457; 12R18: 12 / - / 18)
+    size_width = Column(Float)
+    size_ratio = Column(Float)
+    size_diameter = Column(Float)
+    
+    __table_args__ = (
+        # Постраничный вывод каталога: ORDER BY name, id с фильтром по категории / протектору
+        Index("ix_products_name_id", "name", "id"),
+        Index("ix_products_category_name_id", "category", "name", "id"),
+        Index("ix_products_tread_pattern_name_id", "tread_pattern", "name", "id"),
+        # Подбор по размеру: посадочный диаметр, затем ширина и профиль
+        Index("ix_products_size", "size_diameter", "size_width", "size_ratio"),
+    )
 
 class PriceSnapshot(Base):
     __tablename__ = "price_snapshots"  # ДВОЙНОЕ подчеркивание!
@@ -25,26 +42,116 @@ class PriceSnapshot(Base):
     
     product = relationship("Product")
     
-    __table_args__ = (UniqueConstraint('product_id', 'date', name='uq_ps_prod_date'),)  # ДВОЙНОЕ подчеркивание!
+    __table_args__ = (
+        UniqueConstraint('product_id', 'date', name='uq_ps_prod_date'),  # ДВОЙНОЕ подчеркивание!
+        # Покрывающий индекс для признаков цен: окно по дате без обращения к таблице
+        Index("ix_price_snapshots_product_date_cov", "product_id", "date",
+              postgresql_include=["price", "in_stock", "promo"]),
+    )
 
-class TrafficMetric(Base):
-    __tablename__ = "traffic_metrics"  # ДВОЙНОЕ подчеркивание!
+class Metric(Base):
+    __tablename__ = "metrics"
     
+    # Справочник временных рядов: строковое имя хранится один раз,
+    # точки ряда ссылаются на него целочисленным id
     id = Column(Integer, primary_key=True)
-    date = Column(Date, index=True, nullable=False)
-    region = Column(String(64))
-    metric_name = Column(String(64), index=True)   # "holiday", "trend_keyword:шины"
+    name = Column(String(128), nullable=False)   # "holiday", "trend_keyword:шины"
+    region = Column(String(64), nullable=False, default="")
+    
+    __table_args__ = (UniqueConstraint("name", "region", name="uq_metrics_name_region"),)
+
+class MetricValue(Base):
+    __tablename__ = "metric_values"
+    
+    # Компактная таблица фактов: первичный ключ (metric_id, date) - он же индекс для окон по дате
+    metric_id = Column(Integer, ForeignKey("metrics.id"), primary_key=True)
+    date = Column(Date, primary_key=True)
     value = Column(Float, nullable=False)
+    
+    metric = relationship("Metric")
+
+class ForecastRun(Base):
+    __tablename__ = "forecast_runs"
+    
+    id = Column(Integer, primary_key=True)
+    issue_date = Column(Date, nullable=False, default=date.today, index=True)  # дата выпуска прогноза
+    model_version = Column(String(32))
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    forecasts_count = Column(Integer, default=0)
 
 class Forecast(Base):
     __tablename__ = "forecasts"  # ДВОЙНОЕ подчеркивание!
     
+    # В Postgres таблица партиционирована по месяцу issue_date,
+    # первичный ключ в БД - (id, issue_date), см. миграцию 7c2d9e41b5a3
     id = Column(Integer, primary_key=True)
-    date = Column(Date, index=True, nullable=False)
+    date = Column(Date, nullable=False)
     product_id = Column(Integer, ForeignKey("products.id"), nullable=False)
+    run_id = Column(Integer, ForeignKey("forecast_runs.id"), nullable=False)
+    issue_date = Column(Date, nullable=False, default=date.today)
     yhat = Column(Float, nullable=False)
     yhat_lower = Column(Float)
     yhat_upper = Column(Float)
     model_version = Column(String(32), default="es_v1")
     
-    product = relationship("Product")
\ No newline at end of file
+    product = relationship("Product")
+    run = relationship("ForecastRun")
+    
+    __table_args__ = (
+        Index("ix_forecasts_product_date_run", "product_id", "date", "run_id"),
+        # Окна по дате без фильтра по товару (список прогнозов, агрегаты)
+        Index("ix_forecasts_date_product_run", "date", "product_id", "run_id"),
+    )
+
+class ForecastPatternSummary(Base):
+    __tablename__ = "forecast_pattern_summary"
+    
+    # Материализованный агрегат последних прогнозов: тип протектора x дата x версия модели.
+    # Обновляется в конце каждого запуска прогнозирования (см. modeling/aggregates.py)
+    tread_pattern = Column(String(64), primary_key=True)
+    date = Column(Date, primary_key=True)
+    model_version = Column(String(32), primary_key=True)
+    demand_sum = Column(Float, nullable=False)
+    forecast_count = Column(Integer, nullable=False)
+    demand_mean = Column(Float, nullable=False)
+    refreshed_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    
+    __table_args__ = (Index("ix_forecast_pattern_summary_date", "date"),)
+
+class Job(Base):
+    __tablename__ = "jobs"
+    
+    # Фоновая задача (парсинг, тренды, обучение, прогнозы), см. src/jobs/runner.py
+    id = Column(Integer, primary_key=True)
+    kind = Column(String(32), nullable=False)
+    status = Column(String(16), nullable=False, default="queued")  # queued/running/succeeded/failed/cancelled
+    params = Column(Text)  # JSON строка с параметрами
+    progress = Column(Float, nullable=False, default=0.0)  # 0..1
+    message = Column(String(512))
+    result = Column(Text)  # JSON строка с результатом
+    error = Column(Text)
+    cancel_requested = Column(Boolean, nullable=False, default=False)
+    worker = Column(String(128))  # host:pid процесса, выполняющего задачу
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    started_at = Column(DateTime)
+    finished_at = Column(DateTime)
+    
+    __table_args__ = (Index("ix_jobs_status_created", "status", "created_at"),)
+
+class PipelineStageRun(Base):
+    __tablename__ = "pipeline_stage_runs"
+    
+    # Запуск этапа пайплайна (см. src/etl/orchestrator.py). fingerprint - хэш водяных
+    # знаков входов: этап пропускается, если он совпадает с последним успешным запуском
+    id = Column(Integer, primary_key=True)
+    pipeline_run = Column(String(32), nullable=False, index=True)  # общий ключ этапов одного прогона
+    stage = Column(String(32), nullable=False)
+    status = Column(String(16), nullable=False)  # ok/skipped/failed/blocked
+    fingerprint = Column(String(64))
+    watermark = Column(Text)  # JSON строка: состояние входов этапа
+    output = Column(Text)  # JSON строка: сводка результата этапа
+    error = Column(Text)
+    started_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    finished_at = Column(DateTime)
+    
+    __table_args__ = (Index("ix_pipeline_stage_runs_stage_status", "stage", "status", "id"),)
@@ -0,0 +1,6 @@
+"""
+API endpoints для исходных данных (товары, тренды, цены)
+"""
+from flask import Blueprint
+
+bp = Blueprint("data", __name__)
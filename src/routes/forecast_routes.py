@@ -1,106 +1,141 @@
 """
 API endpoints для прогнозов и аналитики
 """
-from flask import Blueprint, jsonify, request
+from flask import Blueprint, request
 from datetime import date, timedelta
+from typing import Optional
 from sqlalchemy import func
 
 from ..db import SessionLocal
-from ..models import Product, Forecast, TrafficMetric
-from ..modeling.forecast import get_tread_pattern_recommendations
+from ..models import Product, Forecast, ForecastPatternSummary, ForecastRun, MetricValue
+from ..etl.metrics_store import metric_series_query
+from ..modeling.history import latest_forecasts_query
+from ..modeling.aggregates import pattern_demand_query
+from ..utils.http_cache import versioned_etag, content_etag
+from ..utils.serialization import json_response, rows_response
 
 bp = Blueprint("forecast", __name__)
 
+FORECAST_FIELDS = ("id", "product_id", "product_name", "date", "yhat", "yhat_lower", "yhat_upper",
+                   "model_version", "run_id", "issue_date")
+# Колонки в порядке FORECAST_FIELDS: строки выбираются кортежами, без ORM-объектов
+FORECAST_COLUMNS = (Forecast.id, Forecast.product_id, Product.name, Forecast.date, Forecast.yhat,
+                    Forecast.yhat_lower, Forecast.yhat_upper, Forecast.model_version, Forecast.run_id,
+                    Forecast.issue_date)
+TREND_FIELDS = ("date", "value")
+PATTERN_DEMAND_FIELDS = ("tread_pattern", "avg_demand", "total_demand", "forecast_count")
+
+
+def _date_arg(name: str, default: Optional[date] = None) -> Optional[date]:
+    """Дата из параметра запроса (YYYY-MM-DD); ValueError - неверный формат"""
+    value = request.args.get(name)
+    return date.fromisoformat(value) if value else default
+
+
+def _bad_date(name: str):
+    return json_response({"error": f"Invalid {name}, expected YYYY-MM-DD"}, 400)
+
+
+def _forecast_run_version():
+    """Версия прогнозов - id последнего запуска: новые прогнозы и агрегаты появляются только с ним"""
+    session = SessionLocal()
+    try:
+        return session.query(func.max(ForecastRun.id)).scalar()
+    finally:
+        session.close()
+
 
 @bp.get("/forecasts")
+@versioned_etag(_forecast_run_version)
 def list_forecasts():
     """Список прогнозов"""
     product_id = request.args.get("product_id", type=int)
     days_ahead = request.args.get("days", type=int, default=30)
+    # ?as_of=YYYY-MM-DD - прогнозы, выпущенные до этой даты (бэктестинг)
+    try:
+        as_of = _date_arg("as_of")
+    except ValueError:
+        return _bad_date("as_of")
     
     session = SessionLocal()
     try:
-        query = session.query(Forecast)
-        
-        if product_id:
-            query = query.filter(Forecast.product_id == product_id)
-        
         # Прогнозы на следующие N дней
+        start_date = date.today() + timedelta(days=1)
         end_date = date.today() + timedelta(days=days_ahead)
-        query = query.filter(
-            Forecast.date > date.today(),
+        query = latest_forecasts_query(session, as_of, start_date, end_date).filter(
+            Forecast.date >= start_date,
             Forecast.date <= end_date
         )
         
-        forecasts = query.order_by(Forecast.date).all()
+        if product_id:
+            query = query.filter(Forecast.product_id == product_id)
+        
+        # Название товара - тем же запросом (JOIN), а не ленивой загрузкой на каждую строку
+        rows = query.join(Product, Product.id == Forecast.product_id).with_entities(
+            *FORECAST_COLUMNS
+        ).order_by(Forecast.date).all()
         
-        return jsonify([{
-            "id": f.id,
-            "product_id": f.product_id,
-            "product_name": f.product.name,
-            "date": f.date.isoformat(),
-            "yhat": f.yhat,
-            "yhat_lower": f.yhat_lower,
-            "yhat_upper": f.yhat_upper,
-            "model_version": f.model_version
-        } for f in forecasts])
+        return rows_response(FORECAST_FIELDS, rows)
     finally:
         session.close()
 
 
 @bp.get("/recommendations/tread-pattern")
+@versioned_etag(_forecast_run_version)
 def get_tread_recommendations():
-    """Рекомендации по типам протектора"""
-    forecast_date = request.args.get("date")
-    if forecast_date:
-        forecast_date = date.fromisoformat(forecast_date)
-    else:
-        forecast_date = date.today() + timedelta(days=30)
+    """Рекомендации по типам протектора (на дату или на диапазон ?date=...&end_date=...)"""
+    try:
+        forecast_date = _date_arg("date", date.today() + timedelta(days=30))
+    except ValueError:
+        return _bad_date("date")
+    try:
+        end_date = _date_arg("end_date")
+    except ValueError:
+        return _bad_date("end_date")
+    if end_date and end_date < forecast_date:
+        return json_response({"error": "end_date must not be earlier than date"}, 400)
+    
+    # modeling.forecast тянет pandas/sklearn - грузится при первом запросе рекомендаций, а не при старте API
+    from ..modeling.forecast import get_tread_pattern_recommendations
     
     try:
-        recommendations = get_tread_pattern_recommendations(forecast_date)
+        recommendations = get_tread_pattern_recommendations(forecast_date, end_date)
         if recommendations is not None and not recommendations.empty:
-            return jsonify({
-                "date": forecast_date.isoformat(),
+            # Даты и числа numpy кодирует сериализатор
+            response = {
+                "date": forecast_date,
                 "recommendations": recommendations.reset_index().to_dict(orient="records")
-            })
+            }
+            if end_date:
+                response["end_date"] = end_date
+            return json_response(response)
         else:
-            return jsonify({"error": "No recommendations available"}), 404
+            return json_response({"error": "No recommendations available"}, 404)
     except Exception as e:
-        return jsonify({"error": str(e)}), 500
+        return json_response({"error": str(e)}, 500)
 
 
 @bp.get("/analytics/demand-by-pattern")
+@versioned_etag(_forecast_run_version)
 def demand_by_pattern():
     """Аналитика спроса по типам протектора"""
     session = SessionLocal()
     try:
-        # Агрегируем прогнозы по типам протектора
-        results = session.query(
-            Product.tread_pattern,
-            func.avg(Forecast.yhat).label("avg_demand"),
-            func.sum(Forecast.yhat).label("total_demand"),
-            func.count(Forecast.id).label("forecast_count")
-        ).join(
-            Forecast, Product.id == Forecast.product_id
-        ).filter(
-            Product.tread_pattern.isnot(None),
-            Forecast.date >= date.today()
-        ).group_by(
-            Product.tread_pattern
+        # Агрегаты по типам протектора читаем из материализованной таблицы
+        results = pattern_demand_query(session).filter(
+            ForecastPatternSummary.date >= date.today()
         ).all()
         
-        return jsonify([{
-            "tread_pattern": r[0],
-            "avg_demand": float(r[1]) if r[1] else 0.0,
-            "total_demand": float(r[2]) if r[2] else 0.0,
-            "forecast_count": r[3]
-        } for r in results])
+        return rows_response(PATTERN_DEMAND_FIELDS, [
+            (r[0], float(r[1]) if r[1] else 0.0, float(r[2]) if r[2] else 0.0, r[3])
+            for r in results
+        ])
     finally:
         session.close()
 
 
 @bp.get("/analytics/trends/<keyword>")
+@content_etag
 def get_trend_data(keyword):
     """Данные тренда по ключевому слову"""
     days_back = request.args.get("days", type=int, default=90)
@@ -111,16 +146,11 @@ def get_trend_data(keyword):
         end_date = date.today()
         start_date = end_date - timedelta(days=days_back)
         
-        trends = session.query(TrafficMetric).filter(
-            TrafficMetric.metric_name == metric_name,
-            TrafficMetric.date >= start_date,
-            TrafficMetric.date <= end_date
-        ).order_by(TrafficMetric.date).all()
+        trends = metric_series_query(
+            session, metric_name, start_date, end_date, include_end=True
+        ).order_by(MetricValue.date).all()
         
-        return jsonify([{
-            "date": t.date.isoformat(),
-            "value": t.value
-        } for t in trends])
+        return rows_response(TREND_FIELDS, trends)
     finally:
         session.close()
 
@@ -0,0 +1,53 @@
+"""
+API endpoints для фоновых задач (парсинг, тренды, обучение, прогнозы)
+"""
+from flask import Blueprint, jsonify, request
+
+from ..jobs.runner import submit_job, get_job, list_jobs, cancel_job
+
+bp = Blueprint("jobs", __name__)
+
+
+@bp.post("/jobs")
+def create_job():
+    """Поставить задачу в очередь: {"kind": "forecast", "params": {"days": 30}}"""
+    payload = request.get_json(silent=True) or {}
+    kind = payload.get("kind")
+    if not kind:
+        return jsonify({"error": "kind is required"}), 400
+    
+    try:
+        job = submit_job(kind, payload.get("params") or {})
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify(job), 202
+
+
+@bp.get("/jobs")
+def jobs_list():
+    """Последние задачи (?kind=...&status=...&limit=...)"""
+    kind = request.args.get("kind")
+    jobs = list_jobs(
+        limit=request.args.get("limit", type=int, default=20),
+        kinds=[kind] if kind else None,
+        status=request.args.get("status")
+    )
+    return jsonify(jobs)
+
+
+@bp.get("/jobs/<int:job_id>")
+def job_status(job_id):
+    """Статус и прогресс задачи"""
+    job = get_job(job_id)
+    if job is None:
+        return jsonify({"error": "Job not found"}), 404
+    return jsonify(job)
+
+
+@bp.post("/jobs/<int:job_id>/cancel")
+def job_cancel(job_id):
+    """Отменить задачу"""
+    job = cancel_job(job_id)
+    if job is None:
+        return jsonify({"error": "Job not found"}), 404
+    return jsonify(job)
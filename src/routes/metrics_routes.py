@@ -0,0 +1,14 @@
+"""
+Метрики API в текстовом формате Prometheus
+"""
+from flask import Blueprint, Response
+
+from ..utils.metrics import REGISTRY
+
+bp = Blueprint("metrics", __name__)
+
+
+@bp.get("/metrics")
+def metrics():
+    """Счетчики запросов, гистограммы времени, пул БД, кэши, возраст прогноза"""
+    return Response(REGISTRY.exposition(), mimetype="text/plain; version=0.0.4; charset=utf-8")
@@ -0,0 +1,6 @@
+"""
+API endpoints для модели прогнозирования
+"""
+from flask import Blueprint
+
+bp = Blueprint("model", __name__)
@@ -1,11 +1,18 @@
-from flask import Blueprint, jsonify
+from flask import Blueprint
 from src.db import SessionLocal
 from src.models import Product
+from src.utils.serialization import rows_response
 
 bp = Blueprint("product", __name__)
 
+PRODUCT_FIELDS = ("id", "sku", "name", "category")
+
 @bp.get("/products")
 def list_products():
     s = SessionLocal()
-    items = s.query(Product).order_by(Product.name).all()
-    return jsonify([{"id": p.id, "sku": p.sku, "name": p.name, "category": p.category} for p in items])
\ No newline at end of file
+    try:
+        # Только нужные колонки кортежами - без сборки ORM-объектов
+        items = s.query(Product.id, Product.sku, Product.name, Product.category).order_by(Product.name).all()
+        return rows_response(PRODUCT_FIELDS, items)
+    finally:
+        s.close()
@@ -27,7 +27,7 @@ def test_imports():
         return False
     
     try:
-        from src.models import Product, TrafficMetric, Forecast
+        from src.models import Product, Metric, MetricValue, Forecast
         logger.info(f"✓ Models импортированы")
     except Exception as e:
         logger.error(f"✗ Ошибка импорта models: {e}")
@@ -1,6 +1,7 @@
 """
 Полный цикл анализа: сбор данных -> обучение -> прогнозы
 """
+import time
 from datetime import date, timedelta
 from loguru import logger
 from src.etl.pipeline import run_data_collection_pipeline
@@ -8,9 +9,23 @@ from src.modeling.train import train_demand_model, save_model
 from src.modeling.forecast import generate_forecasts, get_tread_pattern_recommendations
 from src.db import SessionLocal
 from src.models import Product
+from src.utils.logging_setup import setup_logging, reset_stats, timed, log_run_summary
+from src.utils.query_profiler import profiled
 
 def full_analysis_pipeline():
     """Запустить полный цикл анализа"""
+    setup_logging()
+    reset_stats()
+    started = time.perf_counter()
+    try:
+        # SQL_PROFILE=1: отчет по SQL-запросам прогона и подозрения на N+1
+        with profiled("run_analysis"):
+            _run_stages()
+    finally:
+        # Сводка по этапам и счетчикам (БД, HTTP, записанные строки) - и при ошибке
+        log_run_summary("полный цикл анализа", started)
+
+def _run_stages():
     logger.info("=" * 60)
     logger.info("ПОЛНЫЙ ЦИКЛ АНАЛИЗА СПРОСА")
     logger.info("=" * 60)
@@ -18,7 +33,9 @@ def full_analysis_pipeline():
     # Шаг 1: Сбор данных
     logger.info("\n[1/4] СБОР ДАННЫХ")
     logger.info("-" * 60)
-    if run_data_collection_pipeline():
+    with timed("analysis.collect"):
+        collected = run_data_collection_pipeline()
+    if collected:
         logger.info("✓ Данные собраны успешно")
     else:
         logger.error("✗ Ошибка при сборе данных")
@@ -27,7 +44,8 @@ def full_analysis_pipeline():
     # Шаг 2: Обучение модели
     logger.info("\n[2/4] ОБУЧЕНИЕ МОДЕЛИ")
     logger.info("-" * 60)
-    model, metrics = train_demand_model()
+    with timed("analysis.train"):
+        model, metrics = train_demand_model()
     if model:
         logger.info(f"✓ Модель обучена. Test R2: {metrics.get('test_r2', 0):.3f}")
         save_model(model, "models/demand_model.pkl")
@@ -41,9 +59,10 @@ def full_analysis_pipeline():
     logger.info("-" * 60)
     session = SessionLocal()
     try:
-        products = session.query(Product).all()
-        forecast_dates = [date.today() + timedelta(days=i) for i in range(1, 31)]
-        forecasts = generate_forecasts(model, products, forecast_dates)
+        with timed("analysis.forecast"):
+            products = session.query(Product).all()
+            forecast_dates = [date.today() + timedelta(days=i) for i in range(1, 31)]
+            forecasts = generate_forecasts(model, products, forecast_dates)
         logger.info(f"✓ Создано прогнозов: {len(forecasts)}")
     finally:
         session.close()
@@ -51,7 +70,8 @@ def full_analysis_pipeline():
     # Шаг 4: Анализ и рекомендации
     logger.info("\n[4/4] АНАЛИЗ И РЕКОМЕНДАЦИИ")
     logger.info("-" * 60)
-    recommendations = get_tread_pattern_recommendations()
+    with timed("analysis.recommend"):
+        recommendations = get_tread_pattern_recommendations()
     if recommendations is not None and not recommendations.empty:
         logger.info("\n" + "=" * 60)
         logger.info("РЕКОМЕНДАЦИИ ПО ТИПАМ ПРОТЕКТОРА:")
@@ -66,4 +86,3 @@ def full_analysis_pipeline():
 
 if __name__ == "__main__":
     full_analysis_pipeline()
-
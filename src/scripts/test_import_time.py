@@ -0,0 +1,107 @@
+"""
+Бюджет времени импорта: API и CLI-точки входа должны стартовать без тяжелых зависимостей
+
+Каждый модуль импортируется в отдельном чистом интерпретаторе (python -X importtime):
+замеряется время импорта и проверяется, что в sys.modules не попали библиотеки,
+которые нужны только обучению, прогнозу или парсингу (pandas, sklearn, pytrends...).
+Их модули грузятся лениво - внутри функций, которые их используют.
+
+Запуск:
+    python -m src.scripts.test_import_time
+    IMPORT_BUDGET_S=0.3 python -m src.scripts.test_import_time
+
+Код выхода 1 - превышен бюджет или загружен запрещенный модуль.
+"""
+import json
+import os
+import subprocess
+import sys
+from typing import Dict, List, Tuple
+from loguru import logger
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+IMPORT_BUDGET_S = float(os.getenv("IMPORT_BUDGET_S", "0.5"))
+
+ML_MODULES = ("pandas", "sklearn", "statsmodels")
+SCRAPING_MODULES = ("pytrends", "selectolax", "bs4")
+
+# Точка входа -> модули, которых при ее импорте быть не должно
+ENTRY_POINTS: Dict[str, Tuple[str, ...]] = {
+    "src.app": ML_MODULES + SCRAPING_MODULES + ("numpy", "apscheduler"),
+    "src.jobs.runner": ML_MODULES + SCRAPING_MODULES + ("numpy", "apscheduler"),
+    "src.jobs.tasks": ML_MODULES + SCRAPING_MODULES + ("numpy",),
+    "src.etl.orchestrator": ML_MODULES + SCRAPING_MODULES + ("apscheduler",),
+    "src.etl.load_to_db": ML_MODULES + SCRAPING_MODULES,
+}
+
+# Код дочернего процесса: время импорта и список загруженных модулей верхнего уровня
+_CHILD = """
+import importlib, json, sys, time
+started = time.perf_counter()
+importlib.import_module({module!r})
+elapsed = time.perf_counter() - started
+print(json.dumps({{"elapsed_s": elapsed, "modules": sorted({{m.split(".")[0] for m in sys.modules}})}}))
+"""
+
+
+def slowest_imports(importtime_log: str, top: int = 5) -> List[Tuple[str, float]]:
+    """Самые долгие пакеты верхнего уровня по выводу -X importtime (cumulative, секунды)"""
+    rows = []
+    for line in importtime_log.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        # Вложенные импорты выводятся с отступом - берем только верхний уровень
+        if name.startswith("  ") or not cumulative.strip().isdigit():
+            continue
+        rows.append((name.strip(), int(cumulative) / 1e6))
+    return sorted(rows, key=lambda row: -row[1])[:top]
+
+
+def measure_import(module: str) -> Dict:
+    """Импортировать модуль в чистом интерпретаторе"""
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", _CHILD.format(module=module)],
+        cwd=PROJECT_ROOT, capture_output=True, text=True
+    )
+    if completed.returncode != 0:
+        error = completed.stderr.strip().splitlines()[-1] if completed.stderr.strip() else "неизвестная ошибка"
+        return {"error": error}
+    result = json.loads(completed.stdout.strip().splitlines()[-1])
+    result["slowest"] = slowest_imports(completed.stderr)
+    return result
+
+
+def main():
+    """Основная функция"""
+    logger.info("=" * 60)
+    logger.info(f"ПРОВЕРКА ВРЕМЕНИ ИМПОРТА (бюджет {IMPORT_BUDGET_S:.2f} с)")
+    logger.info("=" * 60)
+
+    failed = []
+    for module, forbidden in ENTRY_POINTS.items():
+        result = measure_import(module)
+        if "error" in result:
+            logger.error(f"{module}: импорт не удался: {result['error']}")
+            failed.append(module)
+            continue
+
+        loaded = [name for name in forbidden if name in result["modules"]]
+        over_budget = result["elapsed_s"] > IMPORT_BUDGET_S
+        status = "ПРЕВЫШЕН БЮДЖЕТ" if over_budget else "ok"
+        logger.info(f"{module}: {result['elapsed_s']:.3f} с - {status}")
+        for name, seconds in result["slowest"]:
+            logger.info(f"    {seconds:.3f} с  {name}")
+        if loaded:
+            logger.error(f"{module}: загружены тяжелые модули: {', '.join(loaded)}")
+        if over_budget or loaded:
+            failed.append(module)
+
+    if failed:
+        logger.error(f"Не прошли проверку: {', '.join(failed)}")
+        sys.exit(1)
+    logger.info("Все точки входа укладываются в бюджет")
+
+
+if __name__ == "__main__":
+    main()
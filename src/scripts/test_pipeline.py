@@ -6,7 +6,8 @@ from src.etl.scrape_site import scrape_products
 from src.etl.external.trends import collect_tire_trends
 from src.etl.load_to_db import save_products, save_traffic_metrics
 from src.db import SessionLocal
-from src.models import Product, TrafficMetric, Forecast
+from src.models import Product, Forecast
+from src.etl.metrics_store import count_metric_values
 from src.modeling.train import train_demand_model
 from src.modeling.forecast import get_tread_pattern_recommendations
 
@@ -64,7 +65,7 @@ def test_db_stats():
     session = SessionLocal()
     try:
         products_count = session.query(Product).count()
-        trends_count = session.query(TrafficMetric).count()
+        trends_count = count_metric_values(session)
         forecasts_count = session.query(Forecast).count()
         
         logger.info(f"✓ Товаров в БД: {products_count}")
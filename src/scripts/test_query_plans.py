@@ -0,0 +1,171 @@
+"""
+Регрессионная проверка планов запросов: EXPLAIN горячих запросов на локальной БД
+
+Скрипт засевает БД небольшим синтетическим набором данных внутри транзакции,
+снимает планы запросов из make_features.py и forecast_routes.py и откатывает
+транзакцию. Если в плане встречается последовательное сканирование таблицы -
+выходит с кодом 1.
+
+Запуск (нужен DATABASE_URL на локальную БД с примененными миграциями):
+    python -m src.scripts.test_query_plans
+"""
+import sys
+from datetime import date, timedelta
+from typing import Dict, List
+from loguru import logger
+from sqlalchemy import text
+
+from src.db import Base, SessionLocal
+from src.models import Product, PriceSnapshot, MetricValue, Forecast, ForecastPatternSummary
+from src.etl.metrics_store import save_metric_values
+from src.features.make_features import trend_series_query, price_history_query
+from src.modeling.history import create_forecast_run, latest_forecasts_query
+from src.modeling.aggregates import pattern_demand_query, forecast_pattern_demand_query
+
+SEED_PRODUCTS = 50
+SEED_DAYS = 120
+TREAD_PATTERNS = ["зимние", "летние", "всесезонные"]
+
+
+def seed_sample_data(session) -> Dict:
+    """Засеять синтетические товары, цены, тренды и прогнозы (без коммита)"""
+    today = date.today()
+
+    products = [
+        Product(
+            sku=f"plan-check-{i}",
+            name=f"К-{100 + i} 420/70-457",
+            category="Грузовые шины",
+            tread_pattern=TREAD_PATTERNS[i % len(TREAD_PATTERNS)]
+        )
+        for i in range(SEED_PRODUCTS)
+    ]
+    session.add_all(products)
+    session.flush()
+
+    metric_names = [f"trend_keyword:{p} шины" for p in TREAD_PATTERNS]
+    save_metric_values(session, [
+        {"date": today - timedelta(days=d), "region": "RU", "metric_name": name, "value": float(d % 100)}
+        for name in metric_names
+        for d in range(SEED_DAYS)
+    ])
+    session.add_all([
+        PriceSnapshot(product_id=p.id, date=today - timedelta(days=d), price=1000.0 + d, in_stock=True, promo=False)
+        for p in products
+        for d in range(SEED_DAYS)
+    ])
+
+    run = create_forecast_run(session, "plan_check")
+    session.add_all([
+        Forecast(product_id=p.id, date=today + timedelta(days=d), run_id=run.id, issue_date=run.issue_date,
+                 yhat=10.0, yhat_lower=8.0, yhat_upper=12.0, model_version="plan_check")
+        for p in products
+        for d in range(1, 31)
+    ])
+    session.flush()
+
+    return {"product_id": products[0].id, "metric_name": metric_names[0], "today": today}
+
+
+def hot_queries(session, seed: Dict) -> Dict:
+    """Запросы, планы которых проверяем (строятся теми же функциями, что и в коде)"""
+    today = seed["today"]
+    return {
+        "features: тренд по ключевому слову": trend_series_query(
+            session, seed["metric_name"], today - timedelta(days=30), today
+        ),
+        "features: история цен товара": price_history_query(
+            session, seed["product_id"], today - timedelta(days=90), today
+        ),
+        "routes: прогнозы товара": latest_forecasts_query(
+            session, date_from=today + timedelta(days=1), date_to=today + timedelta(days=30)
+        ).filter(Forecast.product_id == seed["product_id"]),
+        "routes: прогнозы на N дней": latest_forecasts_query(
+            session, date_from=today + timedelta(days=1), date_to=today + timedelta(days=30)
+        ).filter(Forecast.date >= today + timedelta(days=1), Forecast.date <= today + timedelta(days=30)),
+        "routes: тренд для API": trend_series_query(
+            session, seed["metric_name"], today - timedelta(days=90), today + timedelta(days=1)
+        ).order_by(MetricValue.date),
+        "routes: спрос по типам протектора": pattern_demand_query(session).filter(
+            ForecastPatternSummary.date >= today
+        ),
+        "forecast: агрегация по прогнозам": forecast_pattern_demand_query(
+            session, today + timedelta(days=1), today + timedelta(days=30)
+        ),
+    }
+
+
+def explain(session, query) -> List[str]:
+    """Снять план запроса в текстовом виде"""
+    conn = session.connection()
+    compiled = query.statement.compile(dialect=conn.dialect, compile_kwargs={"render_postcompile": True})
+    if compiled.positional:
+        params = tuple(compiled.params[name] for name in compiled.positiontup)
+    else:
+        params = compiled.params
+
+    if conn.dialect.name == "sqlite":
+        rows = conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {compiled}", params).all()
+        return [row[-1] for row in rows]
+
+    rows = conn.exec_driver_sql(f"EXPLAIN {compiled}", params).all()
+    return [row[0] for row in rows]
+
+
+def has_sequential_scan(plan: List[str], dialect: str) -> bool:
+    """Есть ли в плане полное сканирование таблицы"""
+    if dialect == "sqlite":
+        # "SCAN t" - полный проход по таблице, "SCAN t USING INDEX" - по индексу;
+        # проходы по подзапросам ("SCAN latest_forecasts") не считаем
+        return any(
+            line.startswith("SCAN ") and " USING " not in line and line.split()[1] in Base.metadata.tables
+            for line in plan
+        )
+    return any("Seq Scan" in line for line in plan)
+
+
+def main():
+    """Основная функция"""
+    logger.info("=" * 60)
+    logger.info("ПРОВЕРКА ПЛАНОВ ЗАПРОСОВ")
+    logger.info("=" * 60)
+
+    if SessionLocal is None:
+        logger.error("✗ DATABASE_URL не настроен")
+        sys.exit(1)
+
+    session = SessionLocal()
+    failures = []
+    try:
+        dialect = session.get_bind().dialect.name
+        if dialect == "postgresql":
+            # На маленьких таблицах планировщик честно выбирает Seq Scan; запрещаем его,
+            # чтобы Seq Scan в плане означал "подходящего индекса нет"
+            session.execute(text("SET LOCAL enable_seqscan = off"))
+
+        seed = seed_sample_data(session)
+
+        for name, query in hot_queries(session, seed).items():
+            plan = explain(session, query)
+            if has_sequential_scan(plan, dialect):
+                failures.append(name)
+                logger.error(f"✗ {name}: последовательное сканирование")
+                for line in plan:
+                    logger.error(f"    {line}")
+            else:
+                logger.info(f"✓ {name}")
+    finally:
+        # Засеянные данные не сохраняем (созданные в транзакции метрики в кэш не попадают)
+        session.rollback()
+        session.close()
+
+    logger.info("=" * 60)
+    if failures:
+        logger.error(f"✗ Запросов с последовательным сканированием: {len(failures)}")
+        sys.exit(1)
+    logger.info("✓ ВСЕ ПЛАНЫ ИСПОЛЬЗУЮТ ИНДЕКСЫ")
+    logger.info("=" * 60)
+
+
+if __name__ == "__main__":
+    main()
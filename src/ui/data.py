@@ -0,0 +1,215 @@
+"""
+Слой доступа к данным для Streamlit интерфейса
+
+Streamlit перезапускает скрипт целиком при каждом действии пользователя,
+поэтому запросы к БД здесь обернуты в st.cache_data с TTL. После операций,
+меняющих данные (парсинг, тренды, обучение, прогнозы, очистка), нужно
+вызвать invalidate() с соответствующими группами.
+"""
+import os
+from contextlib import contextmanager
+from datetime import date, timedelta
+from typing import Dict, List, Optional, Tuple
+import pandas as pd
+import streamlit as st
+from sqlalchemy import func, tuple_
+
+from ..config import MODEL_PATH
+from ..db import SessionLocal
+from ..models import Product, Forecast, MetricValue
+from ..etl.metrics_store import count_metric_values, list_metric_names, metric_series_query
+from ..modeling.history import latest_forecasts_query
+
+# TTL кэшей, секунды: справочники меняются редко, счетчики - чаще
+STATS_TTL = 60
+CATALOG_TTL = 300
+SERIES_TTL = 300
+
+PAGE_SIZE = 100
+
+
+@contextmanager
+def session_scope():
+    """Короткоживущая сессия на один запрос к БД"""
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+
+
+def db_available() -> bool:
+    """Настроена ли БД"""
+    return SessionLocal is not None
+
+
+@st.cache_data(ttl=STATS_TTL, show_spinner=False)
+def get_db_stats() -> Dict:
+    """Статистика БД"""
+    if not db_available():
+        return {"products": 0, "trends": 0, "forecasts": 0}
+    try:
+        with session_scope() as session:
+            return {
+                "products": session.query(func.count(Product.id)).scalar(),
+                "trends": count_metric_values(session),
+                "forecasts": session.query(func.count(Forecast.id)).scalar()
+            }
+    except Exception:
+        return {"products": 0, "trends": 0, "forecasts": 0}
+
+
+@st.cache_data(ttl=CATALOG_TTL, show_spinner=False)
+def get_category_counts() -> pd.DataFrame:
+    """Распределение товаров по категориям"""
+    with session_scope() as session:
+        rows = session.query(
+            Product.category,
+            func.count(Product.id)
+        ).group_by(Product.category).all()
+    return pd.DataFrame([(c or "Без категории", n) for c, n in rows], columns=["Категория", "Количество"])
+
+
+@st.cache_data(ttl=CATALOG_TTL, show_spinner=False)
+def get_tread_pattern_counts() -> pd.DataFrame:
+    """Распределение товаров по типам протектора"""
+    with session_scope() as session:
+        rows = session.query(
+            Product.tread_pattern,
+            func.count(Product.id)
+        ).filter(Product.tread_pattern.isnot(None)).group_by(Product.tread_pattern).all()
+    return pd.DataFrame([tuple(r) for r in rows], columns=["Тип протектора", "Количество"])
+
+
+@st.cache_data(ttl=CATALOG_TTL, show_spinner=False)
+def get_product_filter_options() -> Dict[str, List[str]]:
+    """Значения фильтров страницы товаров: категории и типы протектора (DISTINCT в БД)"""
+    with session_scope() as session:
+        categories = session.query(Product.category).filter(
+            Product.category.isnot(None)
+        ).distinct().order_by(Product.category).all()
+        tread_patterns = session.query(Product.tread_pattern).filter(
+            Product.tread_pattern.isnot(None)
+        ).distinct().order_by(Product.tread_pattern).all()
+    return {
+        "categories": [r[0] for r in categories],
+        "tread_patterns": [r[0] for r in tread_patterns],
+    }
+
+
+def _filtered_products(session, category: Optional[str], tread_pattern: Optional[str]):
+    query = session.query(Product)
+    if category:
+        query = query.filter(Product.category == category)
+    if tread_pattern:
+        query = query.filter(Product.tread_pattern == tread_pattern)
+    return query
+
+
+@st.cache_data(ttl=CATALOG_TTL, show_spinner=False)
+def count_products(category: Optional[str] = None, tread_pattern: Optional[str] = None) -> int:
+    """Количество товаров под фильтром"""
+    with session_scope() as session:
+        return _filtered_products(session, category, tread_pattern).with_entities(func.count(Product.id)).scalar()
+
+
+@st.cache_data(ttl=CATALOG_TTL, show_spinner=False)
+def get_products_page(category: Optional[str] = None, tread_pattern: Optional[str] = None,
+                      after: Optional[Tuple[str, int]] = None, page_size: int = PAGE_SIZE) -> pd.DataFrame:
+    """
+    Страница товаров под фильтром (WHERE + LIMIT в БД)
+
+    Пагинация по ключу (name, id): after - (name, id) последней строки предыдущей
+    страницы; глубокие страницы не требуют OFFSET-сканирования
+    """
+    with session_scope() as session:
+        query = _filtered_products(session, category, tread_pattern)
+        if after is not None:
+            query = query.filter(tuple_(Product.name, Product.id) > tuple_(*after))
+        rows = query.with_entities(
+            Product.id, Product.name, Product.sku, Product.category, Product.tread_pattern, Product.url
+        ).order_by(Product.name, Product.id).limit(page_size).all()
+    return pd.DataFrame(
+        [tuple(r) for r in rows],
+        columns=["id", "name", "sku", "category", "tread_pattern", "url"]
+    )
+
+
+@st.cache_data(ttl=SERIES_TTL, show_spinner=False)
+def get_trend_keywords() -> List[str]:
+    """Ключевые слова, по которым есть тренды"""
+    with session_scope() as session:
+        return list_metric_names(session, "trend_keyword:")
+
+
+@st.cache_data(ttl=SERIES_TTL, show_spinner=False)
+def get_trend_series(metric_name: str, days_back: int) -> pd.DataFrame:
+    """Ряд тренда за последние days_back дней"""
+    end_date = date.today()
+    start_date = end_date - timedelta(days=days_back)
+    with session_scope() as session:
+        rows = metric_series_query(
+            session, metric_name, start_date, end_date, include_end=True
+        ).order_by(MetricValue.date).all()
+    return pd.DataFrame([tuple(r) for r in rows], columns=["Дата", "Значение"])
+
+
+@st.cache_data(ttl=SERIES_TTL, show_spinner=False)
+def get_products_with_forecasts() -> List[Tuple[int, str, Optional[str]]]:
+    """Товары, для которых есть прогнозы: (id, name, tread_pattern)"""
+    with session_scope() as session:
+        rows = session.query(Product.id, Product.name, Product.tread_pattern).filter(
+            session.query(Forecast.id).filter(Forecast.product_id == Product.id).exists()
+        ).order_by(Product.name).all()
+    return [tuple(r) for r in rows]
+
+
+@st.cache_data(ttl=SERIES_TTL, show_spinner=False)
+def get_product_forecasts(product_id: int, limit: int = 30) -> pd.DataFrame:
+    """Последние прогнозы товара"""
+    with session_scope() as session:
+        forecasts = latest_forecasts_query(session).filter(
+            Forecast.product_id == product_id
+        ).order_by(Forecast.date).limit(limit).all()
+        rows = [(f.date, f.yhat, f.yhat_lower, f.yhat_upper) for f in forecasts]
+    return pd.DataFrame(rows, columns=["Дата", "Прогноз", "Нижняя граница", "Верхняя граница"])
+
+
+@st.cache_data(ttl=SERIES_TTL, show_spinner=False)
+def get_recommendations(start_date: date, end_date: date) -> pd.DataFrame:
+    """Рекомендации по типам протектора за диапазон дат"""
+    from ..modeling.forecast import get_tread_pattern_recommendations
+    return get_tread_pattern_recommendations(start_date, end_date)
+
+
+@st.cache_resource(show_spinner=False)
+def _load_model(path: str, mtime: float):
+    from ..modeling.train import load_model
+    return load_model(path)
+
+
+def get_model(path: str = MODEL_PATH):
+    """Загруженная модель; кэш перечитывает файл при его изменении"""
+    if not os.path.exists(path):
+        return None
+    try:
+        return _load_model(path, os.path.getmtime(path))
+    except Exception:
+        return None
+
+
+# Какие кэши сбрасывать после изменения данных
+CACHE_GROUPS = {
+    "products": [get_db_stats, get_category_counts, get_tread_pattern_counts, get_product_filter_options,
+                 count_products, get_products_page, get_products_with_forecasts],
+    "trends": [get_db_stats, get_trend_keywords, get_trend_series],
+    "forecasts": [get_db_stats, get_products_with_forecasts, get_product_forecasts, get_recommendations],
+    "model": [_load_model],
+}
+
+
+def invalidate(*groups: str) -> None:
+    """Сбросить кэши групп ("products", "trends", "forecasts", "model"); без аргументов - все"""
+    for group in groups or CACHE_GROUPS.keys():
+        for cached in CACHE_GROUPS[group]:
+            cached.clear()
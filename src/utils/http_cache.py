@@ -0,0 +1,124 @@
+"""
+Сжатие ответов API и условные запросы (ETag -> 304)
+
+- init_compression: gzip (или brotli, если установлен пакет brotli) для JSON/текста
+  крупнее COMPRESS_MIN_SIZE по заголовку Accept-Encoding клиента
+- versioned_etag: ETag из версии данных (например, id последнего запуска прогноза);
+  совпадение с If-None-Match отвечает 304 до выполнения запросов к БД
+- content_etag: ETag из хэша тела ответа, когда версии данных нет - экономит трафик
+
+Сжатое тело - другое представление ресурса, поэтому к его ETag добавляется суффикс
+кодировки ("...-gzip"); при проверке If-None-Match суффикс учитывается.
+"""
+import gzip
+import hashlib
+from datetime import date
+from functools import wraps
+from typing import Callable, Optional
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Меньшие ответы не сжимаются: выигрыш меньше накладных расходов
+COMPRESS_MIN_SIZE = 1024
+COMPRESS_MIMETYPES = ("application/json", "text/plain", "text/html", "text/csv")
+# Уровни подобраны под скорость: ответы сжимаются на каждый запрос
+GZIP_LEVEL = 5
+BROTLI_QUALITY = 4
+
+
+def _encodings() -> list:
+    return ["br", "gzip"] if brotli is not None else ["gzip"]
+
+
+def _compress(data: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(data, quality=BROTLI_QUALITY)
+    return gzip.compress(data, compresslevel=GZIP_LEVEL)
+
+
+def _matches(if_none_match, etag: str) -> bool:
+    """Совпадает ли ETag (в любом из сжатых представлений) с If-None-Match"""
+    return any(if_none_match.contains(tag) for tag in [etag] + [f"{etag}-{e}" for e in _encodings()])
+
+
+def init_compression(app) -> None:
+    """Сжимать ответы по Accept-Encoding клиента"""
+    from flask import request
+
+    @app.after_request
+    def _compress_response(response):
+        if response.mimetype not in COMPRESS_MIMETYPES or response.direct_passthrough:
+            return response
+        response.vary.add("Accept-Encoding")
+        if (response.status_code != 200 or "Content-Encoding" in response.headers
+                or response.content_length is None or response.content_length < COMPRESS_MIN_SIZE):
+            return response
+
+        encoding = request.accept_encodings.best_match(_encodings())
+        if encoding is None:
+            return response
+        response.set_data(_compress(response.get_data(), encoding))
+        response.headers["Content-Encoding"] = encoding
+        etag, weak = response.get_etag()
+        if etag:
+            response.set_etag(f"{etag}-{encoding}", weak=weak)
+        return response
+
+
+def _not_modified(etag: str):
+    from flask import Response
+    response = Response(status=304)
+    response.set_etag(etag)
+    response.headers["Cache-Control"] = "no-cache"
+    return response
+
+
+def versioned_etag(version: Callable[[], Optional[object]]):
+    """
+    ETag маршрута из версии данных, адреса запроса и текущей даты
+
+    version() должен быть дешевым (например, max(id) по индексу) и меняться в той же
+    транзакции, что и данные ответа; None - данных нет, ответ без ETag. Дата входит
+    в ETag, потому что окна маршрутов считаются от сегодня.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            from flask import make_response, request
+
+            current = version()
+            if current is None:
+                return view(*args, **kwargs)
+            key = f"{current}|{request.full_path}|{date.today().isoformat()}"
+            etag = hashlib.sha1(key.encode("utf-8")).hexdigest()[:20]
+            if _matches(request.if_none_match, etag):
+                return _not_modified(etag)
+
+            response = make_response(view(*args, **kwargs))
+            if response.status_code == 200:
+                response.set_etag(etag)
+                response.headers["Cache-Control"] = "no-cache"
+            return response
+        return wrapper
+    return decorator
+
+
+def content_etag(view):
+    """ETag из хэша тела: данные читаются, но неизмененный ответ не пересылается"""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        from flask import make_response, request
+
+        response = make_response(view(*args, **kwargs))
+        if response.status_code != 200 or response.direct_passthrough:
+            return response
+        etag = hashlib.sha1(response.get_data()).hexdigest()[:20]
+        if _matches(request.if_none_match, etag):
+            return _not_modified(etag)
+        response.set_etag(etag)
+        response.headers["Cache-Control"] = "no-cache"
+        return response
+    return wrapper
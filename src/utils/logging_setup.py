@@ -0,0 +1,170 @@
+"""
+Настройка логов и инструментирование горячих путей
+
+- setup_logging: консольный вывод и, при LOG_JSON_PATH, JSON-файл (по записи на строку)
+- timed: декоратор и контекстный менеджер, копит время по имени участка
+- счетчики: обращения к БД (события engine), HTTP-запросы и байты, записанные строки
+- log_run_summary: сводка времени и счетчиков за прогон
+"""
+import sys
+import time
+from collections import defaultdict
+from functools import wraps
+from threading import Lock
+from typing import Dict, Optional
+from loguru import logger
+from sqlalchemy import event
+
+from ..config import LOG_LEVEL, LOG_JSON_PATH
+
+# Имена счетчиков
+DB_ROUND_TRIPS = "db.round_trips"
+DB_ROWS_WRITTEN = "db.rows_written"
+HTTP_REQUESTS = "http.requests"
+HTTP_BYTES = "http.bytes"
+
+_WRITE_STATEMENTS = ("INSERT", "UPDATE", "DELETE")
+
+_lock = Lock()
+_counters: Dict[str, int] = defaultdict(int)
+# имя участка -> [вызовов, суммарно секунд, максимум секунд]
+_timings: Dict[str, list] = {}
+_configured = False
+
+
+def setup_logging(level: str = LOG_LEVEL, json_path: Optional[str] = LOG_JSON_PATH) -> None:
+    """
+    Настроить вывод loguru (повторные вызовы ничего не меняют)
+
+    Args:
+        level: уровень консольного вывода
+        json_path: файл для JSON-логов (serialize=True); пусто - без файла
+    """
+    global _configured
+    if _configured:
+        return
+    logger.remove()
+    logger.add(sys.stderr, level=level)
+    if json_path:
+        # enqueue: запись в файл не блокирует рабочие потоки
+        logger.add(json_path, level="DEBUG", serialize=True, enqueue=True, rotation="50 MB")
+    _configured = True
+
+
+# --- Счетчики ------------------------------------------------------------
+
+def increment(name: str, amount: int = 1) -> None:
+    """Увеличить счетчик"""
+    with _lock:
+        _counters[name] += amount
+
+
+def counters() -> Dict[str, int]:
+    """Текущие значения счетчиков"""
+    with _lock:
+        return dict(_counters)
+
+
+def timings() -> Dict[str, Dict]:
+    """Накопленное время по участкам: {имя: {"calls", "total_s", "max_s"}}"""
+    with _lock:
+        return {
+            name: {"calls": calls, "total_s": round(total, 4), "max_s": round(peak, 4)}
+            for name, (calls, total, peak) in _timings.items()
+        }
+
+
+def reset_stats() -> None:
+    """Обнулить счетчики и время (в начале прогона)"""
+    with _lock:
+        _counters.clear()
+        _timings.clear()
+
+
+def record_http(response) -> None:
+    """Учесть HTTP-ответ (requests.Response): запрос и размер тела"""
+    increment(HTTP_REQUESTS)
+    increment(HTTP_BYTES, len(response.content or b""))
+
+
+def instrument_engine(engine) -> None:
+    """Считать обращения к БД и записанные строки по событиям engine"""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _count_round_trip(conn, cursor, statement, parameters, context, executemany):
+        increment(DB_ROUND_TRIPS)
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _count_rows_written(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip()[:6].upper() in _WRITE_STATEMENTS and cursor.rowcount and cursor.rowcount > 0:
+            increment(DB_ROWS_WRITTEN, cursor.rowcount)
+
+
+# --- Время ---------------------------------------------------------------
+
+class timed:
+    """
+    Замер времени участка кода
+
+        @timed()                      # имя - module.function
+        def create_training_dataset(...): ...
+
+        with timed("forecast.predict"):
+            ...
+
+    Время копится по имени (см. timings); каждый замер пишется в лог на уровне
+    DEBUG с полями timing/elapsed_s для JSON-вывода.
+    """
+
+    def __init__(self, name: Optional[str] = None):
+        self.name = name
+        self._started = []
+
+    def __call__(self, func):
+        name = self.name or f"{func.__module__}.{func.__qualname__}"
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with timed(name):
+                return func(*args, **kwargs)
+        return wrapper
+
+    def __enter__(self):
+        self._started.append(time.perf_counter())
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        elapsed = time.perf_counter() - self._started.pop()
+        with _lock:
+            stats = _timings.setdefault(self.name, [0, 0.0, 0.0])
+            stats[0] += 1
+            stats[1] += elapsed
+            stats[2] = max(stats[2], elapsed)
+        logger.bind(timing=self.name, elapsed_s=round(elapsed, 4), failed=exc_type is not None).debug(
+            f"{self.name}: {elapsed:.3f} с"
+        )
+        return False
+
+
+def log_run_summary(title: str, started: float) -> Dict:
+    """
+    Записать сводку прогона: общее время, самые долгие участки и счетчики
+
+    Args:
+        started: time.perf_counter() в начале прогона
+
+    Returns:
+        Сводка словарем (она же - поле summary JSON-записи)
+    """
+    summary = {
+        "title": title,
+        "elapsed_s": round(time.perf_counter() - started, 3),
+        "timings": timings(),
+        "counters": counters(),
+    }
+    logger.bind(summary=summary).info(f"=== Сводка: {title} за {summary['elapsed_s']:.1f} с ===")
+    for name, stats in sorted(summary["timings"].items(), key=lambda item: -item[1]["total_s"]):
+        logger.info(f"  {name}: {stats['total_s']:.3f} с, вызовов {stats['calls']}, макс {stats['max_s']:.3f} с")
+    for name, value in sorted(summary["counters"].items()):
+        logger.info(f"  {name}: {value}")
+    return summary
@@ -0,0 +1,401 @@
+"""
+Метрики процесса в текстовом формате Prometheus (без внешних зависимостей)
+
+Счетчики и гистограммы обновляются в памяти под одной блокировкой (O(1) на событие);
+датчики (gauge) с функцией-источником вычисляются только при чтении /metrics.
+
+Несколько процессов (воркеры gunicorn): если задан METRICS_MULTIPROC_DIR, каждый процесс
+раз в METRICS_FLUSH_INTERVAL секунд пишет свои счетчики и гистограммы в файл
+metrics_<pid>_<старт>.json этого каталога, а /metrics суммирует файлы всех процессов
+со своим текущим состоянием. Файлы завершившихся воркеров мастер переносит в archive.json
+(archive_process), поэтому счетчики не уменьшаются при перезапуске воркера. Датчики
+не суммируются: пул БД - воркера, ответившего на запрос.
+"""
+import json
+import math
+import os
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from threading import Lock, Thread
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from ..config import METRICS_FLUSH_INTERVAL, METRICS_MULTIPROC_DIR
+
+# Границы гистограммы времени ответа API, секунды
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+LabelValues = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Iterable[str], values: Iterable[str], extra: str = "") -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help_text: str, labels: Tuple[str, ...] = ()):
+        self.name = name
+        self.help = help_text
+        self.label_names = labels
+        self._lock = Lock()
+
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+
+class _SharedMetric(_Metric):
+    """Метрика, состояние которой суммируется по процессам (счетчики и гистограммы)"""
+
+    def snapshot(self) -> Dict[LabelValues, object]:
+        """Копия состояния этого процесса"""
+        raise NotImplementedError
+
+    @staticmethod
+    def _add(current, other):
+        raise NotImplementedError
+
+    def merge_entries(self, state: Dict[LabelValues, object], entries: Iterable) -> None:
+        """Добавить к state записи [метки, состояние] из файла другого процесса"""
+        for values, other in entries:
+            key = tuple(values)
+            state[key] = self._add(state.get(key), other)
+
+    def totals(self) -> Dict[LabelValues, object]:
+        """Состояние по всем процессам (с METRICS_MULTIPROC_DIR) или только этого"""
+        state = self.snapshot()
+        if METRICS_MULTIPROC_DIR:
+            for shared in _read_shared():
+                self.merge_entries(state, shared.get(self.name, ()))
+        return state
+
+
+class Counter(_SharedMetric):
+    kind = "counter"
+
+    def __init__(self, name: str, help_text: str, labels: Tuple[str, ...] = ()):
+        super().__init__(name, help_text, labels)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, *label_values: str, amount: float = 1.0) -> None:
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0.0) + amount
+
+    def value(self, *label_values: str) -> float:
+        return self._values.get(label_values, 0.0)
+
+    def snapshot(self) -> Dict[LabelValues, float]:
+        with self._lock:
+            return dict(self._values)
+
+    @staticmethod
+    def _add(current, other):
+        return (current or 0.0) + other
+
+    def collect(self) -> List[str]:
+        items = sorted(self.totals().items())
+        return self.header() + [
+            f"{self.name}{_labels(self.label_names, values)} {_number(v)}" for values, v in items
+        ]
+
+
+class Histogram(_SharedMetric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, labels: Tuple[str, ...] = (),
+                 buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        super().__init__(name, help_text, labels)
+        self.buckets = tuple(sorted(buckets))
+        # значения меток -> [счетчики по корзинам (+Inf последняя), сумма]
+        self._values: Dict[LabelValues, list] = {}
+
+    def observe(self, value: float, *label_values: str) -> None:
+        position = bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(label_values)
+            if state is None:
+                state = self._values[label_values] = [[0] * (len(self.buckets) + 1), 0.0]
+            state[0][position] += 1
+            state[1] += value
+
+    def snapshot(self) -> Dict[LabelValues, list]:
+        with self._lock:
+            return {values: [list(counts), total] for values, (counts, total) in self._values.items()}
+
+    @staticmethod
+    def _add(current, other):
+        if current is None:
+            return [list(other[0]), other[1]]
+        return [[a + b for a, b in zip(current[0], other[0])], current[1] + other[1]]
+
+    def collect(self) -> List[str]:
+        items = sorted(self.totals().items())
+        lines = self.header()
+        for values, (counts, total) in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), counts):
+                cumulative += count
+                le = f'le="{_number(bound)}"'
+                lines.append(f"{self.name}_bucket{_labels(self.label_names, values, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.label_names, values)} {_number(total)}")
+            lines.append(f"{self.name}_count{_labels(self.label_names, values)} {cumulative}")
+        return lines
+
+
+class Gauge(_Metric):
+    """Датчик: значение вычисляется функцией при чтении ({метки: значение} или число)"""
+    kind = "gauge"
+
+    def __init__(self, name: str, help_text: str, source: Callable, labels: Tuple[str, ...] = ()):
+        super().__init__(name, help_text, labels)
+        self.source = source
+
+    def collect(self) -> List[str]:
+        try:
+            value = self.source()
+        except Exception:
+            # Недоступный источник (нет БД) не должен ломать весь /metrics
+            return []
+        if value is None:
+            return []
+        items = sorted(value.items()) if isinstance(value, dict) else [((), value)]
+        return self.header() + [
+            f"{self.name}{_labels(self.label_names, values)} {_number(v)}"
+            for values, v in items if v is not None
+        ]
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = Lock()
+
+    def register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            return self._metrics.setdefault(metric.name, metric)
+
+    def get(self, name: str) -> Optional[_Metric]:
+        return self._metrics.get(name)
+
+    def shared_metrics(self) -> List[_SharedMetric]:
+        return [m for m in list(self._metrics.values()) if isinstance(m, _SharedMetric)]
+
+    def exposition(self) -> str:
+        """Все метрики в текстовом формате Prometheus"""
+        lines = []
+        for metric in list(self._metrics.values()):
+            lines.extend(metric.collect())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+# Файлы процессов в METRICS_MULTIPROC_DIR: metrics_<pid>_<старт>.json и архив завершившихся
+_ARCHIVE_FILE = "archive.json"
+_LOCK_FILE = ".lock"
+_process = {"pid": None, "path": None}
+_process_lock = Lock()
+_flush_lock = Lock()
+
+
+@contextmanager
+def _dir_lock(exclusive: bool):
+    """Блокировка каталога: архивирование (мастер) не пересекается с чтением файлов"""
+    import fcntl
+    with open(os.path.join(METRICS_MULTIPROC_DIR, _LOCK_FILE), "a") as f:
+        fcntl.flock(f, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+        yield
+
+
+def _process_path() -> str:
+    """Файл метрик этого процесса; после fork - новый файл и свой поток записи"""
+    pid = os.getpid()
+    if _process["pid"] != pid:
+        with _process_lock:
+            if _process["pid"] != pid:
+                # Время старта в имени: pid перезапущенного воркера может повториться
+                _process["path"] = os.path.join(METRICS_MULTIPROC_DIR, f"metrics_{pid}_{time.time_ns()}.json")
+                _process["pid"] = pid
+                Thread(target=_flush_loop, args=(pid,), name="metrics-flush", daemon=True).start()
+    return _process["path"]
+
+
+def _flush_loop(pid: int) -> None:
+    while _process["pid"] == pid:
+        time.sleep(METRICS_FLUSH_INTERVAL)
+        flush()
+
+
+def flush() -> None:
+    """Записать счетчики и гистограммы процесса в его файл в METRICS_MULTIPROC_DIR"""
+    if not METRICS_MULTIPROC_DIR:
+        return
+    path = _process_path()
+    state = {m.name: [[list(values), v] for values, v in m.snapshot().items()] for m in REGISTRY.shared_metrics()}
+    with _flush_lock:
+        tmp = f"{path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(state, f)
+        # Атомарная замена: читатель видит старый или новый файл, но не половину
+        os.replace(tmp, path)
+
+
+def _load(path: str) -> Optional[Dict]:
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        # Файл удален между listdir и open или еще не записан
+        return None
+
+
+def _read_shared() -> List[Dict]:
+    """Состояния других процессов и архив завершившихся воркеров"""
+    own = _process["path"] if _process["pid"] == os.getpid() else None
+    states = []
+    with _dir_lock(exclusive=False):
+        for name in os.listdir(METRICS_MULTIPROC_DIR):
+            path = os.path.join(METRICS_MULTIPROC_DIR, name)
+            if name.endswith(".json") and path != own:
+                state = _load(path)
+                if state is not None:
+                    states.append(state)
+    return states
+
+
+def reset_shared() -> None:
+    """Очистить METRICS_MULTIPROC_DIR при старте сервера (мастер gunicorn, on_starting)"""
+    if not METRICS_MULTIPROC_DIR:
+        return
+    os.makedirs(METRICS_MULTIPROC_DIR, exist_ok=True)
+    for name in os.listdir(METRICS_MULTIPROC_DIR):
+        if name.startswith("metrics_") or name == _ARCHIVE_FILE:
+            os.remove(os.path.join(METRICS_MULTIPROC_DIR, name))
+
+
+def archive_process(pid: int) -> None:
+    """Перенести счетчики завершившегося воркера в archive.json (мастер gunicorn, child_exit)"""
+    if not METRICS_MULTIPROC_DIR:
+        return
+    prefix = f"metrics_{pid}_"
+    with _dir_lock(exclusive=True):
+        paths = [os.path.join(METRICS_MULTIPROC_DIR, name)
+                 for name in os.listdir(METRICS_MULTIPROC_DIR) if name.startswith(prefix)]
+        if not paths:
+            return
+        archive_path = os.path.join(METRICS_MULTIPROC_DIR, _ARCHIVE_FILE)
+        merged: Dict[str, Dict[LabelValues, object]] = {}
+        for path in [archive_path] + [p for p in paths if p.endswith(".json")]:
+            for name, entries in (_load(path) or {}).items():
+                metric = REGISTRY.get(name)
+                if isinstance(metric, _SharedMetric):
+                    metric.merge_entries(merged.setdefault(name, {}), entries)
+
+        tmp = f"{archive_path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({name: [[list(values), v] for values, v in state.items()]
+                       for name, state in merged.items()}, f)
+        os.replace(tmp, archive_path)
+        for path in paths:
+            os.remove(path)
+
+HTTP_REQUESTS = REGISTRY.register(Counter(
+    "http_requests_total", "HTTP-запросы к API", ("method", "route", "status")))
+HTTP_LATENCY = REGISTRY.register(Histogram(
+    "http_request_duration_seconds", "Время обработки HTTP-запроса", ("method", "route")))
+CACHE_REQUESTS = REGISTRY.register(Counter(
+    "cache_requests_total", "Обращения к кэшам процесса", ("cache", "result")))
+
+
+def record_cache(cache: str, hit: bool) -> None:
+    """Учесть попадание/промах кэша"""
+    CACHE_REQUESTS.inc(cache, "hit" if hit else "miss")
+
+
+def _cache_hit_ratio() -> Dict[LabelValues, float]:
+    totals: Dict[str, List[float]] = {}
+    for (cache, result), value in CACHE_REQUESTS.totals().items():
+        hits_total = totals.setdefault(cache, [0.0, 0.0])
+        hits_total[1] += value
+        if result == "hit":
+            hits_total[0] += value
+    return {(cache,): hits / total for cache, (hits, total) in totals.items() if total}
+
+
+def _pool_stats() -> Optional[Dict[LabelValues, float]]:
+    from ..db import engine
+    if engine is None:
+        return None
+    pool = engine.pool
+    stats = {}
+    for name in ("size", "checkedout", "overflow", "checkedin"):
+        method = getattr(pool, name, None)
+        if callable(method):
+            stats[(name,)] = method()
+    return stats
+
+
+# Возраст последнего запуска прогноза читается из БД не чаще раза в FORECAST_AGE_TTL секунд
+FORECAST_AGE_TTL = 15.0
+_forecast_created: List = [0.0, None]  # [когда прочитано (monotonic), created_at последнего запуска]
+
+
+def _last_forecast_age() -> Optional[float]:
+    from datetime import datetime
+    from sqlalchemy import func
+    from ..db import SessionLocal
+    from ..models import ForecastRun
+
+    if time.monotonic() - _forecast_created[0] > FORECAST_AGE_TTL:
+        session = SessionLocal()
+        try:
+            _forecast_created[1] = session.query(func.max(ForecastRun.created_at)).scalar()
+            _forecast_created[0] = time.monotonic()
+        finally:
+            session.close()
+    created_at = _forecast_created[1]
+    if created_at is None:
+        return None
+    # created_at пишется в UTC (datetime.utcnow)
+    return (datetime.utcnow() - created_at).total_seconds()
+
+
+REGISTRY.register(Gauge("cache_hit_ratio", "Доля попаданий в кэш", _cache_hit_ratio, ("cache",)))
+REGISTRY.register(Gauge("db_pool_connections", "Соединения пула БД по состоянию", _pool_stats, ("state",)))
+REGISTRY.register(Gauge("forecast_last_run_age_seconds", "Секунд с последнего запуска прогноза",
+                        _last_forecast_age))
+
+
+def init_request_metrics(app) -> None:
+    """Счетчики и гистограмма времени по маршрутам (шаблон маршрута, а не путь - без роста меток)"""
+    from flask import g, request
+
+    @app.before_request
+    def _start_request_timer():
+        g.metrics_started = time.perf_counter()
+
+    @app.after_request
+    def _record_request(response):
+        if METRICS_MULTIPROC_DIR:
+            # Первый запрос воркера заводит его файл и поток записи
+            _process_path()
+        started = g.pop("metrics_started", None)
+        route = request.url_rule.rule if request.url_rule is not None else "unmatched"
+        HTTP_REQUESTS.inc(request.method, route, str(response.status_code))
+        if started is not None:
+            HTTP_LATENCY.observe(time.perf_counter() - started, request.method, route)
+        return response
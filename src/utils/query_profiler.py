@@ -0,0 +1,214 @@
+"""
+Профилировщик SQL-запросов (включается SQL_PROFILE=1)
+
+Слушает события engine before/after_cursor_execute и копит по каждой паре
+(отпечаток запроса, место вызова в коде проекта) число выполнений и время.
+Отпечаток - текст запроса без литералов и с IN (...) свернутым в IN (?),
+поэтому запросы одной формы с разными параметрами считаются одним.
+Одинаковые запросы из одного места, выполненные SQL_PROFILE_N1_THRESHOLD и более
+раз за область профилирования, помечаются как N+1.
+
+Области: profiled("имя") для CLI-скриптов (действует на все потоки процесса)
+и запрос Flask (init_flask_profiling - отдельная область на каждый запрос).
+"""
+import hashlib
+import os
+import re
+import sys
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from threading import Lock
+from typing import Dict, List, Optional, Tuple
+from loguru import logger
+from sqlalchemy import event
+
+from ..config import SQL_PROFILE, SQL_PROFILE_N1_THRESHOLD
+
+_PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+_SKIP_PATHS = (os.path.abspath(__file__), f"{os.sep}site-packages{os.sep}", f"{os.sep}sqlalchemy{os.sep}")
+
+_STRING_RE = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_RE = re.compile(r"\b\d+(?:\.\d+)?\b")
+_PARAM_RE = re.compile(r"%\([^)]*\)s|%s|:\w+|__\[POSTCOMPILE_\w+\]")
+_IN_LIST_RE = re.compile(r"\bIN\s*\(\s*\?(?:\s*,\s*\?)*\s*\)", re.IGNORECASE)
+_SPACES_RE = re.compile(r"\s+")
+
+
+def statement_shape(statement: str) -> str:
+    """Форма запроса: без литералов и параметров, IN-списки свернуты"""
+    shape = _STRING_RE.sub("?", statement)
+    shape = _PARAM_RE.sub("?", shape)
+    shape = _NUMBER_RE.sub("?", shape)
+    shape = _IN_LIST_RE.sub("IN (?)", shape)
+    return _SPACES_RE.sub(" ", shape).strip()
+
+
+def fingerprint(statement: str) -> str:
+    """Короткий отпечаток формы запроса"""
+    return hashlib.sha1(statement_shape(statement).encode("utf-8")).hexdigest()[:12]
+
+
+def call_site() -> str:
+    """Ближайший к запросу кадр стека из кода проекта: 'путь:строка (функция)'"""
+    frame = sys._getframe(2)
+    while frame is not None:
+        path = frame.f_code.co_filename
+        if path.startswith(_PROJECT_ROOT) and not any(skip in path for skip in _SKIP_PATHS):
+            return f"{os.path.relpath(path, _PROJECT_ROOT)}:{frame.f_lineno} ({frame.f_code.co_name})"
+        frame = frame.f_back
+    return "<unknown>"
+
+
+@dataclass
+class QueryStats:
+    """Статистика одной формы запроса из одного места кода"""
+    shape: str
+    count: int = 0
+    total_s: float = 0.0
+    max_s: float = 0.0
+
+
+@dataclass
+class ProfileScope:
+    """Область профилирования: запросы CLI-прогона или одного HTTP-запроса"""
+    name: str
+    stats: Dict[Tuple[str, str], QueryStats] = field(default_factory=dict)
+    lock: Lock = field(default_factory=Lock)
+
+    def record(self, statement: str, site: str, elapsed: float) -> None:
+        key = (fingerprint(statement), site)
+        with self.lock:
+            stats = self.stats.get(key)
+            if stats is None:
+                stats = self.stats[key] = QueryStats(shape=statement_shape(statement))
+            stats.count += 1
+            stats.total_s += elapsed
+            stats.max_s = max(stats.max_s, elapsed)
+
+    @property
+    def total_queries(self) -> int:
+        return sum(s.count for s in self.stats.values())
+
+    def n_plus_one(self, threshold: int = SQL_PROFILE_N1_THRESHOLD) -> List[Tuple[str, QueryStats]]:
+        """Повторяющиеся запросы одной формы из одного места - кандидаты в N+1"""
+        flagged = [(site, s) for (_, site), s in self.stats.items() if s.count >= threshold]
+        return sorted(flagged, key=lambda item: -item[1].count)
+
+    def report(self, top: int = 10) -> Dict:
+        """Сводка: всего запросов/времени, самые дорогие формы и N+1"""
+        by_time = sorted(self.stats.items(), key=lambda item: -item[1].total_s)[:top]
+        return {
+            "scope": self.name,
+            "queries": self.total_queries,
+            "total_s": round(sum(s.total_s for s in self.stats.values()), 4),
+            "top": [
+                {"site": site, "fingerprint": fp, "count": s.count,
+                 "total_s": round(s.total_s, 4), "max_s": round(s.max_s, 4), "shape": s.shape[:300]}
+                for (fp, site), s in by_time
+            ],
+            "n_plus_one": [
+                {"site": site, "count": s.count, "total_s": round(s.total_s, 4), "shape": s.shape[:300]}
+                for site, s in self.n_plus_one()
+            ],
+        }
+
+    def log_report(self, top: int = 10) -> Dict:
+        report = self.report(top)
+        logger.bind(sql_profile=report).info(
+            f"SQL [{self.name}]: {report['queries']} запросов, {report['total_s']:.3f} с"
+        )
+        for item in report["top"]:
+            logger.info(f"  {item['count']}× {item['total_s']:.3f} с {item['site']}: {item['shape'][:120]}")
+        for item in report["n_plus_one"]:
+            logger.warning(f"  N+1: {item['count']}× {item['site']}: {item['shape'][:120]}")
+        return report
+
+
+_current_scope: ContextVar[Optional[ProfileScope]] = ContextVar("sql_profile_scope", default=None)
+# Область CLI-прогона: действует и в рабочих потоках, где контекст не унаследован
+_process_scope: Optional[ProfileScope] = None
+_installed = set()
+
+
+def install_profiler(engine) -> None:
+    """Подписать профилировщик на события engine (повторно не подписывается)"""
+    if id(engine) in _installed:
+        return
+    _installed.add(id(engine))
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        if context is not None:
+            context._sql_profile_started = time.perf_counter()
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        scope = _current_scope.get() or _process_scope
+        started = getattr(context, "_sql_profile_started", None)
+        if scope is not None and started is not None:
+            scope.record(statement, call_site(), time.perf_counter() - started)
+
+
+@contextmanager
+def profiled(name: str, enabled: bool = SQL_PROFILE):
+    """
+    Профилировать запросы внутри блока (CLI-скрипты); при выключенном SQL_PROFILE - ничего не делает
+
+    В конце блока в лог пишется отчет с самыми дорогими запросами и N+1.
+    """
+    global _process_scope
+    if not enabled:
+        yield None
+        return
+
+    from ..db import engine
+    if engine is not None:
+        install_profiler(engine)
+
+    scope = ProfileScope(name)
+    previous = _process_scope
+    _process_scope = scope
+    token = _current_scope.set(scope)
+    try:
+        yield scope
+    finally:
+        _current_scope.reset(token)
+        _process_scope = previous
+        scope.log_report()
+
+
+def init_flask_profiling(app, enabled: bool = SQL_PROFILE) -> None:
+    """Отдельная область профилирования на каждый HTTP-запрос; число запросов - в X-SQL-Queries"""
+    if not enabled:
+        return
+    from flask import g, request
+
+    from ..db import engine
+    if engine is not None:
+        install_profiler(engine)
+
+    @app.before_request
+    def _start_sql_profile():
+        scope = ProfileScope(f"{request.method} {request.path}")
+        g.sql_profile = (scope, _current_scope.set(scope))
+
+    @app.after_request
+    def _report_sql_profile(response):
+        profile = g.get("sql_profile")
+        if profile is not None:
+            scope = profile[0]
+            response.headers["X-SQL-Queries"] = str(scope.total_queries)
+            if scope.n_plus_one():
+                scope.log_report()
+            else:
+                logger.debug(f"SQL [{scope.name}]: {scope.total_queries} запросов")
+        return response
+
+    @app.teardown_request
+    def _finish_sql_profile(exc):
+        # teardown вызывается и при ошибке обработчика - область не "протекает" в следующий запрос
+        profile = g.pop("sql_profile", None)
+        if profile is not None:
+            _current_scope.reset(profile[1])
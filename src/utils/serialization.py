@@ -0,0 +1,82 @@
+"""
+Сериализация ответов API в JSON
+
+Маршруты выбирают строки кортежами (только нужные колонки, без ORM-объектов) и отдают
+их через rows_response; даты кодируются самим энкодером, без .isoformat() на каждую строку.
+Если установлен orjson - кодирует он (на порядок быстрее), иначе стандартный json.
+NaN и бесконечности (пропуски pandas и т.п.) в обоих случаях кодируются как null:
+в JSON их нет, а браузерный JSON.parse падает на NaN.
+"""
+import json
+import math
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any, Iterable, Sequence
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+JSON_MIMETYPE = "application/json"
+
+
+def _finite(value: Any) -> Any:
+    """NaN и бесконечности -> None во вложенных списках и словарях"""
+    if isinstance(value, float):
+        return value if math.isfinite(value) else None
+    if isinstance(value, dict):
+        return {key: _finite(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_finite(item) for item in value]
+    return value
+
+
+def _default(value: Any):
+    """Типы, которых нет в JSON: даты, Decimal, скаляры numpy/pandas"""
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return _finite(float(value))
+    if hasattr(value, "isoformat"):
+        # pandas.Timestamp и подобные
+        return value.isoformat()
+    if hasattr(value, "item"):
+        # numpy.float32, numpy.int64 ... (numpy.float64 - подкласс float)
+        return _finite(value.item())
+    raise TypeError(f"Тип {type(value).__name__} не сериализуется в JSON")
+
+
+if orjson is not None:
+    _ORJSON_OPTIONS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+
+    def dumps(value: Any) -> bytes:
+        """Закодировать значение в JSON (bytes); orjson сам пишет NaN и бесконечности как null"""
+        return orjson.dumps(value, default=_default, option=_ORJSON_OPTIONS)
+else:
+    # allow_nan=False: непропущенный NaN - ошибка, а не невалидный JSON в ответе
+    _encoder = json.JSONEncoder(default=_default, ensure_ascii=False, separators=(",", ":"), allow_nan=False)
+
+    def dumps(value: Any) -> bytes:
+        """Закодировать значение в JSON (bytes)"""
+        return _encoder.encode(_finite(value)).encode("utf-8")
+
+
+def json_response(value: Any, status: int = 200):
+    """Ответ Flask с JSON-телом (замена jsonify с быстрым энкодером)"""
+    from flask import Response
+    return Response(dumps(value), status=status, mimetype=JSON_MIMETYPE)
+
+
+def rows_response(fields: Sequence[str], rows: Iterable[Sequence], status: int = 200):
+    """
+    Строки запроса (кортежи в порядке fields) - массивом объектов или, при
+    ?format=columnar, по колонкам: {"date": [...], "yhat": [...]}
+    """
+    from flask import request
+
+    rows = list(rows)
+    if request.args.get("format") == "columnar":
+        columns = zip(*rows) if rows else [()] * len(fields)
+        return json_response({name: list(values) for name, values in zip(fields, columns)}, status)
+    return json_response([dict(zip(fields, row)) for row in rows], status)
@@ -0,0 +1,26 @@
+"""
+WSGI-точка входа для production
+
+    gunicorn -c gunicorn.conf.py src.wsgi:app
+
+С preload_app (gunicorn.conf.py) модуль импортируется один раз в мастер-процессе,
+воркеры получают приложение и уже загруженные модули через fork (copy-on-write).
+"""
+from loguru import logger
+
+from .app import create_app
+from .config import WSGI_PRELOAD_MODULES
+from .utils.logging_setup import setup_logging
+
+
+def preload_modules() -> None:
+    """Заранее импортировать тяжелые модули, которые маршруты грузят лениво"""
+    from .modeling import forecast  # noqa: F401 - pandas, признаки, агрегаты
+    logger.info("Модули прогноза загружены до fork воркеров")
+
+
+setup_logging()
+if WSGI_PRELOAD_MODULES:
+    preload_modules()
+
+app = create_app()